@@ -0,0 +1,223 @@
+"""基于asyncio的网页获取后端
+
+在一个后台线程中运行事件循环，所有页面请求都在这个循环中并发执行，
+不再为每个请求占用一个系统线程。同一主机的并发数由信号量限制。
+
+支持aiohttp和httpx两种实现，优先使用aiohttp。
+"""
+import asyncio
+import importlib.util
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from request_policy import HttpStatusError, RequestPolicy, RetryableError
+
+
+class FetchResult:
+    """异步请求的响应结果，接口与requests.Response中用到的部分保持一致"""
+
+    def __init__(self, url, status_code, content):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = None
+
+    @property
+    def apparent_encoding(self):
+        """根据内容推测编码"""
+        try:
+            from charset_normalizer import from_bytes
+            best = from_bytes(self.content).best()
+            return best.encoding if best else None
+        except Exception:
+            return None
+
+    @property
+    def text(self):
+        """按encoding解码后的文本"""
+        return self.content.decode(self.encoding or 'gbk', errors='replace')
+
+
+def detect_backend():
+    """检测可用的异步HTTP库，都不可用时返回None"""
+    for name in ('aiohttp', 'httpx'):
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return None
+
+
+class AsyncFetcher:
+    """在后台事件循环中执行HTTP请求
+
+    headers: 每个请求都携带的请求头
+    per_host_limit: 同一主机的最大并发请求数
+    backend: 'aiohttp' 或 'httpx'，为None时自动选择
+    policy: 超时、重试和熔断策略（RequestPolicy），与同步请求共用
+    rate_controller: 速率限制和自适应并发控制（RateController），与同步请求共用
+    metrics: 耗时统计（PipelineMetrics），记录限速等待、网络等待、请求数和传输字节数
+    """
+
+    def __init__(self, headers=None, per_host_limit=32, backend=None, policy=None, rate_controller=None,
+                 metrics=None):
+        self.headers = dict(headers or {})
+        self.per_host_limit = per_host_limit
+        self.policy = policy or RequestPolicy()
+        self.rate_controller = rate_controller
+        self.metrics = metrics
+        self.backend = backend or detect_backend()
+        if not self.backend:
+            raise ImportError("异步模式需要安装 aiohttp 或 httpx")
+
+        self._client = None
+        self._semaphores = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        """后台线程：运行事件循环"""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _run(self, coro):
+        """在后台循环中执行协程，并阻塞等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _semaphore(self, url):
+        """获取主机对应的信号量（只在事件循环线程中调用）"""
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._semaphores[host]
+
+    async def _ensure_client(self):
+        """创建共享的客户端（只在事件循环线程中调用），同一会话内的Cookie保持一致"""
+        if self._client is None:
+            if self.backend == 'aiohttp':
+                import aiohttp
+                connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.per_host_limit)
+                self._client = aiohttp.ClientSession(headers=self.headers, connector=connector)
+            else:
+                import httpx
+                limits = httpx.Limits(max_connections=self.per_host_limit, max_keepalive_connections=self.per_host_limit)
+                self._client = httpx.AsyncClient(headers=self.headers, limits=limits)
+        return self._client
+
+    async def _timed_send(self, url, timeout):
+        """发送单个GET请求并记录网络等待时间和传输字节数"""
+        if self.metrics is None:
+            return await self._send(url, timeout)
+        self.metrics.count('requests')
+        start = time.perf_counter()
+        try:
+            result = await self._send(url, timeout)
+        finally:
+            self.metrics.observe('fetch', time.perf_counter() - start)
+        self.metrics.count('bytes', len(result.content))
+        return result
+
+    async def _get(self, url, timeout):
+        """发送单个GET请求，按速率和并发控制等待"""
+        controller = self.rate_controller
+        if controller is None:
+            return await self._timed_send(url, timeout)
+
+        wait_start = time.perf_counter()
+        started = await controller.acquire_async()
+        if self.metrics is not None:
+            self.metrics.observe('throttle', time.perf_counter() - wait_start)
+        outcome = 'error'
+        try:
+            result = await self._timed_send(url, timeout)
+            if result.status_code == 200:
+                outcome = 'ok'
+            elif result.status_code >= 500:
+                outcome = 'overload'
+            return result
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            outcome = 'overload'
+            raise
+        finally:
+            controller.release(started, outcome)
+
+    async def _send(self, url, timeout):
+        """发送单个GET请求，网络异常转换为requests的异常类型，其他异常（程序错误）原样抛出
+
+        timeout: 总超时秒数，或(连接超时, 读取超时)
+        """
+        client = await self._ensure_client()
+        async with self._semaphore(url):
+            if self.backend == 'aiohttp':
+                import aiohttp
+                if isinstance(timeout, tuple):
+                    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+                else:
+                    client_timeout = aiohttp.ClientTimeout(total=timeout)
+                try:
+                    async with client.get(url, timeout=client_timeout) as resp:
+                        content = await resp.read()
+                        return FetchResult(url, resp.status, content)
+                except asyncio.TimeoutError as e:
+                    raise requests.exceptions.Timeout(str(e))
+                except aiohttp.ClientError as e:
+                    raise requests.exceptions.ConnectionError(str(e))
+            else:
+                import httpx
+                if isinstance(timeout, tuple):
+                    timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+                try:
+                    resp = await client.get(url, timeout=timeout)
+                    return FetchResult(url, resp.status_code, resp.content)
+                except httpx.TimeoutException as e:
+                    raise requests.exceptions.Timeout(str(e))
+                except httpx.TransportError as e:
+                    raise requests.exceptions.ConnectionError(str(e))
+
+    async def _get_with_retry(self, url, timeout):
+        """按请求策略重试的GET请求，所有重试都失败或熔断时返回None"""
+        async def attempt(attempt_no):
+            result = await self._get(url, timeout)
+            if result.status_code != 200:
+                raise HttpStatusError(result.status_code)
+            return result
+
+        try:
+            return await self.policy.run_async(attempt)
+        except (requests.exceptions.RequestException, RetryableError):
+            return None
+
+    async def _get_many(self, urls, timeout):
+        """并发获取多个页面"""
+        tasks = [self._get_with_retry(url, timeout) for url in urls]
+        return await asyncio.gather(*tasks)
+
+    def get(self, url, timeout=None):
+        """同步获取单个页面（阻塞调用线程，不阻塞事件循环），不重试"""
+        return self._run(self._get(url, timeout or self.policy.timeout))
+
+    def get_many(self, urls, timeout=None):
+        """在同一个事件循环中并发获取多个页面，按请求策略重试
+
+        返回列表与urls一一对应，所有重试都失败的页面为None
+        """
+        return self._run(self._get_many(list(urls), timeout or self.policy.timeout))
+
+    async def _close(self):
+        if self._client is not None:
+            if self.backend == 'aiohttp':
+                await self._client.close()
+            else:
+                await self._client.aclose()
+            self._client = None
+
+    def close(self):
+        """关闭客户端并停止事件循环"""
+        if self._loop.is_running():
+            try:
+                self._run(self._close())
+            except Exception:
+                pass
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,509 @@
+"""辽宁省网刊价格数据命令行批处理
+
+不加载图形界面，按 城市 × 月份 依次执行 连接 → 查询 → 提取 → 导出，
+适合在服务器上通过cron定时运行。
+
+示例:
+    python batch_cli.py --cities 15,17 --start 2024-01 --end 2024-12 --output ./output
+    python batch_cli.py --cities all --start 2025-01 --output 辽宁省2025年网刊.csv
+    python batch_cli.py --cities all --start 2023-01 --end 2025-12 --db prices.db --sync
+    python batch_cli.py --cities all --start 2025-01 --end 2025-12 --output ./dataset --format parquet
+    python batch_cli.py --cities 15 --start 2025-01 --output ./output --record traffic.db
+    python batch_cli.py --cities 15 --start 2025-01 --output ./output --replay traffic.db
+    python batch_cli.py --cities all --start 2025-01 --output ./output --category 钢材,混凝土
+    python batch_cli.py --cities all --start 2025-01 --end 2025-12 --output ./output --schedule --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+from checkpoint import ExtractionJournal
+from columnar import ColumnarRows
+from exporters import COLUMNAR_FORMATS, open_stream_writer, partition_path
+from job_scheduler import JobScheduler
+from metrics import PipelineMetrics
+from page_cache import PageCache
+from page_parsers import DEFAULT_BACKEND, available_backends
+from price_store import PriceStore, month_key
+from query_filter import QueryFilter
+from rate_control import RateController
+from request_policy import RequestPolicy
+from scraper_core import ScraperEngine, get_app_dir, build_date_str, default_filename, export_to_file
+from traffic_archive import TrafficArchive
+
+
+def log_message(message):
+    """输出带时间戳的日志"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"{timestamp} - {message}", flush=True)
+
+
+def parse_month(text):
+    """解析YYYY-MM格式的月份，返回(年, 月)"""
+    try:
+        value = datetime.strptime(text.replace('/', '-'), "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"月份格式应为YYYY-MM: {text}")
+    return value.year, value.month
+
+
+def iter_months(start, end):
+    """按时间顺序生成[start, end]之间的(年, 月)"""
+    year, month = start
+    while (year, month) <= end:
+        yield year, month
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def split_values(values):
+    """合并可重复、可用逗号分隔的参数值"""
+    return [part.strip() for value in values for part in value.split(",") if part.strip()]
+
+
+def build_filters(categories, names, material_ids):
+    """各筛选条件的组合，每个组合是一个查询任务；没有条件时只有一个查询全部材料的任务"""
+    return [QueryFilter(category, name, material_id)
+            for category in categories or [""]
+            for name in names or [""]
+            for material_id in material_ids or [""]]
+
+
+def job_file_path(output_dir, file_format, city_id, city_name, year, month, suffix=""):
+    """输出为目录时一个(城市, 月份)的文件路径：列式格式按城市和月份分区，其他格式按默认文件名
+
+    suffix: 按条件筛选时加在文件名后的条件说明
+    """
+    extension = f".{file_format}"
+    if extension in COLUMNAR_FORMATS:
+        return partition_path(output_dir, city_id, f"{year:04d}-{month:02d}", extension, name=f"data{suffix}")
+    return os.path.join(output_dir, f"{default_filename(city_name, year, month)}{suffix}{extension}")
+
+
+def run_scheduled(args, engine, store, job_specs, output, merge, merged_writer):
+    """所有任务一次性交给调度器，共用--workers个并发名额同时提取，按任务结束的顺序保存数据
+
+    job_specs: [(城市ID, 年, 月, 查询条件)]
+    流式导出（--stream）时各任务的页面在提取过程中按页码顺序直接写入各自的文件和数据库，
+    合并导出时写入merged_writer（按页面完成的先后，不同任务的页面可能交错）
+    返回(按任务顺序合并的数据, 表头, 未完成的任务, 跳过的任务数)
+    """
+    def needs_update(job):
+        # 增量同步：查询后跳过数据库中已是最新的月份
+        if store.is_up_to_date(job.city_id, month_key(job.date_str), job.total_records):
+            job.error = "数据库中已是最新"
+            return False
+        return True
+
+    accept = needs_update if args.sync else None
+
+    # 不同任务的页面在不同的工作线程中输出，合并写入同一个文件时需要加锁
+    merged_lock = threading.Lock()
+
+    def make_row_sink(output_state):
+        def row_sink(rows, headers):
+            if merged_writer:
+                with merged_lock:
+                    merged_writer.write_rows(rows, headers)
+            elif output_state["path"]:
+                if output_state["writer"] is None:
+                    output_state["writer"] = open_stream_writer(output_state["path"])
+                output_state["writer"].write_rows(rows, headers)
+            if store:
+                store.write_rows(output_state["city_id"], output_state["month"], rows, headers,
+                                 output_state["sync_id"])
+        return row_sink
+
+    scheduler = JobScheduler(engine, workers=args.workers, accept=accept)
+    specs = {}
+    outputs = {}
+    for city_id, year, month, job_filter in job_specs:
+        city_name = engine.city_mapping[city_id]
+        job_label = f" {job_filter.describe(engine.category_mapping)}" if job_filter else ""
+        row_sink = None
+        if args.stream:
+            suffix = job_filter.file_suffix(engine.category_mapping) if job_filter else ""
+            output_state = {
+                "city_id": city_id,
+                "month": month_key(build_date_str(year, month)),
+                "path": job_file_path(output, args.format, city_id, city_name, year, month, suffix)
+                if output and not merge else None,
+                "writer": None,
+                "sync_id": store.new_sync_id() if store else None,
+            }
+            row_sink = make_row_sink(output_state)
+        job = scheduler.submit(city_id, build_date_str(year, month), filters=job_filter,
+                               label=f"{city_name} {year}年{month:02d}月{job_label}", row_sink=row_sink)
+        specs[job] = (city_name, year, month, job_label)
+        if args.stream:
+            outputs[job] = output_state
+
+    merged_jobs = []
+    failed_jobs = []
+    skipped_jobs = 0
+    try:
+        for finished, job in enumerate(scheduler.as_completed(), 1):
+            city_name, year, month, job_label = specs[job]
+            # 按条件筛选只得到该月的部分数据，数据库中只更新这些记录，不标记该月已完整保存
+            partial = bool(job.filters)
+            store_month = month_key(job.date_str)
+            output_state = outputs.pop(job, None)
+            writer = output_state["writer"] if output_state else None
+            if writer:
+                with engine.metrics.stage("export"):
+                    writer.close()
+                if job.state == "done":
+                    log_message(f"✅ 数据已保存到: {writer.file_path}")
+                else:
+                    # 失败或取消的任务的文件不完整，不保留
+                    os.remove(writer.file_path)
+            if job.state == "skipped":
+                skipped_jobs += 1
+            elif job.state != "done":
+                failed_jobs.append(specs[job])
+            elif not job.rows_extracted:
+                if store and not partial:
+                    store.finish_month(job.city_id, city_name, store_month, 0, 0, 0, store.new_sync_id())
+            elif output_state:
+                # 流式导出：数据已经写入文件和数据库
+                if store and partial:
+                    store.commit()
+                elif store:
+                    store.finish_month(job.city_id, city_name, store_month, job.total_records, job.total_pages,
+                                       job.rows_extracted, output_state["sync_id"])
+            else:
+                if store and partial:
+                    store.write_rows(job.city_id, store_month, job.data, job.headers, store.new_sync_id())
+                    store.commit()
+                elif store:
+                    store.save_month(job.city_id, city_name, store_month, job.data, job.headers,
+                                     job.total_records, job.total_pages)
+                if merge:
+                    merged_jobs.append(job)
+                elif output:
+                    suffix = job.filters.file_suffix(engine.category_mapping) if job.filters else ""
+                    file_path = job_file_path(output, args.format, job.city_id, city_name, year, month, suffix)
+                    with engine.metrics.stage("export"):
+                        export_to_file(job.data, job.headers, file_path, log=log_message)
+            if not merge:
+                # 已经保存的数据不再留在内存中
+                job.data = None
+            log_message(f"📊 已结束 {finished}/{len(specs)} 个任务（总进度 {scheduler.progress:.0f}%）")
+    finally:
+        scheduler.close()
+        # 取消或出错时关闭并删除还没有完成的文件
+        for output_state in outputs.values():
+            if output_state["writer"]:
+                output_state["writer"].close()
+                os.remove(output_state["writer"].file_path)
+
+    merged_data = ColumnarRows()
+    merged_headers = []
+    for job in sorted(merged_jobs, key=lambda job: job.seq):
+        if not merged_headers:
+            merged_headers = job.headers
+        merged_data.extend(job.data, merged_headers)
+    return merged_data, merged_headers, failed_jobs, skipped_jobs
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="辽宁省网刊价格数据命令行批处理")
+    parser.add_argument("--cities", required=True,
+                        help="城市ID，多个用逗号分隔；all表示全部城市")
+    parser.add_argument("--start", required=True, type=parse_month, help="起始月份，格式YYYY-MM")
+    parser.add_argument("--end", type=parse_month, help="结束月份，格式YYYY-MM，默认与起始月份相同")
+    parser.add_argument("--output",
+                        help="输出路径：以.xlsx/.csv/.parquet/.feather结尾时合并保存为一个文件，"
+                             "否则视为目录，每个城市每月一个文件")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet", "feather"], default="xlsx",
+                        help="输出为目录时的文件格式，默认xlsx；parquet/feather按城市和月份分区保存"
+                             "（目录/city=城市ID/month=YYYY-MM/data.parquet）")
+    parser.add_argument("--category", action="append", default=[],
+                        help="材料类别（类别名称或查询表单中的选项值），可重复或用逗号分隔；由网站筛选，只下载符合条件的页面")
+    parser.add_argument("--name", dest="material_names", action="append", default=[],
+                        help="材料名称（clmc），可重复或用逗号分隔")
+    parser.add_argument("--material-id", dest="material_ids", action="append", default=[],
+                        help="材料编号（clid），可重复或用逗号分隔")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式导出：每提取一页就写入文件，内存占用不随数据量增长")
+    parser.add_argument("--workers", type=int, default=4, help="并发提取的工作线程数，默认4")
+    parser.add_argument("--schedule", action="store_true",
+                        help="所有城市×月份的任务一次性交给调度器，共用--workers个并发名额同时提取"
+                             "（当前月份优先），不再逐个任务依次执行；每个任务的数据在任务结束时保存")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="自适应并发：网站响应正常时逐步增加并发数，超时或出错时减半（从--workers开始，不超过--max-workers）")
+    parser.add_argument("--max-workers", type=int, default=16, help="自适应并发的并发数上限，默认16")
+    parser.add_argument("--rate", type=float, default=0, help="每秒最多发出的请求数，默认0表示不限速")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="解析进程数：大于0时由进程池解析页面，网络线程只负责下载（可用多个CPU核），默认0")
+    parser.add_argument("--stream-parse", action="store_true",
+                        help="边下载边解析：识别出数据表格后各页一边接收一边提取数据行（不与--async、--parse-workers同时生效）")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="使用asyncio异步传输")
+    parser.add_argument("--parser", choices=available_backends(), default=DEFAULT_BACKEND,
+                        help=f"页面解析后端，默认{DEFAULT_BACKEND}")
+    parser.add_argument("--connect-timeout", type=float, default=10, help="连接超时（秒），默认10")
+    parser.add_argument("--read-timeout", type=float, default=30, help="读取超时（秒），默认30")
+    parser.add_argument("--attempts", type=int, default=3, help="每个请求的最大尝试次数，默认3")
+    parser.add_argument("--base-url", default=None, help="网站地址（用于测试环境）")
+    parser.add_argument("--cache-dir", default=None, help="页面缓存目录，默认为程序目录下的CACHE")
+    parser.add_argument("--cache-ttl", type=float, default=6, help="当前月份页面缓存的有效期（小时），默认6")
+    parser.add_argument("--cache-size", type=int, default=500, help="页面缓存总大小上限（MB），默认500")
+    parser.add_argument("--no-cache", action="store_true", help="不使用页面缓存")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="断点记录目录，默认为程序目录下的CHECKPOINT；中断后再次运行从缺失的页面继续")
+    parser.add_argument("--no-checkpoint", action="store_true", help="不记录断点")
+    parser.add_argument("--temp-dir", default=None,
+                        help="调试文件（网页内容）保存目录，默认使用系统临时目录并在结束时删除")
+    parser.add_argument("--db", help="同时把数据写入SQLite价格数据库")
+    parser.add_argument("--sync", action="store_true",
+                        help="增量同步：跳过数据库中已完整保存且记录数与网站一致的月份（需要--db）")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="把各阶段耗时统计写入文件（.prom为Prometheus文本格式，其他为JSON）")
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument("--record", metavar="ARCHIVE", help="把所有请求和响应录制到存档文件（录制时不使用页面缓存和断点记录）")
+    archive_group.add_argument("--replay", metavar="ARCHIVE",
+                               help="从存档文件回放请求，不访问网络（不使用页面缓存）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    end = args.end or args.start
+    if end < args.start:
+        log_message("❌ 结束月份不能早于起始月份")
+        return 2
+    if not args.output and not args.db:
+        log_message("❌ 请指定--output或--db")
+        return 2
+    if args.sync and not args.db:
+        log_message("❌ --sync需要同时指定--db")
+        return 2
+    categories = split_values(args.category)
+    material_names = split_values(args.material_names)
+    material_ids = split_values(args.material_ids)
+    if args.sync and (categories or material_names or material_ids):
+        log_message("❌ --sync不能与筛选条件同时使用（按条件筛选只得到该月的部分数据）")
+        return 2
+
+    policy = RequestPolicy(connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                           max_attempts=args.attempts)
+    rate_controller = RateController(rate=args.rate or None, adaptive=args.adaptive,
+                                     initial_limit=args.workers, max_limit=max(args.max_workers, args.workers))
+    engine_kwargs = {"log": log_message, "max_workers": args.workers, "parser_backend": args.parser,
+                     "request_policy": policy, "rate_controller": rate_controller,
+                     "max_workers_limit": max(args.max_workers, args.workers),
+                     "parse_workers": args.parse_workers, "stream_parse": args.stream_parse}
+    if args.base_url:
+        engine_kwargs["base_url"] = args.base_url
+    if args.record or args.replay:
+        try:
+            engine_kwargs["archive"] = TrafficArchive(args.record or args.replay,
+                                                      mode="record" if args.record else "replay")
+        except (OSError, ValueError) as e:
+            log_message(f"❌ 无法打开存档: {e}")
+            return 2
+    # 录制时不使用页面缓存和断点记录（缓存命中或从断点恢复的页面不经过网络，不会写入存档），回放时直接使用存档
+    if not args.no_cache and not (args.record or args.replay):
+        cache_dir = args.cache_dir or os.path.join(get_app_dir(), "CACHE")
+        engine_kwargs["page_cache"] = PageCache(cache_dir, current_month_ttl=args.cache_ttl * 3600,
+                                                max_bytes=args.cache_size * 1024 * 1024)
+    if not args.no_checkpoint and not args.record:
+        engine_kwargs["journal"] = ExtractionJournal(args.checkpoint_dir or os.path.join(get_app_dir(), "CHECKPOINT"),
+                                                     current_month_ttl=args.cache_ttl * 3600)
+    # 调试文件默认写入系统临时目录，结束时删除；指定--temp-dir时保留
+    temp_dir = args.temp_dir or tempfile.mkdtemp(prefix="lnwk_")
+    engine = ScraperEngine(temp_dir, **engine_kwargs)
+    store = PriceStore(args.db) if args.db else None
+
+    try:
+        if not engine.connect(use_async=args.use_async):
+            return 2
+
+        if args.cities.strip().lower() == "all":
+            city_ids = list(engine.city_mapping)
+        else:
+            city_ids = [cid.strip() for cid in args.cities.split(",") if cid.strip()]
+        unknown = [cid for cid in city_ids if cid not in engine.city_mapping]
+        if unknown:
+            log_message(f"❌ 未知的城市ID: {', '.join(unknown)}")
+            return 2
+
+        # 材料类别可以写类别名称，查询时使用表单中对应的选项值
+        category_values = [engine.find_category(category) for category in categories]
+        unknown = [category for category, value in zip(categories, category_values) if value is None]
+        if unknown:
+            log_message(f"❌ 未知的材料类别: {', '.join(unknown)}"
+                        f"（可选: {', '.join(engine.category_mapping.values())}）")
+            return 2
+        filters = build_filters(category_values, material_names, material_ids)
+
+        output = args.output
+        merge = bool(output) and output.lower().endswith((".xlsx", ".csv") + tuple(COLUMNAR_FORMATS))
+        if output and not merge:
+            os.makedirs(output, exist_ok=True)
+
+        merged_data = ColumnarRows()
+        merged_headers = []
+        failed_jobs = []
+        skipped_jobs = 0
+        # 流式合并导出时所有任务共用一个写入器
+        merged_writer = open_stream_writer(output) if merge and args.stream else None
+        # 整个批处理的耗时统计（每个任务查询时引擎会清空自己的统计，查询前先合并）
+        run_metrics = PipelineMetrics()
+
+        if args.schedule:
+            run_metrics.merge(engine.job_metrics())
+            job_specs = [(city_id, year, month, job_filter) for city_id in city_ids
+                         for year, month in iter_months(args.start, end) for job_filter in filters]
+            merged_data, merged_headers, failed_jobs, skipped_jobs = run_scheduled(
+                args, engine, store, job_specs, output, merge, merged_writer)
+        else:
+            for city_id in city_ids:
+                city_name = engine.city_mapping[city_id]
+                for year, month in iter_months(args.start, end):
+                    for job_filter in filters:
+                        # 按条件筛选时任务说明中带上筛选条件
+                        job_label = f" {job_filter.describe(engine.category_mapping)}" if job_filter else ""
+                        job = (city_name, year, month, job_label)
+                        if policy.circuit_open:
+                            # 网站无响应时不再继续后面的任务，下次运行时从断点继续
+                            failed_jobs.append(job)
+                            continue
+                        log_message(f"📌 {city_name} {year}年{month:02d}月{job_label}")
+                        date_str = build_date_str(year, month)
+                        # 按条件筛选只得到该月的部分数据，数据库中只更新这些记录，不标记该月已完整保存
+                        partial = bool(job_filter)
+                        suffix = job_filter.file_suffix(engine.category_mapping)
+
+                        run_metrics.merge(engine.job_metrics())
+                        result = engine.query(city_id, date_str, filters=job_filter)
+                        if not result:
+                            failed_jobs.append(job)
+                            continue
+                        total_records, total_pages = result
+                        store_month = month_key(date_str)
+                        if args.sync and store.is_up_to_date(city_id, store_month, total_records):
+                            log_message("⏭️ 数据库中已是最新，跳过")
+                            skipped_jobs += 1
+                            continue
+                        if total_records == 0:
+                            if store and not partial:
+                                store.finish_month(city_id, city_name, store_month, 0, 0, 0, store.new_sync_id())
+                            continue
+
+                        if args.stream:
+                            writer = None
+                            if merged_writer:
+                                writer = merged_writer
+                            elif output:
+                                file_path = job_file_path(output, args.format, city_id, city_name, year, month, suffix)
+                                writer = open_stream_writer(file_path)
+                            sync_id = store.new_sync_id() if store else None
+                            rows_extracted = [0]
+
+                            def row_sink(rows, headers):
+                                rows_extracted[0] += len(rows)
+                                if writer:
+                                    writer.write_rows(rows, headers)
+                                if store:
+                                    store.write_rows(city_id, store_month, rows, headers, sync_id)
+
+                            completed = False
+                            try:
+                                engine.extract(city_id, date_str, total_pages, max_workers=args.workers,
+                                               row_sink=row_sink, filters=job_filter)
+                                completed = True
+                            finally:
+                                # 提取或写入数据库出错时也要关闭文件；出错时文件不完整，与没有数据的文件一样不保留
+                                if writer and writer is not merged_writer:
+                                    with engine.metrics.stage("export"):
+                                        writer.close()
+                                    if not completed or not writer.rows_written:
+                                        os.remove(writer.file_path)
+                            if writer and writer is not merged_writer:
+                                engine.log_metrics(["export"])
+                                if writer.rows_written:
+                                    log_message(f"✅ 数据已保存到: {writer.file_path}")
+                            if not rows_extracted[0]:
+                                failed_jobs.append(job)
+                                continue
+                            if store and partial:
+                                store.commit()
+                            elif store:
+                                store.finish_month(city_id, city_name, store_month, total_records, total_pages,
+                                                   rows_extracted[0], sync_id)
+                            continue
+
+                        all_data, headers = engine.extract(city_id, date_str, total_pages, max_workers=args.workers,
+                                                           filters=job_filter)
+                        if not all_data:
+                            failed_jobs.append(job)
+                            continue
+
+                        if store and partial:
+                            store.write_rows(city_id, store_month, all_data, headers, store.new_sync_id())
+                            store.commit()
+                        elif store:
+                            store.save_month(city_id, city_name, store_month, all_data, headers, total_records,
+                                             total_pages)
+                        if merge:
+                            if not merged_headers:
+                                merged_headers = headers
+                            merged_data.extend(all_data, merged_headers)
+                        elif output:
+                            file_path = job_file_path(output, args.format, city_id, city_name, year, month, suffix)
+                            with engine.metrics.stage("export"):
+                                export_to_file(all_data, headers, file_path, log=log_message)
+                            engine.log_metrics(["export"])
+
+        if merge and merged_data:
+            with engine.metrics.stage("export"):
+                export_to_file(merged_data, merged_headers, output, log=log_message)
+        if merged_writer:
+            with engine.metrics.stage("export"):
+                merged_writer.close()
+            log_message(f"✅ 数据已保存到: {merged_writer.file_path}，共 {merged_writer.rows_written} 条记录")
+
+        run_metrics.merge(engine.job_metrics())
+        log_message("📊 批处理合计")
+        for line in run_metrics.summary_lines():
+            log_message(line)
+        if args.metrics:
+            try:
+                run_metrics.write(args.metrics)
+                log_message(f"✅ 耗时统计已保存到: {args.metrics}")
+            except OSError as e:
+                log_message(f"⚠️  耗时统计写入失败: {e}")
+
+        if store:
+            log_message(f"📊 数据库共保存 {store.count_rows()} 条记录（本次跳过 {skipped_jobs} 个已是最新的月份）")
+
+        if policy.circuit_open:
+            log_message("❌ 网站连续无响应，已停止批处理，未完成的任务可稍后重新运行")
+        if failed_jobs:
+            for city_name, year, month, job_label in failed_jobs:
+                log_message(f"⚠️  未完成: {city_name} {year}年{month:02d}月{job_label}")
+            return 1
+
+        log_message("🎉 批处理完成")
+        return 0
+    finally:
+        engine.close()
+        if store:
+            store.close()
+        if engine.archive is not None:
+            engine.archive.close()
+        if not args.temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # 打包为exe后多进程解析需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
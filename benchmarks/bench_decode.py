@@ -0,0 +1,93 @@
+"""页面解码基准测试
+
+对比每页的解码耗时：
+- 逐页检测: 原先的写法，每个响应都做字符集检测（apparent_encoding）后再解码
+- 固定编码: 连接时识别一次编码，之后直接严格解码原始字节
+
+用法:
+    python -m benchmarks.bench_decode                  # 使用生成的示例页面（GBK编码）
+    python -m benchmarks.bench_decode --pages CACHE    # 使用缓存目录中保存的真实页面
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from async_fetcher import FetchResult
+from page_encoding import decode_content, detect_encoding
+from benchmarks.sample_pages import render_data_page
+
+
+def load_raw_pages(pages_dir):
+    """读取缓存的原始页面字节"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.page'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+
+def decode_detect(content):
+    response = FetchResult('', 200, content)
+    encoding = response.apparent_encoding or 'gbk'
+    return content.decode(encoding, errors='replace')
+
+
+def bench(decode, pages, repeat):
+    """返回每页耗时列表（秒）和解码结果"""
+    timings = []
+    results = []
+    for _ in range(repeat):
+        results = []
+        for content in pages:
+            start = time.perf_counter()
+            results.append(decode(content))
+            timings.append(time.perf_counter() - start)
+    return timings, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="页面解码基准测试")
+    parser.add_argument("--pages", help="保存原始页面的目录（.page文件）")
+    parser.add_argument("--sample-pages", type=int, default=10, help="未指定--pages时生成的示例页面数")
+    parser.add_argument("--repeat", type=int, default=5, help="每个页面重复解码的次数")
+    args = parser.parse_args(argv)
+
+    if args.pages:
+        pages = load_raw_pages(args.pages)
+    else:
+        pages = [render_data_page(page_no, total_records=args.sample_pages * 50).encode('gbk')
+                 for page_no in range(1, args.sample_pages + 1)]
+    if not pages:
+        print("未找到页面")
+        return 1
+
+    # 连接时识别一次编码
+    start = time.perf_counter()
+    encoding = detect_encoding(FetchResult('', 200, pages[0]))
+    detect_cost = (time.perf_counter() - start) * 1000
+    print(f"页面数: {len(pages)}，重复次数: {args.repeat}，识别的编码: {encoding}（识别耗时 {detect_cost:.2f} ms，每个会话一次）")
+
+    def decode_pinned(content):
+        text = decode_content(content, encoding)
+        if text is None:
+            text = content.decode(detect_encoding(FetchResult('', 200, content)), errors='replace')
+        return text
+
+    print(f"{'写法':<10}{'中位数(ms)':>12}{'P95(ms)':>10}{'输出一致':>10}")
+    baseline = None
+    for name, decode in (("逐页检测", decode_detect), ("固定编码", decode_pinned)):
+        timings, results = bench(decode, pages, args.repeat)
+        if baseline is None:
+            baseline = results
+        timings.sort()
+        median = statistics.median(timings) * 1000
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)] * 1000
+        same = "是" if results == baseline else "否"
+        print(f"{name:<10}{median:>12.3f}{p95:>10.3f}{same:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
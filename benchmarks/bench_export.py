@@ -0,0 +1,102 @@
+"""Excel导出基准测试
+
+对比三种写法在不同数据量下的耗时和文件大小：
+- 逐单元格样式: 原先的写法，pandas写入后逐个单元格设置字体、边框、底色和行高
+- 快速样式:     StreamingXlsxWriter，样式预先登记，单元格直接引用
+- 无样式:       StreamingXlsxWriter(styled=False)，作为速度上限
+
+用法:
+    python -m benchmarks.bench_export                        # 10k、100k、500k行
+    python -m benchmarks.bench_export --rows 10000,50000 --legacy-max 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from exporters import StreamingXlsxWriter
+from benchmarks.sample_pages import HEADERS, sample_rows
+
+
+def legacy_export(rows, headers, file_path):
+    """原先的导出写法（逐单元格设置样式）"""
+    import pandas as pd
+    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+
+    df = pd.DataFrame(rows, columns=headers)
+    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='材料价格')
+        worksheet = writer.sheets['材料价格']
+
+        header_font = Font(bold=True, color="FFFFFF", size=10)
+        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+        data_font = Font(size=10)
+        data_alignment = Alignment(horizontal="left", vertical="center", wrap_text=False)
+        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                             top=Side(style='thin'), bottom=Side(style='thin'))
+
+        for col_num in range(1, len(headers) + 1):
+            cell = worksheet.cell(row=1, column=col_num)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            cell.border = thin_border
+        for row_num in range(2, len(df) + 2):
+            for col_num in range(1, len(headers) + 1):
+                cell = worksheet.cell(row=row_num, column=col_num)
+                cell.font = data_font
+                cell.alignment = data_alignment
+                cell.border = thin_border
+        for column in worksheet.columns:
+            max_length = max(len(str(cell.value)) for cell in column)
+            worksheet.column_dimensions[column[0].column_letter].width = min(max_length + 2, 100)
+        worksheet.row_dimensions[1].height = 21
+        for row_num in range(2, len(df) + 2):
+            worksheet.row_dimensions[row_num].height = 21
+        even_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
+        for row_num in range(2, len(df) + 2, 2):
+            for col_num in range(1, len(headers) + 1):
+                worksheet.cell(row=row_num, column=col_num).fill = even_fill
+
+
+def writer_export(rows, headers, file_path, styled):
+    writer = StreamingXlsxWriter(file_path, styled=styled)
+    # 按每页50行写入，与提取时的流式导出一致
+    for start in range(0, len(rows), 50):
+        writer.write_rows(rows[start:start + 50], headers)
+    writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Excel导出基准测试")
+    parser.add_argument("--rows", default="10000,100000,500000", help="数据行数，多个用逗号分隔")
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="逐单元格样式写法只在不超过该行数时运行（耗时和内存较大）")
+    args = parser.parse_args(argv)
+
+    methods = [
+        ("逐单元格样式", lambda rows, path: legacy_export(rows, HEADERS, path)),
+        ("快速样式", lambda rows, path: writer_export(rows, HEADERS, path, styled=True)),
+        ("无样式", lambda rows, path: writer_export(rows, HEADERS, path, styled=False)),
+    ]
+
+    print(f"{'行数':>8}  {'写法':<12}{'耗时(s)':>10}{'行/秒':>12}{'文件(KB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in (int(value) for value in args.rows.split(',')):
+            rows = sample_rows(count)
+            for name, export in methods:
+                if name == "逐单元格样式" and count > args.legacy_max:
+                    print(f"{count:>8}  {name:<12}{'跳过':>10}")
+                    continue
+                path = os.path.join(tmp_dir, f"{count}.xlsx")
+                start = time.perf_counter()
+                export(rows, path)
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(path) / 1024
+                print(f"{count:>8}  {name:<12}{elapsed:>10.2f}{count / elapsed:>12.0f}{size:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
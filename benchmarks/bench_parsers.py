@@ -0,0 +1,112 @@
+"""页面解析后端基准测试
+
+对比各解析后端的单页解析耗时和内存峰值，并校验输出与默认后端一致。
+
+用法:
+    python -m benchmarks.bench_parsers                     # 使用生成的示例页面
+    python -m benchmarks.bench_parsers --pages CACHE       # 使用缓存目录中保存的真实页面
+    python -m benchmarks.bench_parsers --pages TEMP --repeat 20
+    python -m benchmarks.bench_parsers --archive traffic.db  # 使用录制的请求存档中的数据页面
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+import tracemalloc
+
+from page_encoding import DEFAULT_ENCODING, decode_content
+from page_parsers import DEFAULT_BACKEND, TableLocator, available_backends, parse_html
+from benchmarks.sample_pages import render_data_page
+
+
+def load_pages(pages_dir, encoding):
+    """读取保存的页面：.page为缓存的原始字节，.html为调试文件（UTF-8）"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.page'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read().decode(encoding, errors='replace'))
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def load_archive_pages(archive_path):
+    """读取请求存档中录制的数据页面"""
+    from traffic_archive import TrafficArchive
+    archive = TrafficArchive(archive_path, mode='replay')
+    try:
+        pages = []
+        for url, status, content in archive.iter_responses('jgxx_cl1.asp'):
+            # 只取数据页面（带页码），跳过查询表单页面
+            html = decode_content(content, DEFAULT_ENCODING) if status == 200 and 'pageno=' in url else None
+            if html:
+                pages.append(html)
+        return pages
+    finally:
+        archive.close()
+
+
+def bench_backend(backend, pages, repeat, use_locator=False):
+    """返回(每页耗时列表, 内存峰值字节数, 解析结果)
+
+    use_locator: 使用TableLocator记住数据表格位置，跳过后续页面的表格打分
+    """
+    timings = []
+    results = []
+    locator = TableLocator() if use_locator else None
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            parse_html(html, backend, locator)
+            timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for html in pages:
+        results.append(parse_html(html, backend, locator))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="页面解析后端基准测试")
+    parser.add_argument("--pages", help="保存页面的目录（.page原始字节或.html调试文件）")
+    parser.add_argument("--archive", help="请求存档文件（batch_cli.py --record录制）")
+    parser.add_argument("--encoding", default="gbk", help=".page文件的编码，默认gbk")
+    parser.add_argument("--sample-pages", type=int, default=10, help="未指定--pages时生成的示例页面数")
+    parser.add_argument("--repeat", type=int, default=5, help="每个页面重复解析的次数")
+    args = parser.parse_args(argv)
+
+    if args.archive:
+        pages = load_archive_pages(args.archive)
+    elif args.pages:
+        pages = load_pages(args.pages, args.encoding)
+    else:
+        pages = [render_data_page(page_no, total_records=args.sample_pages * 50)
+                 for page_no in range(1, args.sample_pages + 1)]
+    if not pages:
+        print("未找到页面")
+        return 1
+
+    print(f"页面数: {len(pages)}，重复次数: {args.repeat}")
+    print(f"{'后端':<16}{'中位数(ms)':>8}{'P95(ms)':>10}{'峰值内存(KB)':>14}{'输出一致':>10}")
+
+    baseline = None
+    for backend in [DEFAULT_BACKEND] + [b for b in available_backends() if b != DEFAULT_BACKEND]:
+        for use_locator in (False, True):
+            timings, peak, results = bench_backend(backend, pages, args.repeat, use_locator)
+            if baseline is None:
+                baseline = results
+            timings.sort()
+            median = statistics.median(timings) * 1000
+            p95 = timings[max(0, int(len(timings) * 0.95) - 1)] * 1000
+            same = "是" if results == baseline else "否"
+            name = f"{backend}+定位" if use_locator else backend
+            print(f"{name:<16}{median:>8.2f}{p95:>10.2f}{peak / 1024:>14.0f}{same:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+"""完整流程基准测试（连接 → 查询 → 提取 → 导出）
+
+在本机启动替身服务器，按真实流程运行提取引擎，测量各阶段的耗时、吞吐量和内存峰值。
+结果可以保存为JSON，之后与保存的基准结果比较，吞吐量下降超过容差时以退出码1结束，可作为回归门禁。
+
+用法:
+    python -m benchmarks.bench_pipeline                                   # 默认2000条记录（40页）
+    python -m benchmarks.bench_pipeline --records 10000 --latency 30 --workers 8
+    python -m benchmarks.bench_pipeline --async --parser lxml --memory
+    python -m benchmarks.bench_pipeline --save baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from page_parsers import DEFAULT_BACKEND, available_backends
+from scraper_core import ScraperEngine, build_date_str, export_to_file
+from benchmarks.standin_server import StandInServer
+
+CITY_ID = '15'
+
+
+def measure(results, stage, func, memory, count=None, unit=None):
+    """执行一个阶段并记录耗时、吞吐量和内存峰值，返回func的结果"""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    entry = {'seconds': elapsed}
+    if count is not None and elapsed > 0:
+        entry['throughput'] = count / elapsed
+        entry['unit'] = unit
+    if peak is not None:
+        entry['peak_kb'] = peak / 1024
+    results[stage] = entry
+    return value
+
+
+def run(args):
+    """运行一次完整流程，返回各阶段结果"""
+    results = {}
+    server = StandInServer(records=args.records, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                           error_rate=args.error_rate, seed=1).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log = print if args.verbose else None
+            engine = ScraperEngine(os.path.join(tmp_dir, 'TEMP'), log=log, base_url=server.base_url,
+                                   max_workers=args.workers, parser_backend=args.parser,
+                                   parse_workers=args.parse_workers)
+            try:
+                connected = measure(results, 'connect', lambda: engine.connect(use_async=args.use_async), args.memory)
+                if not connected:
+                    raise RuntimeError("连接替身服务器失败")
+
+                date_str = build_date_str(2025, 1)
+                query = measure(results, 'query', lambda: engine.query(CITY_ID, date_str), args.memory)
+                expected_pages = server.total_pages(CITY_ID)
+                if not query or query != (args.records, expected_pages):
+                    results['query']['mismatch'] = f"查询结果 {query}，应为 {(args.records, expected_pages)}"
+
+                # 按替身服务器的实际页数提取，查询结果有误时也能测量提取速度
+                data, headers = measure(
+                    results, 'extract',
+                    lambda: engine.extract(CITY_ID, date_str, expected_pages, max_workers=args.workers),
+                    args.memory, count=expected_pages, unit='页/秒')
+                results['extract']['rows'] = len(data)
+                results['extract']['rows_per_second'] = len(data) / results['extract']['seconds']
+                if len(data) != args.records:
+                    results['extract']['mismatch'] = f"提取 {len(data)} 条，应为 {args.records} 条"
+
+                for extension in ('csv', 'xlsx'):
+                    path = os.path.join(tmp_dir, f"export.{extension}")
+                    measure(results, f'export_{extension}', lambda: export_to_file(data, headers, path),
+                            args.memory, count=len(data), unit='行/秒')
+            finally:
+                engine.close()
+    finally:
+        results['server'] = {'requests': server.requests, 'bytes': server.bytes_sent, 'errors': server.errors}
+        server.stop()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基准结果比较吞吐量，返回下降超过容差的阶段说明"""
+    regressions = []
+    for stage, entry in baseline.items():
+        old = entry.get('throughput')
+        new = results.get(stage, {}).get('throughput')
+        if old and new is not None and new < old * (1 - tolerance):
+            regressions.append(f"{stage}: {new:.1f} < {old:.1f} {entry.get('unit', '')}（下降 {1 - new / old:.0%}）")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="完整流程基准测试")
+    parser.add_argument("--records", type=int, default=2000, help="替身服务器的记录数，默认2000（40页）")
+    parser.add_argument("--latency", type=float, default=20, help="替身服务器的响应延迟（毫秒），默认20")
+    parser.add_argument("--jitter", type=float, default=5, help="响应延迟的随机波动（毫秒），默认5")
+    parser.add_argument("--error-rate", type=float, default=0, help="替身服务器返回500错误的比例")
+    parser.add_argument("--workers", type=int, default=4, help="并发提取的工作线程数，默认4")
+    parser.add_argument("--parse-workers", type=int, default=0, help="解析进程数，默认0（在网络线程中解析）")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="使用asyncio异步传输")
+    parser.add_argument("--parser", choices=available_backends(), default=DEFAULT_BACKEND, help="页面解析后端")
+    parser.add_argument("--memory", action="store_true", help="测量各阶段的内存峰值（tracemalloc会降低速度）")
+    parser.add_argument("--verbose", action="store_true", help="输出提取引擎的日志")
+    parser.add_argument("--save", help="把结果保存为JSON文件")
+    parser.add_argument("--compare", help="与保存的JSON基准结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的吞吐量下降比例，默认0.2")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+
+    print(f"记录数: {args.records}，延迟: {args.latency:g}ms，并发数: {args.workers}，"
+          f"传输: {'asyncio' if args.use_async else 'requests'}，解析器: {args.parser}")
+    print(f"{'阶段':<12}{'耗时(s)':>10}{'吞吐量':>16}{'内存峰值(KB)':>14}")
+    for stage in ('connect', 'query', 'extract', 'export_csv', 'export_xlsx'):
+        entry = results[stage]
+        throughput = f"{entry['throughput']:.1f} {entry['unit']}" if 'throughput' in entry else ''
+        peak = f"{entry['peak_kb']:.0f}" if 'peak_kb' in entry else ''
+        print(f"{stage:<12}{entry['seconds']:>10.3f}{throughput:>16}{peak:>14}")
+        if 'mismatch' in entry:
+            print(f"  ⚠️  {entry['mismatch']}")
+    server = results['server']
+    print(f"服务器: {server['requests']} 个请求，{server['bytes'] / 1024:.0f} KB，{server['errors']} 个错误")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ 吞吐量下降超过容差:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✅ 吞吐量没有明显下降")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
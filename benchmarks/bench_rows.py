@@ -0,0 +1,73 @@
+"""数据行保存方式基准测试
+
+对比数据行列表和按列保存（ColumnarRows）在不同数据量下的内存占用、生成DataFrame和导出CSV的耗时。
+
+用法:
+    python -m benchmarks.bench_rows                      # 10k、100k、500k行
+    python -m benchmarks.bench_rows --rows 10000,50000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from columnar import ColumnarRows
+from scraper_core import export_to_file
+from benchmarks.sample_pages import HEADERS, sample_rows
+
+PAGE_SIZE = 50
+
+
+def build_rows(template, store):
+    """按页追加数据行，每个单元格都是新的字符串对象（与解析结果一致）"""
+    for start in range(0, len(template), PAGE_SIZE):
+        page = [[''.join(cell) for cell in row] for row in template[start:start + PAGE_SIZE]]
+        if isinstance(store, ColumnarRows):
+            store.extend(page, HEADERS)
+        else:
+            store.extend(page)
+    return store
+
+
+def measure(template, factory):
+    """返回(数据, 内存占用字节数)"""
+    tracemalloc.start()
+    data = build_rows(template, factory())
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, current
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据行保存方式基准测试")
+    parser.add_argument("--rows", default="10000,100000,500000", help="测试的数据行数，逗号分隔")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    pd.DataFrame([['预热']])
+
+    print(f"{'行数':>8}{'方式':>10}{'内存(MB)':>12}{'DataFrame(s)':>14}{'CSV(s)':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for count in [int(n) for n in args.rows.split(',')]:
+            template = sample_rows(count)
+            for name, factory in (('列表', list), ('按列', ColumnarRows)):
+                data, memory = measure(template, factory)
+                if isinstance(data, ColumnarRows):
+                    frame_seconds = timed(data.to_dataframe)
+                else:
+                    frame_seconds = timed(lambda: pd.DataFrame(data, columns=HEADERS))
+                csv_seconds = timed(lambda: export_to_file(data, HEADERS, os.path.join(temp_dir, f"{name}.csv")))
+                print(f"{count:>8}{name:>10}{memory / 1024 / 1024:>12.1f}{frame_seconds:>14.2f}{csv_seconds:>10.2f}")
+                data = None  # 释放本轮数据再测下一种方式
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+"""生成与网站结构一致的示例页面，供基准测试使用"""
+
+HEADERS = ['序号', '材料名称', '规格型号', '单位', '价格(元)', '备注', '发布地区', '发布时间', '材料类别']
+
+CATEGORIES = ['钢材', '水泥', '混凝土', '木材', '砂石', '管材', '电线电缆', '防水材料']
+UNITS = ['吨', '立方米', 'm', '块', 'kg', '㎡']
+
+
+def row_category(i):
+    """第i条示例记录的材料类别"""
+    return CATEGORIES[i % len(CATEGORIES)]
+
+
+def row_name(i):
+    """第i条示例记录的材料名称"""
+    return f"{row_category(i)}材料{i}"
+
+
+def render_rows(start, count, city_name='沈阳市', date_str='2025/01/20', indices=None):
+    """生成数据行的HTML，indices为筛选后的记录序号列表（为None时为全部记录）"""
+    rows = []
+    for position in range(start, start + count):
+        i = indices[position] if indices is not None else position
+        category = row_category(i)
+        rows.append(
+            f"<tr bgcolor=\"#ffffff\"><td align=\"center\">{i + 1}</td>"
+            f"<td>{row_name(i)}</td><td>规格 {i % 37}×{i % 11}</td>"
+            f"<td align=\"center\">{UNITS[i % len(UNITS)]}</td><td align=\"right\">{3000 + i % 997}.00</td>"
+            f"<td>&nbsp;</td><td>{city_name}</td><td>{date_str}</td><td>{category}</td></tr>"
+        )
+    return '\n'.join(rows)
+
+
+def render_data_page(page_no=1, total_records=500, per_page=50, city_name='沈阳市', date_str='2025/01/20',
+                     indices=None):
+    """生成一页数据页面的HTML（含布局表格、数据表格和分页信息）
+
+    indices: 按查询条件筛选后的记录序号列表，提供时total_records为筛选后的记录数
+    """
+    if indices is not None:
+        total_records = len(indices)
+    total_pages = max(1, (total_records + per_page - 1) // per_page)
+    start = (page_no - 1) * per_page
+    count = max(0, min(per_page, total_records - start))
+    header_html = ''.join(f"<td align=\"center\"><b>{h}</b></td>" for h in HEADERS)
+    return f"""<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312">
+<title>辽宁省建设工程材料价格信息</title><style>td {{ font-size: 12px; }}</style>
+<script>function go(p) {{ location.href = '?pageno=' + p; }}</script></head>
+<body>
+<table width="100%" border="0"><tr><td><img src="logo.gif"></td><td>辽宁省建设工程材料价格信息网</td></tr></table>
+<table width="100%" border="0"><tr><td><a href="index.asp">首页</a></td><td><a href="jgxx_clcx.asp">价格查询</a></td></tr></table>
+<table width="98%" border="1" cellspacing="0" cellpadding="2" bgcolor="#cccccc">
+<tr bgcolor="#e6e6e6">{header_html}</tr>
+{render_rows(start, count, city_name, date_str, indices)}
+</table>
+<table width="98%"><tr><td>共找到{total_records}条信息 第{page_no}/{total_pages}页
+<a href="javascript:go(1)">首页</a> <a href="javascript:go({max(1, page_no - 1)})">上一页</a>
+<a href="javascript:go({min(total_pages, page_no + 1)})">下一页</a> <a href="javascript:go({total_pages})">尾页</a></td></tr></table>
+<!-- 页脚 --><table width="100%"><tr><td>版权所有 辽宁省建设工程造价管理总站</td></tr></table>
+</body></html>"""
+
+
+def sample_rows(count, city_name='沈阳市', date_str='2025/01/20'):
+    """生成与解析结果结构相同的数据行（字符串列表）"""
+    rows = []
+    for i in range(count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        rows.append([str(i + 1), f"{category}材料{i}", f"规格 {i % 37}×{i % 11}", UNITS[i % len(UNITS)],
+                     f"{3000 + i % 997}.00", '', city_name, date_str, category])
+    return rows
+
+
+def render_busy_page():
+    """生成网站繁忙时返回的页面HTML（状态码200，只有布局表格和提示信息，没有数据表格）"""
+    return """<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312">
+<title>辽宁省建设工程材料价格信息</title></head>
+<body>
+<table width="100%" border="0"><tr><td><img src="logo.gif"></td><td>辽宁省建设工程材料价格信息网</td></tr></table>
+<table width="98%" border="1"><tr><td>系统繁忙，请稍后再试</td></tr></table>
+</body></html>"""
+
+
+def render_main_page():
+    """生成主入口页面（jgxx_clcx.asp）的HTML"""
+    return """<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312">
+<title>辽宁省建设工程材料价格信息</title></head>
+<body><frameset><frame src="jgxx_cl1.asp?view=hidden"></frameset>
+<table width="100%"><tr><td>材料价格查询</td></tr></table></body></html>"""
+
+
+def render_form_page(city_mapping, categories=CATEGORIES):
+    """生成查询表单页面（jgxx_cl1.asp?view=hidden）的HTML，含城市和材料类别下拉框"""
+    city_options = ''.join(f'<option value="{cid}">{name}</option>' for cid, name in city_mapping.items())
+    category_options = ''.join(f'<option value="{name}">{name}</option>' for name in categories)
+    return f"""<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312">
+<title>辽宁省建设工程材料价格信息</title></head>
+<body><form name="form1" method="get" action="jgxx_cl1.asp">
+<table><tr><td>地区：<select name="dq_id"><option value="-1">请选择</option>{city_options}</select></td>
+<td>材料类别：<select name="cllb"><option value="">全部</option>{category_options}</select></td>
+<td>材料名称：<input type="text" name="clmc"></td>
+<td>时间：<input type="text" name="time1"></td>
+<td><input type="submit" value="查询"></td></tr></table>
+</form></body></html>"""
@@ -0,0 +1,204 @@
+"""离线替身服务器
+
+在本机模拟价格网站的 jgxx_clcx.asp（主入口）和 jgxx_cl1.asp（查询表单和数据页面），
+页面使用GBK编码，布局、"共找到N条信息"和"x/y"分页信息与真实网站一致。
+可以设置每个城市每月的记录数、响应延迟、错误率、繁忙页面比例和超时率，用于基准测试和回归测试，不访问真实网站。
+
+单独运行:
+    python -m benchmarks.standin_server --port 8765 --records 2000 --latency 50
+    python batch_cli.py --base-url http://127.0.0.1:8765 --cities 15 --start 2025-01 --output out.csv
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from scraper_core import DEFAULT_CITY_MAPPING
+from benchmarks.sample_pages import (CATEGORIES, render_busy_page, render_data_page, render_form_page, render_main_page,
+                                     row_category, row_name)
+
+
+class StandInServer:
+    """价格网站替身服务器（在后台线程中运行）
+
+    records: 每个(城市, 月份)的记录数，也可以是{城市ID: 记录数}
+    per_page: 每页记录数
+    latency / jitter: 每个响应的延迟及其随机波动（秒）
+    error_rate: 返回500错误的比例
+    stall_rate / stall_seconds: 长时间不响应（触发读取超时）的比例和时长
+    busy_rate: 数据页面返回"系统繁忙"页面（状态码200，没有数据表格）的比例
+    seed: 随机数种子，便于重复测试
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, records=500, per_page=50, latency=0.0, jitter=0.0,
+                 error_rate=0.0, stall_rate=0.0, stall_seconds=60.0, busy_rate=0.0, city_mapping=None, seed=None):
+        self.records = records
+        self.per_page = per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.busy_rate = busy_rate
+        self.city_mapping = dict(city_mapping or DEFAULT_CITY_MAPPING)
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.errors = 0
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def records_for(self, city_id):
+        if isinstance(self.records, dict):
+            return self.records.get(city_id, 0)
+        return self.records
+
+    def total_pages(self, city_id):
+        return max(1, (self.records_for(city_id) + self.per_page - 1) // self.per_page)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _roll(self):
+        """决定本次响应的行为：'ok'、'error'、'stall' 或 'busy'"""
+        with self._lock:
+            value = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if value < self.error_rate:
+            return 'error', delay
+        if value < self.error_rate + self.stall_rate:
+            return 'stall', delay
+        if value < self.error_rate + self.stall_rate + self.busy_rate:
+            return 'busy', delay
+        return 'ok', delay
+
+    def render(self, path, query):
+        """生成请求路径对应的页面HTML，未知路径返回None"""
+        if path.endswith('jgxx_clcx.asp'):
+            return render_main_page()
+        if not path.endswith('jgxx_cl1.asp'):
+            return None
+        if 'pageno' not in query:
+            return render_form_page(self.city_mapping, CATEGORIES)
+
+        city_id = query.get('dq_id', [''])[0]
+        date_str = query.get('time1', [''])[0]
+        try:
+            page_no = int(query['pageno'][0])
+        except ValueError:
+            page_no = 1
+        return render_data_page(page_no, total_records=self.records_for(city_id), per_page=self.per_page,
+                                city_name=self.city_mapping.get(city_id, ''), date_str=date_str,
+                                indices=self.filtered_indices(city_id, query))
+
+    def filtered_indices(self, city_id, query):
+        """按材料类别（cllb）和材料名称（clmc，包含匹配）筛选记录，没有条件时返回None"""
+        category = query.get('cllb', [''])[0]
+        name = query.get('clmc', [''])[0]
+        if not category and not name:
+            return None
+        return [i for i in range(self.records_for(city_id))
+                if (not category or row_category(i) == category) and (not name or name in row_name(i))]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                # 查询参数按GBK解码（与真实网站一致）
+                query = {}
+                for pair in parts.query.split('&'):
+                    if '=' in pair:
+                        key, value = pair.split('=', 1)
+                        query.setdefault(key, []).append(unquote_to_bytes(value.replace('+', ' ')).decode('gbk', errors='replace'))
+
+                behaviour, delay = server._roll()
+                if delay:
+                    time.sleep(delay)
+                if behaviour == 'stall':
+                    time.sleep(server.stall_seconds)
+
+                html = server.render(parts.path, query) if behaviour != 'error' else None
+                if behaviour == 'busy' and html is not None and 'pageno' in query:
+                    html = render_busy_page()
+                if html is None:
+                    status = 500 if behaviour == 'error' else 404
+                    body = b'<html><body>Server Error</body></html>'
+                else:
+                    status = 200
+                    body = html.encode('gbk')
+
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+                    if status != 200:
+                        server.errors += 1
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/html')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    # 客户端已超时断开
+                    pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="价格网站离线替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--records", type=int, default=500, help="每个城市每月的记录数，默认500")
+    parser.add_argument("--latency", type=float, default=0, help="每个响应的延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0, help="延迟的随机波动（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="返回500错误的比例（0~1）")
+    parser.add_argument("--stall-rate", type=float, default=0, help="长时间不响应的比例（0~1）")
+    parser.add_argument("--stall-seconds", type=float, default=60, help="不响应的时长（秒）")
+    parser.add_argument("--busy-rate", type=float, default=0, help="数据页面返回繁忙页面（没有数据表格）的比例（0~1）")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(args.host, args.port, records=args.records, latency=args.latency / 1000,
+                           jitter=args.jitter / 1000, error_rate=args.error_rate, stall_rate=args.stall_rate,
+                           stall_seconds=args.stall_seconds, busy_rate=args.busy_rate, seed=args.seed)
+    print(f"替身服务器已启动: {server.base_url}（Ctrl+C停止）")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
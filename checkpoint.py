@@ -0,0 +1,135 @@
+"""提取断点记录
+
+每提取完成一页，就把该页数据追加到断点文件（JSONL，每行一页），
+程序中断（网络断开、关闭窗口、崩溃）后重新提取同一(城市, 日期)时，
+已完成的页面直接从断点文件读取，只提取缺失和失败的页面。
+全部页面提取成功后删除断点文件。当前月份的数据还会更新，断点记录与页面缓存一样有有效期，
+过期后重新提取全部页面，不把旧的页面与新下载的页面混在一起。
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from page_cache import PageCache
+
+
+class ExtractionJournal:
+    """断点文件目录
+
+    journal_dir: 断点文件目录（不要放在退出时会被清理的TEMP目录下）
+    current_month_ttl: 当前月份断点记录的有效期（秒），与页面缓存的有效期相同
+    """
+
+    def __init__(self, journal_dir, current_month_ttl=6 * 3600):
+        self.journal_dir = journal_dir
+        self.current_month_ttl = current_month_ttl
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+    def _path(self, city_id, date_str, *extra_key):
+        """根据(城市ID, 日期)计算断点文件路径，文件名保留可读的城市和日期"""
+        name = re.sub(r'[^0-9A-Za-z]+', '-', f"{city_id}_{date_str}").strip('-')
+        if extra_key:
+            digest = hashlib.sha1('|'.join(str(part) for part in extra_key).encode('utf-8')).hexdigest()
+            name = f"{name}_{digest[:12]}"
+        return os.path.join(self.journal_dir, f"{name}.jsonl")
+
+    def open(self, city_id, date_str, total_pages, *extra_key):
+        """打开(城市ID, 日期)的断点记录，返回JobJournal
+
+        total_pages: 查询得到的网站总页数（不是本次要提取的页数）
+        """
+        max_age = None if PageCache.is_historical(date_str) else self.current_month_ttl
+        return JobJournal(self._path(city_id, date_str, *extra_key), total_pages, max_age)
+
+    def failed_pages(self, city_id, date_str, *extra_key):
+        """返回断点文件中记录的失败页码"""
+        path = self._path(city_id, date_str, *extra_key)
+        if not os.path.exists(path):
+            return []
+        return sorted(JobJournal.read(path)[3])
+
+
+class JobJournal:
+    """一个(城市, 日期)提取任务的断点记录
+
+    completed: {页码: (数据行, 表头)}，已成功提取的页面
+    failed: 重试后仍然失败的页码
+    max_age: 断点记录的有效期（秒），从创建断点文件时开始计算；为None时不过期
+    """
+
+    def __init__(self, path, total_pages, max_age=None):
+        self.path = path
+        self.total_pages = total_pages
+        self._lock = threading.Lock()
+
+        recorded_pages, created, self.completed, self.failed = (
+            self.read(path) if os.path.exists(path) else (None, None, {}, set()))
+        # 网站的总页数变化后或断点记录过期后，之前的断点不再有效
+        expired = max_age is not None and (created is None or time.time() - created > max_age)
+        if recorded_pages != total_pages or expired:
+            self.completed, self.failed = {}, set()
+            self._file = open(path, 'w', encoding='utf-8')
+            self._append({'total_pages': total_pages, 'created': time.time()})
+        else:
+            self._file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def read(path):
+        """读取断点文件，返回(总页数, 创建时间, 已完成页面, 失败页码)；忽略写了一半的最后一行"""
+        total_pages = None
+        created = None
+        completed = {}
+        failed = set()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if 'total_pages' in record:
+                    total_pages = record['total_pages']
+                    created = record.get('created')
+                elif record.get('status') == 'ok':
+                    completed[record['page']] = (record['rows'], record['headers'])
+                    failed.discard(record['page'])
+                else:
+                    failed.add(record['page'])
+        return total_pages, created, completed, failed
+
+    def _append(self, record):
+        """追加一条记录并写入磁盘"""
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record_page(self, page_no, rows, headers):
+        """记录成功提取的页面"""
+        with self._lock:
+            self._append({'page': page_no, 'status': 'ok', 'headers': headers, 'rows': rows})
+            self.completed[page_no] = (rows, headers)
+            self.failed.discard(page_no)
+
+    def record_failure(self, page_no):
+        """记录重试后仍然失败的页面"""
+        with self._lock:
+            self._append({'page': page_no, 'status': 'failed'})
+            self.failed.add(page_no)
+
+    def end_at(self, last_page):
+        """网站的数据到last_page页为止，之后的页面不再需要提取"""
+        with self._lock:
+            self.total_pages = min(self.total_pages, last_page)
+            self.completed = {page_no: page for page_no, page in self.completed.items() if page_no <= last_page}
+            self.failed = {page_no for page_no in self.failed if page_no <= last_page}
+
+    def close(self):
+        """关闭断点文件；全部页面都已成功提取时删除断点文件"""
+        self._file.close()
+        if len(self.completed) >= self.total_pages and not self.failed:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,268 @@
+"""按列保存的提取数据
+
+每行一个字符串列表的保存方式中，单位、发布地区、发布时间、材料类别等列在几千行里反复出现同样的几个值，
+价格也都是字符串。这里改为按列保存：
+- 重复值多的列按字典编码（每个不同的值只保存一次，每行只保存4字节的编号）；
+- 序号、价格保存为浮点数和小数位数，导出时还原出与网页完全相同的文本；
+- 其余列（材料名称、规格型号）保存为字符串列表。
+对外接口与数据行列表相同（len、迭代、下标、切片），导出和入库的代码不需要区分两种保存方式；
+to_dataframe直接由各列生成DataFrame，字典编码的列生成分类类型，不再逐个单元格复制；
+to_arrow生成列类型固定的Arrow表（价格为浮点数、发布时间为日期），用于Parquet/Feather导出。
+"""
+import math
+import re
+from array import array
+
+from exporters import clean_cell
+from price_store import parse_price
+
+# 按字典编码保存的列
+CATEGORICAL_HEADERS = frozenset(['单位', '备注', '发布地区', '发布时间', '材料类别'])
+# 保存为数值的列
+NUMERIC_HEADERS = frozenset(['序号', '价格(元)'])
+# typed=True时转换为日期类型的列
+DATE_HEADERS = frozenset(['发布时间'])
+
+# 能按数值保存且可以原样还原的文本：没有多余的前导零，有效数字不超过浮点数的精度
+_NUMBER_RE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.(\d+))?\Z')
+_MAX_NUMBER_LENGTH = 15
+# 发布时间的常见格式，按顺序尝试；都不匹配的值逐个由pandas推断，无法识别的为空值
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y年%m月%d日', '%Y.%m.%d', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S')
+
+
+def clean_values(values):
+    """确保一列字符串都是有效的UTF-8；整列一次检查，只有包含无效字符时才逐个清理"""
+    try:
+        ''.join(values).encode('utf-8')
+        return list(values)
+    except (UnicodeEncodeError, TypeError):
+        return [clean_cell(value) for value in values]
+
+
+def parse_dates(values):
+    """把日期文本转换为日期时间（Series），兼容pandas 1.x（不使用format='mixed'）"""
+    import pandas as pd
+    texts = pd.Series(values, dtype=object)
+    parsed = pd.Series(pd.NaT, index=texts.index, dtype='datetime64[ns]')
+    for date_format in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            return parsed
+        parsed[missing] = pd.to_datetime(texts[missing], format=date_format, errors='coerce')
+    for index in parsed.index[parsed.isna()]:
+        parsed[index] = pd.to_datetime(texts[index], errors='coerce')
+    return parsed
+
+
+class TextColumn:
+    """字符串列"""
+
+    def __init__(self):
+        self.values = []
+
+    def append(self, value):
+        self.values.append(value)
+
+    def get(self, index):
+        return self.values[index]
+
+    def to_series(self, typed=False):
+        import pandas as pd
+        return pd.Series(clean_values(self.values), dtype=object)
+
+    def to_arrow(self, data_type):
+        import pyarrow as pa
+        return pa.array(clean_values(self.values), type=data_type)
+
+
+class CategoricalColumn:
+    """字典编码的列：categories保存不同的值，codes保存每行的编号"""
+
+    def __init__(self):
+        self.codes = array('I')
+        self.categories = []
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def get(self, index):
+        return self.categories[self.codes[index]]
+
+    def to_series(self, typed=False, dates=False):
+        import numpy as np
+        import pandas as pd
+        codes = np.frombuffer(self.codes, dtype=np.uint32).astype(np.int64) if self.codes else np.array([], np.int64)
+        if typed and dates:
+            parsed = parse_dates(self.categories)
+            return pd.Series(parsed.to_numpy()[codes] if len(codes) else parsed.iloc[:0].to_numpy())
+        categories = clean_values(self.categories)
+        if len(set(categories)) != len(categories):
+            # 清理无效字符后有重复值，不能作为分类
+            return pd.Series(np.array(categories, dtype=object)[codes] if len(codes) else [], dtype=object)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories))
+
+    def to_arrow(self, data_type):
+        import numpy as np
+        import pyarrow as pa
+        indices = pa.array(np.frombuffer(self.codes, dtype=np.uint32) if self.codes else [], type=pa.uint32())
+        if pa.types.is_date(data_type):
+            parsed = parse_dates(self.categories)
+            dictionary = pa.array(parsed.dt.date, type=data_type, from_pandas=True)
+        else:
+            dictionary = pa.array(clean_values(self.categories), type=data_type)
+        return dictionary.take(indices)
+
+
+class NumericColumn:
+    """数值列：保存浮点数和小数位数，不能按数值保存的文本（空值、“面议”等）单独保存"""
+
+    def __init__(self):
+        self.values = array('d')
+        self.decimals = array('b')
+        self.texts = {}
+
+    def append(self, value):
+        match = _NUMBER_RE.match(value) if isinstance(value, str) and len(value) <= _MAX_NUMBER_LENGTH else None
+        if match:
+            self.values.append(float(value))
+            self.decimals.append(len(match.group(1) or ''))
+        else:
+            self.texts[len(self.values)] = value
+            self.values.append(math.nan)
+            self.decimals.append(-1)
+
+    def get(self, index):
+        decimals = self.decimals[index]
+        if decimals < 0:
+            return self.texts[index]
+        return f"{self.values[index]:.{decimals}f}"
+
+    def typed_values(self):
+        """浮点数数组；单独保存的文本按入库时的规则转换（去掉千位分隔符），不能转换的为NaN"""
+        import numpy as np
+        values = np.frombuffer(self.values, dtype=np.float64).copy() if self.values else np.array([], np.float64)
+        for index, text in self.texts.items():
+            number = parse_price(text)
+            if number is not None:
+                values[index] = number
+        return values
+
+    def to_series(self, typed=False):
+        import pandas as pd
+        if typed:
+            return pd.Series(self.typed_values(), dtype=float)
+        texts = self.texts
+        values = [f"{value:.{decimals}f}" if decimals >= 0 else texts[index]
+                  for index, (value, decimals) in enumerate(zip(self.values, self.decimals))]
+        return pd.Series(clean_values(values), dtype=object)
+
+    def to_arrow(self, data_type):
+        import pyarrow as pa
+        # NaN（不能转换为数值的文本）保存为空值
+        return pa.array(self.typed_values(), type=data_type, from_pandas=True)
+
+
+def arrow_schema(headers):
+    """列式存储的表结构：数值列为float64，发布时间为日期，其余为字符串"""
+    import pyarrow as pa
+    fields = []
+    for header in headers:
+        if header in NUMERIC_HEADERS:
+            data_type = pa.float64()
+        elif header in DATE_HEADERS:
+            data_type = pa.date32()
+        else:
+            data_type = pa.string()
+        fields.append(pa.field(clean_cell(header), data_type))
+    return pa.schema(fields)
+
+
+def new_column(header):
+    """按表头选择列的保存方式"""
+    if header in NUMERIC_HEADERS:
+        return NumericColumn()
+    if header in CATEGORICAL_HEADERS:
+        return CategoricalColumn()
+    return TextColumn()
+
+
+class ColumnarRows:
+    """按列保存的数据行
+
+    headers: 表头，也可以在第一次extend时提供
+    """
+
+    def __init__(self, headers=None):
+        self.headers = []
+        self.columns = []
+        self._length = 0
+        if headers:
+            self._init_columns(headers)
+
+    def _init_columns(self, headers):
+        self.headers = list(headers)
+        self.columns = [new_column(header) for header in self.headers]
+
+    def extend(self, rows, headers=None):
+        """追加数据行（每行的列数与表头不一致时补空或截断）"""
+        if not self.columns:
+            if not headers:
+                raise ValueError("第一次追加数据时需要提供表头")
+            self._init_columns(headers)
+        width = len(self.columns)
+        appenders = [column.append for column in self.columns]
+        for row in rows:
+            if len(row) != width:
+                row = (list(row) + [''] * width)[:width]
+            for append, value in zip(appenders, row):
+                append(value)
+            self._length += 1
+
+    def row(self, index):
+        """返回一行数据（字符串列表）"""
+        return [column.get(index) for column in self.columns]
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self.row(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("数据行下标超出范围")
+        return self.row(index)
+
+    def to_dataframe(self, typed=False):
+        """生成DataFrame
+
+        typed: False时各列为与网页相同的文本（字典编码的列为分类类型），用于导出Excel/CSV；
+               True时序号、价格为浮点数，发布时间为日期，用于分析和列式存储
+        """
+        import pandas as pd
+        series = []
+        for header, column in zip(self.headers, self.columns):
+            if isinstance(column, CategoricalColumn):
+                series.append(column.to_series(typed, dates=header in DATE_HEADERS))
+            else:
+                series.append(column.to_series(typed))
+        df = pd.concat(series, axis=1) if series else pd.DataFrame()
+        df.columns = [clean_cell(header) for header in self.headers]
+        return df
+
+    def to_arrow(self):
+        """生成Arrow表，列类型见arrow_schema"""
+        import pyarrow as pa
+        schema = arrow_schema(self.headers)
+        arrays = [column.to_arrow(field.type) for field, column in zip(schema, self.columns)]
+        return pa.Table.from_arrays(arrays, schema=schema)
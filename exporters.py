@@ -0,0 +1,291 @@
+"""流式数据导出
+
+提取过程中每得到一页数据就写入文件，不在内存中保存全部数据，
+适合多个月份、多个城市合并导出几十万行的情况。
+"""
+import csv
+import importlib
+import os
+
+
+def clean_cell(cell):
+    """确保字符串是有效的UTF-8"""
+    if isinstance(cell, str):
+        return cell.encode('utf-8', errors='replace').decode('utf-8')
+    return cell
+
+
+class StreamingCsvWriter:
+    """逐页写入CSV文件（utf-8-sig编码，确保Windows Excel能正确识别）"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.rows_written = 0
+        self._file = open(file_path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        self._header_written = False
+
+    def write_rows(self, rows, headers):
+        """写入一页数据，第一次写入时先写表头"""
+        if not self._header_written:
+            self._writer.writerow([clean_cell(header) for header in headers])
+            self._header_written = True
+        self._writer.writerows([clean_cell(cell) for cell in row] for row in rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+# Excel样式：蓝色表头、细边框、隔行浅灰底色、行高21
+HEADER_COLOR = '4472C4'
+BAND_COLOR = 'F2F2F2'
+ROW_HEIGHT = 21
+MAX_COLUMN_WIDTH = 100
+# 估算列宽时最多抽样的数据行数
+WIDTH_SAMPLE_ROWS = 1000
+# 修改工作簿默认单元格格式要用到openpyxl的内部属性，只在验证过的版本上使用
+DEFAULT_STYLE_OPENPYXL_VERSIONS = ((3, 0), (3, 1))
+# 其他版本的openpyxl中数据单元格使用的命名样式
+DATA_STYLE_NAME = '数据'
+
+
+def estimate_column_widths(headers, rows, sample_rows=WIDTH_SAMPLE_ROWS):
+    """按表头和等间隔抽样的数据行估算列宽（最长文本+2，最大100）"""
+    step = max(1, len(rows) // sample_rows)
+    widths = []
+    for col, header in enumerate(headers):
+        max_length = len(str(header))
+        for row in rows[::step]:
+            if col < len(row):
+                max_length = max(max_length, len(str(row[col])))
+        widths.append(min(max_length + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+class StreamingXlsxWriter:
+    """逐页写入Excel文件（openpyxl只写模式，行数据直接写入临时文件，内存占用不随行数增长）
+
+    styled=True时生成与原先逐单元格设置样式相同的效果，但不给每个数据单元格单独设置样式：
+    - 数据单元格的字体和对齐方式设为工作簿的默认单元格格式（openpyxl 3.0/3.1；其他版本
+      注册一个命名样式，数据单元格逐个引用，较慢但只使用公开接口）；
+    - 边框和隔行底色用条件格式一次性作用于整个数据区域；
+    - 行高使用工作表默认行高，列宽按第一次写入的数据抽样估算；
+    只有表头的几个单元格单独设置样式。
+    """
+
+    def __init__(self, file_path, sheet_name='材料价格', styled=True):
+        from openpyxl import Workbook
+        self.file_path = file_path
+        self.rows_written = 0
+        self.styled = styled
+        self._workbook = Workbook(write_only=True)
+        self._worksheet = self._workbook.create_sheet(sheet_name)
+        self._header_written = False
+        self._column_count = 0
+        # 数据单元格引用的命名样式，为None时数据单元格使用工作簿的默认单元格格式
+        self._data_style = None
+        if styled:
+            self._init_styles()
+
+    def _init_styles(self):
+        from openpyxl.styles import Font, Alignment, NamedStyle
+
+        font = Font(size=10)
+        alignment = Alignment(horizontal='left', vertical='center', wrap_text=False)
+        if not self._set_default_style(font, alignment):
+            style = NamedStyle(name=DATA_STYLE_NAME, font=font, alignment=alignment)
+            self._workbook.add_named_style(style)
+            self._data_style = style.name
+
+        self._worksheet.sheet_format.defaultRowHeight = ROW_HEIGHT
+        self._worksheet.sheet_format.customHeight = True
+
+    def _set_default_style(self, font, alignment):
+        """把字体和对齐方式设为工作簿的默认单元格格式，openpyxl版本不支持时返回False"""
+        import openpyxl
+        try:
+            version = tuple(int(part) for part in openpyxl.__version__.split('.')[:2])
+        except ValueError:
+            return False
+        workbook = self._workbook
+        if version not in DEFAULT_STYLE_OPENPYXL_VERSIONS or not all(
+                hasattr(workbook, name) for name in ('_fonts', '_alignments', '_cell_styles')):
+            return False
+
+        from openpyxl.styles.cell_style import StyleArray
+        # 工作簿的默认单元格格式（第0号格式）：未单独设置样式的单元格都使用它
+        default_style = StyleArray()
+        default_style.fontId = workbook._fonts.add(font)
+        default_style.alignmentId = workbook._alignments.add(alignment)
+        workbook._cell_styles[0] = default_style
+        return True
+
+    def _thin_border(self):
+        from openpyxl.styles import Border, Side
+        thin = Side(style='thin')
+        return Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    def _header_cells(self, headers):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(self._worksheet, clean_cell(header))
+            cell.font = Font(bold=True, color='FFFFFF', size=10)
+            cell.fill = PatternFill(start_color=HEADER_COLOR, end_color=HEADER_COLOR, fill_type='solid')
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.border = self._thin_border()
+            cells.append(cell)
+        return cells
+
+    def _write_header(self, rows, headers):
+        self._column_count = len(headers)
+        if self.styled:
+            from openpyxl.utils import get_column_letter
+            # 只写模式必须在写入第一行之前设置列宽
+            for col, width in enumerate(estimate_column_widths(headers, rows), 1):
+                self._worksheet.column_dimensions[get_column_letter(col)].width = width
+            self._worksheet.append(self._header_cells(headers))
+        else:
+            self._worksheet.append([clean_cell(header) for header in headers])
+        self._header_written = True
+
+    def _add_data_formatting(self):
+        """给数据区域添加边框和隔行底色（从第2行开始，间隔2行）"""
+        from openpyxl.formatting.rule import Rule
+        from openpyxl.styles import PatternFill
+        from openpyxl.styles.differential import DifferentialStyle
+        from openpyxl.utils import get_column_letter
+
+        if not self.rows_written or not self._column_count:
+            return
+        data_range = f"A2:{get_column_letter(self._column_count)}{self.rows_written + 1}"
+        band_fill = PatternFill(bgColor=BAND_COLOR, fill_type='solid')
+        formatting = self._worksheet.conditional_formatting
+        formatting.add(data_range, Rule(type='expression', formula=['MOD(ROW(),2)=0'],
+                                        dxf=DifferentialStyle(fill=band_fill)))
+        formatting.add(data_range, Rule(type='expression', formula=['TRUE'],
+                                        dxf=DifferentialStyle(border=self._thin_border())))
+
+    def write_rows(self, rows, headers):
+        """写入一页数据，第一次写入时先写表头"""
+        if not self._header_written:
+            self._write_header(rows, headers)
+        if self._data_style:
+            self._append_styled(rows)
+        else:
+            for row in rows:
+                self._worksheet.append([clean_cell(cell) for cell in row])
+        self.rows_written += len(rows)
+
+    def _append_styled(self, rows):
+        """逐个单元格引用数据样式写入（不支持修改默认单元格格式的openpyxl版本）"""
+        from openpyxl.cell import WriteOnlyCell
+
+        for row in rows:
+            cells = []
+            for value in row:
+                cell = WriteOnlyCell(self._worksheet, clean_cell(value))
+                cell.style = self._data_style
+                cells.append(cell)
+            self._worksheet.append(cells)
+
+    def close(self):
+        if self.styled:
+            self._add_data_formatting()
+        self._workbook.save(self.file_path)
+
+
+# 列式存储格式的扩展名
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+# 列式存储的压缩算法
+COLUMNAR_COMPRESSION = 'zstd'
+# 列式存储每次写入的行数（Parquet的行组大小），页面数据先在内存中攒够再写入
+COLUMNAR_BATCH_ROWS = 100000
+
+
+class StreamingColumnarWriter:
+    """逐页写入Parquet或Feather（Arrow IPC）文件
+
+    价格为浮点数、发布时间为日期，其余列为字符串（见columnar.arrow_schema），使用zstd压缩。
+    页面数据先按列保存在内存中，每攒够batch_rows行写入一次。需要安装pyarrow。
+    """
+
+    def __init__(self, file_path, file_format=None, batch_rows=COLUMNAR_BATCH_ROWS, compression=COLUMNAR_COMPRESSION):
+        importlib.import_module('pyarrow')  # 没有安装pyarrow时在创建时就报错
+        self.file_path = file_path
+        self.file_format = file_format or COLUMNAR_FORMATS[os.path.splitext(file_path)[1].lower()]
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self.rows_written = 0
+        self._buffer = None
+        self._headers = None
+        self._writer = None
+
+    def _open(self, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.file_format == 'parquet':
+            self._writer = pq.ParquetWriter(self.file_path, schema, compression=self.compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(self.file_path, schema, options=options)
+
+    def _write_table(self, table):
+        if self._writer is None:
+            self._open(table.schema)
+        self._writer.write_table(table)
+        self.rows_written += table.num_rows
+
+    def _flush(self):
+        if self._buffer is not None and len(self._buffer):
+            self._write_table(self._buffer.to_arrow())
+        self._buffer = None
+
+    def write_rows(self, rows, headers):
+        """写入一页数据（也可以是按列保存的全部数据）"""
+        from columnar import ColumnarRows
+        if self._headers is None:
+            self._headers = list(headers)
+        if isinstance(rows, ColumnarRows) and self._buffer is None:
+            # 已经按列保存的数据直接写入
+            self._write_table(rows.to_arrow())
+            return
+        if self._buffer is None:
+            self._buffer = ColumnarRows(self._headers)
+        self._buffer.extend(rows, self._headers)
+        if len(self._buffer) >= self.batch_rows:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        if self._writer is None:
+            # 没有数据时也生成只有表结构的文件
+            from columnar import arrow_schema
+            self._open(arrow_schema(self._headers or []))
+        self._writer.close()
+
+
+def partition_path(root_dir, city_id, month, extension, name="data"):
+    """按城市和月份分区的数据文件路径（root_dir/city=15/month=2025-01/data.parquet）
+
+    目录名使用Hive分区格式，pandas.read_parquet(root_dir)或pyarrow.dataset读取时自动得到city和month列；
+    name为文件名（同一分区中有多个按条件筛选的文件时各自不同）
+    """
+    directory = os.path.join(root_dir, f"city={city_id}", f"month={month}")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}{extension}")
+
+
+def open_stream_writer(file_path):
+    """根据扩展名创建流式写入器，没有扩展名时按Excel保存，返回写入器"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.csv':
+        return StreamingCsvWriter(file_path)
+    if extension in COLUMNAR_FORMATS:
+        return StreamingColumnarWriter(file_path)
+    if extension != '.xlsx':
+        file_path = file_path + '.xlsx'
+    return StreamingXlsxWriter(file_path)
@@ -0,0 +1,504 @@
+"""城市×月份提取任务的统一调度
+
+多个(城市, 日期, 查询条件)任务一次性交给调度器：每个任务先查询总页数，再展开为逐页的提取任务。
+所有任务的查询和页面放在同一个优先队列中，由固定数量的工作线程执行，
+工作线程数就是全局并发名额——同时提交17个城市×12个月，对网站的并发请求数也不会超过它。
+
+优先级数字小的先执行：默认当前月份为0，每早一个月加1；优先级相同时先提交的任务先执行，
+同一任务的页面按页码顺序。排在前面的任务页面不够分配时，空闲的线程会开始下一个任务，名额不会闲置。
+各任务共用引擎的请求策略（重试、熔断）、速率控制、页面缓存和断点记录，可以单独查看进度和取消。
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from columnar import ColumnarRows
+from query_filter import filter_key
+from scraper_core import detect_last_page
+
+# 任务状态
+JOB_STATES = {
+    'pending': '等待',
+    'querying': '查询中',
+    'running': '提取中',
+    'done': '已完成',
+    'failed': '失败',
+    'skipped': '已跳过',
+    'cancelled': '已取消',
+}
+FINAL_STATES = frozenset(['done', 'failed', 'skipped', 'cancelled'])
+
+# 队列中表示“查询”的页码，排在同一任务的所有页面之前
+QUERY_TASK = 0
+
+
+def default_priority(date_str, today=None):
+    """默认优先级：当前月份为0，每早一个月加1（越新的月份越先提取）"""
+    today = today or datetime.now()
+    year, month = (int(part) for part in date_str.split('/')[:2])
+    return max(0, (today.year - year) * 12 + today.month - month)
+
+
+class ScrapeJob:
+    """一个(城市, 日期, 查询条件)提取任务，由JobScheduler.submit创建
+
+    各页按页码顺序输出：提供row_sink时交给row_sink，data为None；否则合并到data（ColumnarRows）。
+    headers为表头，rows_extracted为已输出的记录数；
+    failed_pages为重试后仍然失败的页码（已记录到断点文件，再次提交时只提取这些页面）
+    """
+
+    def __init__(self, scheduler, seq, city_id, date_str, filters=None, priority=0, label=None, row_sink=None):
+        self.scheduler = scheduler
+        self.seq = seq
+        self.city_id = city_id
+        self.date_str = date_str
+        self.filters = filters
+        self.priority = priority
+        self.label = label or f"{city_id} {date_str}"
+        self.state = 'pending'
+        self.total_records = 0
+        self.total_pages = 0
+        self.last_page = None       # 网站实际的最后一页（确定前为None）
+        self.pages_done = 0
+        self.failed_pages = []
+        self.row_sink = row_sink
+        self.data = None if row_sink else ColumnarRows()
+        self.headers = []
+        self.rows_extracted = 0
+        self.error = None
+        self.elapsed = 0.0
+        self.cancel_requested = False
+        self._pages = {}            # {页码: (数据行, 表头)}，已完成、还没有输出的页面
+        self._next_page = 1         # 下一个要输出的页码
+        self._previous = (0, None)  # 最近输出的(页码, 数据行)，用于识别重复的页面
+        self._outbox = deque()      # 已按页码排好、等待输出的数据行
+        self._output_lock = threading.Lock()
+        self._output_failed = False
+        self._resumed = set()       # 从断点记录恢复的页码
+        self._pending = 1           # 已排队或正在执行的任务数（开始时只有查询）
+        self._journal = None
+        self._started = None
+        self._finished = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in FINAL_STATES
+
+    @property
+    def progress(self):
+        """任务进度（0~100）"""
+        if self.finished:
+            return 100.0
+        pages = self.last_page or self.total_pages
+        return self.pages_done / pages * 100 if pages else 0.0
+
+    def describe(self):
+        """日志中显示的状态，如“沈阳市 2025年01月：提取中 12/24 页”"""
+        text = f"{self.label}：{JOB_STATES[self.state]}"
+        if self.state == 'running':
+            text += f" {self.pages_done}/{self.last_page or self.total_pages} 页"
+        elif self.state == 'done':
+            text += f"，共 {self.rows_extracted} 条记录"
+        elif self.error:
+            text += f"，{self.error}"
+        return text
+
+    def cancel(self):
+        """取消任务：排队中的页面不再请求，正在进行的请求完成后丢弃"""
+        self.scheduler.cancel(self)
+
+    def wait(self, timeout=None):
+        """等待任务结束，超时返回False"""
+        return self._finished.wait(timeout)
+
+
+class JobScheduler:
+    """提取任务调度器
+
+    engine: 已连接网站的ScraperEngine
+    workers: 全局并发数（所有任务同时进行的查询和页面请求数），为None时使用engine.max_workers；
+             启用自适应并发时线程数按并发上限的最大值创建，实际同时进行的请求数由速率控制器调整
+    accept: 查询完成后在工作线程中调用accept(job)，返回False时跳过该任务（如数据库中已是最新），
+            可以把跳过的原因写入job.error
+    on_update: 任务状态或进度变化时在工作线程中调用on_update(job)
+    """
+
+    def __init__(self, engine, workers=None, accept=None, on_update=None):
+        self.engine = engine
+        workers = workers if workers is not None else engine.max_workers
+        self.workers = max(1, min(int(workers), engine.max_workers_limit))
+        self.accept = accept
+        self.on_update = on_update
+        self.jobs = []
+        self._queue = []            # 堆：(优先级, 任务序号, 页码, 任务)
+        self._finished = deque()    # 已结束、还没有被as_completed取走的任务
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._threads = []
+        self._closed = False
+        self._started = None
+
+    def submit(self, city_id, date_str, filters=None, priority=None, label=None, row_sink=None):
+        """提交一个任务，返回ScrapeJob
+
+        priority: 优先级，数字小的先执行，为None时按月份计算（当前月份最先）
+        label: 日志中显示的任务说明，如“沈阳市 2025年01月”
+        row_sink: 流式输出回调函数，接收(一页数据行, 表头)；提供时该任务的各页数据按页码顺序在工作线程中
+                  交给row_sink，不在内存中累积（同一任务不会同时调用）
+        """
+        if priority is None:
+            priority = default_priority(date_str)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+            job = ScrapeJob(self, next(self._seq), city_id, date_str, filters, priority, label, row_sink)
+            self.jobs.append(job)
+            heapq.heappush(self._queue, (job.priority, job.seq, QUERY_TASK, job))
+            self._cond.notify()
+        self._start_workers()
+        return job
+
+    def _start_workers(self):
+        with self._cond:
+            if self._threads:
+                return
+            engine = self.engine
+            # 所有任务共用一个新的耗时统计和解析进程池
+            engine.reset_metrics()
+            engine.get_parse_pool()
+            controller = engine.rate_controller
+            thread_count = max(self.workers, controller.max_limit) if controller.adaptive else self.workers
+            engine.log_message(f"📌 任务调度：全局并发数 {self.workers}（{controller.describe()}）")
+            self._started = time.monotonic()
+            for index in range(thread_count):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{index + 1}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _next_task(self):
+        """取出优先级最高的待执行任务，调度器关闭时返回None"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            _, _, page_no, job = heapq.heappop(self._queue)
+            return job, page_no
+
+    def _worker(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            job, page_no = task
+            try:
+                if self._should_run(job, page_no):
+                    if page_no == QUERY_TASK:
+                        self._run_query(job)
+                    else:
+                        self._run_page(job, page_no)
+            except Exception as e:
+                job.error = str(e)
+                self.engine.log_message(f"❌ {job.label}：{e}")
+            finally:
+                self._task_done(job)
+
+    def _should_run(self, job, page_no):
+        # 开始请求前再次检查：已取消、网站已熔断或已知超出最后一页的页面不再请求
+        if job.cancel_requested or job.finished:
+            return False
+        if self.engine.request_policy.circuit_open:
+            job.error = "网站连续无响应，已暂停请求"
+            return False
+        return job.last_page is None or page_no <= job.last_page
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job)
+
+    def _run_query(self, job):
+        engine = self.engine
+        job.state = 'querying'
+        job._started = time.monotonic()
+        self._notify(job)
+
+        result = engine.query_pages(job.city_id, job.date_str, job.filters)
+        if result is None:
+            job.state = 'failed'
+            job.error = "查询失败"
+            return
+        job.total_records, job.total_pages, first_page = result
+        if job.total_records == 0:
+            job.state = 'done'
+            return
+        if self.accept and not self.accept(job):
+            job.state = 'skipped'
+            return
+
+        # 打开断点记录，已完成的页面不再提取；查询时已经得到的第1页直接使用
+        journal = engine.journal.open(job.city_id, job.date_str, job.total_pages,
+                                      *filter_key(job.filters)) if engine.journal else None
+        resumed = dict(journal.completed) if journal else {}
+        if resumed:
+            engine.log_message(f"🔄 {job.label}：从断点继续，已完成 {len(resumed)} 页")
+        writes = []
+        with self._cond:
+            if job.cancel_requested:
+                if journal:
+                    journal.close()
+                return
+            job._journal = journal
+            job._resumed = set(resumed)
+            job.state = 'running'
+            engine.log_message(f"📌 {job.label}：共 {job.total_records} 条记录，{job.total_pages} 页")
+
+            for page_no in sorted(resumed):
+                if page_no <= job.total_pages:
+                    writes += self._page_done(job, page_no, resumed[page_no])
+            if first_page is not None and 1 not in resumed:
+                writes += self._page_done(job, 1, first_page)
+            last_page = job.last_page or job.total_pages
+            for page_no in range(job._next_page, last_page + 1):
+                if page_no not in job._pages:
+                    job._pending += 1
+                    heapq.heappush(self._queue, (job.priority, job.seq, page_no, job))
+            self._cond.notify_all()
+        self._write_journal(writes)
+        self._output(job)
+        self._notify(job)
+
+    def _run_page(self, job, page_no):
+        result = self.engine.extract_page_data(job.city_id, job.date_str, page_no, job.filters)
+        with self._cond:
+            if job.cancel_requested:
+                return
+            writes = self._page_done(job, page_no, result)
+        self._write_journal(writes)
+        self._output(job)
+        self._notify(job)
+
+    @staticmethod
+    def _write_journal(writes):
+        # 断点文件每次写入都要同步到磁盘，在释放调度器的锁之后写入（各任务的断点文件有自己的锁），
+        # 不让其他任务的工作线程排队等待磁盘
+        for write, args in writes:
+            write(*args)
+
+    def _page_done(self, job, page_no, result):
+        """记录一页的提取结果（调用时持有self._cond），返回释放锁之后要写入断点文件的[(方法, 参数)]"""
+        writes = []
+        if job.last_page is not None and page_no > job.last_page:
+            return writes
+        end = detect_last_page(page_no, result, lambda other: self._page_rows(job, other),
+                               self.engine.table_locator.data_headers())
+        if end is not None:
+            writes += self._stop_at(job, end)
+            if page_no > job.last_page:
+                return writes
+
+        page_data, page_headers = result
+        job._pages[page_no] = result
+        job.pages_done += 1
+        journal = job._journal
+        if journal and page_no not in job._resumed:
+            if page_data:
+                writes.append((journal.record_page, (page_no, page_data, page_headers)))
+            else:
+                writes.append((journal.record_failure, (page_no,)))
+        self._collect(job)
+
+        metrics = self.engine.metrics
+        if page_data:
+            metrics.count('pages_ok')
+            metrics.count('rows', len(page_data))
+        else:
+            metrics.count('pages_failed')
+            self.engine.log_message(f"⚠️  {job.label}：第 {page_no} 页数据提取失败")
+        return writes
+
+    @staticmethod
+    def _page_rows(job, page_no):
+        # 已完成页面的数据行（还没有完成的页面返回None）
+        if page_no in job._pages:
+            return job._pages[page_no][0]
+        if job._previous[0] == page_no:
+            return job._previous[1]
+        return None
+
+    @staticmethod
+    def _collect(job, final=False):
+        """把从job._next_page开始连续完成的页面按页码顺序移入待输出队列（调用时持有self._cond）
+
+        final为True时任务的页面都已结束，缺少的页面（网站熔断后没有请求）也按失败处理
+        """
+        last_page = job.last_page or job.total_pages
+        while job._next_page <= last_page:
+            page_no = job._next_page
+            if page_no in job._pages:
+                page_data, page_headers = job._pages.pop(page_no)
+            elif final:
+                page_data, page_headers = [], []
+            else:
+                break
+            job._previous = (page_no, page_data)
+            job._next_page += 1
+            if not page_data:
+                job.failed_pages.append(page_no)
+                continue
+            if not job.headers:
+                job.headers = list(page_headers)
+            job._outbox.append(page_data)
+
+    def _output(self, job):
+        """在释放self._cond之后输出待输出队列中的页面：交给row_sink或合并到job.data
+
+        job._output_lock保证同一任务的页面按顺序输出，不同任务可以同时写入各自的文件
+        """
+        with job._output_lock:
+            while True:
+                with self._cond:
+                    if job.cancel_requested or job._output_failed:
+                        job._outbox.clear()
+                    if not job._outbox:
+                        return
+                    page_data = job._outbox.popleft()
+                try:
+                    if job.row_sink:
+                        # 流式导出：写入文件的耗时计入导出阶段
+                        with self.engine.metrics.stage('export'):
+                            job.row_sink(page_data, job.headers)
+                    else:
+                        job.data.extend(page_data, job.headers)
+                except Exception as e:
+                    job._output_failed = True
+                    job.error = f"保存数据失败: {e}"
+                    continue
+                job.rows_extracted += len(page_data)
+
+    def _stop_at(self, job, page_no):
+        """网站的数据到page_no页为止，丢弃之后的页面（调用时持有self._cond），返回要写入断点文件的[(方法, 参数)]"""
+        last_page = job.last_page or job.total_pages
+        if page_no >= last_page:
+            return []
+        self.engine.log_message(f"⏭️  {job.label}：网站的数据到第 {page_no} 页为止，"
+                                f"不再提取后面的 {last_page - page_no} 页")
+        job.last_page = page_no
+        for other in [other for other in job._pages if other > page_no]:
+            del job._pages[other]
+            job.pages_done -= 1
+        return [(job._journal.end_at, (page_no,))] if job._journal else []
+
+    def _task_done(self, job):
+        with self._cond:
+            job._pending -= 1
+            if job._pending > 0:
+                return
+            if job.state == 'running' and not job.cancel_requested:
+                self._collect(job, final=True)
+        self._output(job)
+        with self._cond:
+            self._finish(job)
+        self._notify(job)
+
+    def cancel(self, job):
+        """取消任务：从队列中移除它的页面，正在进行的请求完成后结束"""
+        with self._cond:
+            if job.finished or job.cancel_requested:
+                return
+            job.cancel_requested = True
+            remaining = [task for task in self._queue if task[3] is not job]
+            job._pending -= len(self._queue) - len(remaining)
+            self._queue = remaining
+            heapq.heapify(self._queue)
+            if job._pending > 0:
+                return
+            self._finish(job)
+        self._notify(job)
+
+    def cancel_all(self):
+        """取消所有还没有结束的任务"""
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def _finish(self, job):
+        """结束任务（调用时持有self._cond）"""
+        if job._finished.is_set():
+            return
+        if job._started is not None:
+            job.elapsed = time.monotonic() - job._started
+        if job.cancel_requested:
+            job.state = 'cancelled'
+        elif job.state == 'running':
+            job.state = 'done' if job.rows_extracted and not job._output_failed else 'failed'
+            if job.failed_pages and not job.error:
+                job.error = f"{len(job.failed_pages)} 页提取失败"
+        elif job.state in ('pending', 'querying'):
+            job.state = 'failed'
+        job._pages = {}
+        job._outbox.clear()
+        if job._journal:
+            job._journal.close()
+            job._journal = None
+
+        engine = self.engine
+        if job.state == 'done':
+            message = f"✅ {job.label}：提取完成，共 {job.rows_extracted} 条记录"
+            if job.failed_pages:
+                message += f"（第 {', '.join(map(str, job.failed_pages))} 页提取失败，已记录到断点文件）"
+            engine.log_message(message)
+        elif job.state == 'failed':
+            engine.log_message(f"❌ {job.label}：{job.error or '没有提取到数据'}")
+        elif job.state == 'skipped':
+            engine.log_message(f"⏭️  {job.label}：已跳过" + (f"（{job.error}）" if job.error else ""))
+        else:
+            engine.log_message(f"⚠️  {job.label}：已取消")
+
+        job._finished.set()
+        self._finished.append(job)
+        self._cond.notify_all()
+
+    @property
+    def progress(self):
+        """全部任务的总进度（0~100）"""
+        jobs = list(self.jobs)
+        return sum(job.progress for job in jobs) / len(jobs) if jobs else 0.0
+
+    def as_completed(self):
+        """按结束的先后顺序逐个返回任务，直到所有已提交的任务都结束（在调用者的线程中导出数据）"""
+        returned = 0
+        while True:
+            with self._cond:
+                while not self._finished and returned < len(self.jobs):
+                    self._cond.wait()
+                if not self._finished:
+                    return
+                job = self._finished.popleft()
+            returned += 1
+            yield job
+
+    def wait(self):
+        """等待所有已提交的任务结束"""
+        for job in list(self.jobs):
+            job.wait()
+
+    def close(self):
+        """取消还没有结束的任务，停止工作线程"""
+        self.cancel_all()
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        engine = self.engine
+        counts = {}
+        for job in self.jobs:
+            counts[job.state] = counts.get(job.state, 0) + 1
+        if self._started is not None:
+            elapsed = time.monotonic() - self._started
+            summary = '，'.join(f"{JOB_STATES[state]} {count} 个" for state, count in counts.items())
+            engine.log_message(f"📊 共 {len(self.jobs)} 个任务（{summary}），用时 {elapsed:.1f} 秒")
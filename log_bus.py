@@ -0,0 +1,71 @@
+"""线程安全的日志与进度总线
+
+工作线程只把日志和进度放入队列，不直接操作界面，调用立即返回；
+界面线程定时取出队列中积压的消息，一次性显示，进度只保留最新值。
+完整日志同时写入磁盘，按大小自动轮转。
+"""
+import logging
+import os
+import queue
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+class LogBus:
+    """日志与进度消息队列
+
+    log_file: 完整日志文件路径，为None时不写文件
+    max_bytes: 单个日志文件的大小上限（字节），超过后轮转
+    backup_count: 保留的历史日志文件数
+    """
+
+    def __init__(self, log_file=None, max_bytes=5 * 1024 * 1024, backup_count=3):
+        self._queue = queue.SimpleQueue()
+        self._logger = None
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+            handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def log(self, message):
+        """放入一条日志（任意线程调用）"""
+        self._queue.put(('log', datetime.now(), message))
+
+    def progress(self, value):
+        """放入进度值（任意线程调用）"""
+        self._queue.put(('progress', None, value))
+
+    def drain(self, max_items=1000):
+        """取出积压的消息（界面线程调用），返回([(时间, 日志)], 最新进度或None)
+
+        max_items: 单次最多取出的消息数，避免一次处理过多阻塞界面
+        """
+        entries = []
+        progress = None
+        for _ in range(max_items):
+            try:
+                kind, timestamp, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                # 多次进度更新只保留最新值
+                progress = value
+            else:
+                entries.append((timestamp, value))
+
+        if self._logger and entries:
+            for timestamp, message in entries:
+                self._logger.info(f"{timestamp:%Y-%m-%d %H:%M:%S} - {message}")
+        return entries, progress
+
+    def close(self):
+        """写入剩余日志并关闭日志文件"""
+        self.drain(max_items=1000000)
+        if self._logger:
+            for handler in list(self._logger.handlers):
+                handler.close()
+                self._logger.removeHandler(handler)
@@ -2,14 +2,41 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import json
+import multiprocessing
 import threading
-import re
 from datetime import datetime
-import time
+from async_fetcher import detect_backend
+from checkpoint import ExtractionJournal
+from exporters import open_stream_writer
+from job_scheduler import JobScheduler
+from log_bus import LogBus
+from page_cache import PageCache
+from page_parsers import DEFAULT_BACKEND, available_backends
+from parse_pool import default_workers
+from price_store import PriceStore, month_key
+from query_filter import QueryFilter
+from scraper_core import ScraperEngine, get_app_dir, build_date_str, default_filename, export_to_file
+
+# 日志级别颜色映射
+LOG_COLORS = {
+    "✅": "#008000",  # 成功 - 绿色
+    "❌": "#ff0000",  # 错误 - 红色
+    "⚠️": "#ff8c00",  # 警告 - 橙色
+    "🔄": "#0000ff",  # 过程 - 蓝色
+    "📌": "#800080",  # 关键信息 - 紫色
+    "📊": "#008080",  # 数据 - 青色
+    "⏱️": "#a9a9a9",  # 时间 - 灰色
+    "📋": "#696969",  # 列表 - 深灰色
+    "🎉": "#ff69b4"   # 完成 - 粉色
+}
+
+# 材料类别下拉框中表示不筛选的选项
+ALL_CATEGORIES = "全部"
+
+# 日志框最多显示的行数
+MAX_LOG_LINES = 1000
+# 刷新日志和进度的间隔（毫秒）
+LOG_POLL_INTERVAL = 100
 
 class MaterialPriceScraper:
     def __init__(self, root):
@@ -22,7 +49,6 @@ class MaterialPriceScraper:
         self.root.configure(bg="#f0f0f0")  # 设置背景色为浅灰色
         
         # 初始化变量
-        self.session = None
         self.is_connected = False
         self.city_mapping = {}
         self.year_list = []
@@ -35,10 +61,15 @@ class MaterialPriceScraper:
         self.all_data = []
         self.headers = []
         
+        # 并发提取的工作线程数（可在界面或代码中修改）
+        self.max_workers = 4
+        self.max_workers_limit = 16
+        
         # 参数变更跟踪变量
         self.current_city = ""
         self.current_year = ""
         self.current_month = ""
+        self.current_filter = QueryFilter()
         
         # 窗口拖动相关变量
         self.start_x = 0
@@ -47,18 +78,34 @@ class MaterialPriceScraper:
         
         # 初始化TEMP目录
         import os
-        import sys
         # 获取可执行文件所在目录（兼容单个EXE文件和脚本运行）
-        if getattr(sys, 'frozen', False):
-            # 单个EXE文件运行
-            self.exe_dir = os.path.dirname(os.path.abspath(sys.executable))
-        else:
-            # 脚本运行
-            self.exe_dir = os.path.dirname(os.path.abspath(__file__))
+        self.exe_dir = get_app_dir()
         # 创建相对于可执行文件目录的TEMP目录
         self.temp_dir = os.path.join(self.exe_dir, "TEMP")
-        # 创建TEMP目录
-        os.makedirs(self.temp_dir, exist_ok=True)
+        
+        # 页面缓存目录与TEMP分开，退出时不会被清理
+        self.cache_dir = os.path.join(self.exe_dir, "CACHE")
+        page_cache = PageCache(self.cache_dir)
+        
+        # 断点记录目录：提取中断（断网、关闭窗口、崩溃）后再次提取时从缺失的页面继续
+        self.checkpoint_dir = os.path.join(self.exe_dir, "CHECKPOINT")
+        journal = ExtractionJournal(self.checkpoint_dir)
+        
+        # 日志与进度总线：工作线程只向队列放消息，界面线程定时批量显示
+        # 完整日志写入程序目录下的LOG目录（按大小轮转，退出时不清理）
+        self.log_bus = LogBus(os.path.join(self.exe_dir, "LOG", "scraper.log"))
+        # 每次提取和导出后把各阶段耗时统计写入该文件，供监控系统读取
+        self.metrics_path = os.path.join(self.exe_dir, "LOG", "metrics.json")
+        
+        # 本地价格数据库（勾选「保存到数据库」后才创建）
+        self.db_path = os.path.join(self.exe_dir, "prices.db")
+        self.price_store = None
+        
+        # 全省刷新使用的任务调度器（运行中才有）
+        self.scheduler = None
+        
+        # 网站连接、查询和提取的核心逻辑（创建时会生成TEMP目录）
+        self.engine = ScraperEngine(self.temp_dir, log=self.log_message, max_workers=self.max_workers, max_workers_limit=self.max_workers_limit, page_cache=page_cache, journal=journal)
         
         # 设置程序退出时清理TEMP目录
         self.root.protocol("WM_DELETE_WINDOW", self.close_window)
@@ -68,6 +115,9 @@ class MaterialPriceScraper:
         
         # 添加窗口控制功能
         self.setup_window_controls()
+        
+        # 开始定时刷新日志和进度
+        self.root.after(LOG_POLL_INTERVAL, self.poll_log_bus)
     
     def setup_window_controls(self):
         """设置窗口控制功能（拖动、最小化、关闭）"""
@@ -138,6 +188,18 @@ class MaterialPriceScraper:
         self.connection_status = ttk.Label(connect_container, text="未连接", foreground="#e74c3c")
         self.connection_status.pack(side=tk.LEFT, padx=20, pady=0)
         
+        # 传输方式：默认使用requests，可选asyncio异步传输
+        self.use_async_var = tk.BooleanVar(value=False)
+        async_check = ttk.Checkbutton(connect_container, text="异步传输(asyncio)", variable=self.use_async_var)
+        async_check.pack(side=tk.LEFT, padx=0, pady=0)
+        if not detect_backend():
+            async_check.config(state="disabled")
+        
+        # 页面解析后端
+        ttk.Label(connect_container, text="解析器:").pack(side=tk.LEFT, padx=(20, 5), pady=0)
+        self.parser_var = tk.StringVar(value=DEFAULT_BACKEND)
+        ttk.Combobox(connect_container, textvariable=self.parser_var, values=available_backends(), state="readonly", width=12).pack(side=tk.LEFT, padx=0, pady=0)
+        
         # 框架2：选择参数
         frame_select = ttk.LabelFrame(main_content, text="选择参数")
         frame_select.pack(fill=tk.X, pady=(0, 20), padx=0)
@@ -165,6 +227,26 @@ class MaterialPriceScraper:
         self.month_combo = ttk.Combobox(select_container, textvariable=self.month_var, state="readonly", width=15)
         self.month_combo.grid(row=0, column=5, padx=(0, 0), pady=5, sticky="w")
         
+        # 查询条件：由网站筛选材料类别、名称和编号，只下载符合条件的页面
+        category_label = ttk.Label(select_container, text="材料类别:")
+        category_label.grid(row=1, column=0, padx=(0, 10), pady=5, sticky="w")
+        self.category_var = tk.StringVar(value=ALL_CATEGORIES)
+        self.category_combo = ttk.Combobox(select_container, textvariable=self.category_var, values=[ALL_CATEGORIES], width=30)
+        self.category_combo.grid(row=1, column=1, padx=(0, 20), pady=5, sticky="w")
+        
+        material_name_label = ttk.Label(select_container, text="材料名称:")
+        material_name_label.grid(row=1, column=2, padx=(0, 10), pady=5, sticky="w")
+        self.material_name_var = tk.StringVar()
+        ttk.Entry(select_container, textvariable=self.material_name_var, width=17).grid(row=1, column=3, padx=(0, 20), pady=5, sticky="w")
+        
+        material_id_label = ttk.Label(select_container, text="材料编号:")
+        material_id_label.grid(row=1, column=4, padx=(0, 10), pady=5, sticky="w")
+        self.material_id_var = tk.StringVar()
+        ttk.Entry(select_container, textvariable=self.material_id_var, width=17).grid(row=1, column=5, padx=(0, 0), pady=5, sticky="w")
+        
+        for filter_var in (self.category_var, self.material_name_var, self.material_id_var):
+            filter_var.trace_add("write", lambda *args: self.on_parameter_change())
+        
         # 整合数据处理模块
         frame_processing = ttk.LabelFrame(main_content, text="数据处理")
         frame_processing.pack(fill=tk.X, pady=(0, 20), padx=0)
@@ -216,6 +298,31 @@ class MaterialPriceScraper:
         self.extract_all_pages_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(extract_options, text="提取所有页", variable=self.extract_all_pages_var).pack(side=tk.LEFT, padx=0, pady=0)
         
+        # 流式导出：提取时直接写入文件，不在内存中保存全部数据
+        self.stream_export_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(extract_options, text="流式导出", variable=self.stream_export_var).pack(side=tk.LEFT, padx=(15, 0), pady=0)
+        
+        # 保存到本地价格数据库
+        self.save_db_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(extract_options, text="保存到数据库", variable=self.save_db_var).pack(side=tk.LEFT, padx=(15, 0), pady=0)
+        
+        # 并发数设置
+        ttk.Label(extract_options, text="并发数:").pack(side=tk.LEFT, padx=(15, 5), pady=0)
+        self.max_workers_var = tk.IntVar(value=self.max_workers)
+        ttk.Spinbox(extract_options, from_=1, to=self.max_workers_limit, textvariable=self.max_workers_var, width=4, state="readonly").pack(side=tk.LEFT, padx=0, pady=0)
+        
+        # 自适应并发：网站响应正常时逐步增加并发数，超时或出错时减半
+        self.adaptive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(extract_options, text="自适应", variable=self.adaptive_var).pack(side=tk.LEFT, padx=(10, 0), pady=0)
+        
+        # 多进程解析：页面交给解析进程池，使用全部CPU核
+        self.parse_processes_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(extract_options, text="多进程解析", variable=self.parse_processes_var).pack(side=tk.LEFT, padx=(10, 0), pady=0)
+        
+        # 边下载边解析：识别出数据表格后各页一边接收一边提取数据行
+        self.stream_parse_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(extract_options, text="边下载边解析", variable=self.stream_parse_var).pack(side=tk.LEFT, padx=(10, 0), pady=0)
+        
         # 分隔线
         separator2 = ttk.Separator(processing_container, orient=tk.VERTICAL)
         separator2.pack(side=tk.LEFT, fill=tk.Y, padx=10)
@@ -233,8 +340,12 @@ class MaterialPriceScraper:
         self.export_btn = ttk.Button(step3_content, text="导出数据", command=self.export_data, bootstyle="danger")
         self.export_btn.pack(side=tk.LEFT, padx=0, pady=0)
         
+        # 全省刷新：全部城市×所选年份的各月份一次性交给任务调度器，共用并发数
+        self.refresh_btn = ttk.Button(step3_content, text="全省刷新", command=self.refresh_province, bootstyle="secondary")
+        self.refresh_btn.pack(side=tk.LEFT, padx=(15, 0), pady=0)
+        
         # 框架6：进度和日志
-        frame_progress = ttk.LabelFrame(main_content, text="执行进度与日志")
+        self.frame_progress = frame_progress = ttk.LabelFrame(main_content, text="执行进度与日志")
         frame_progress.pack(fill=tk.BOTH, expand=True, pady=(0, 0), padx=0)
         progress_container = ttk.Frame(frame_progress, padding=15)
         progress_container.pack(fill=tk.BOTH, expand=True)
@@ -265,6 +376,10 @@ class MaterialPriceScraper:
         self.log_text.config(yscrollcommand=log_scrollbar.set)
         log_scrollbar.config(command=self.log_text.yview)
         
+        # 日志颜色标签
+        for prefix, color in LOG_COLORS.items():
+            self.log_text.tag_config(prefix, foreground=color)
+        
         # 初始化按钮状态
         self.update_button_states()
     
@@ -273,6 +388,11 @@ class MaterialPriceScraper:
         try:
             import os
             import shutil
+            # 释放网络资源，停止异步传输的事件循环
+            self.engine.close()
+            self.log_bus.close()
+            if self.price_store:
+                self.price_store.close()
             # 删除TEMP目录及其内容
             if os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir)
@@ -282,71 +402,62 @@ class MaterialPriceScraper:
         finally:
             self.root.destroy()
     
-    def update_button_states(self):
-        """更新按钮状态"""
-        if self.is_connected:
-            self.connect_btn.config(state="disabled")
-            self.query_btn.config(state="normal")
-            self.connection_status.config(text="已连接", foreground="#27ae60")
-        else:
-            self.connect_btn.config(state="normal")
-            self.query_btn.config(state="disabled")
-            self.extract_btn.config(state="disabled")
-            self.export_btn.config(state="disabled")
-            self.connection_status.config(text="未连接", foreground="#e74c3c")
-    
     def log_message(self, message):
-        """添加日志消息"""
-        # 定义日志级别颜色映射
-        log_colors = {
-            "✅": "#008000",  # 成功 - 绿色
-            "❌": "#ff0000",  # 错误 - 红色
-            "⚠️": "#ff8c00",  # 警告 - 橙色
-            "🔄": "#0000ff",  # 过程 - 蓝色
-            "📌": "#800080",  # 关键信息 - 紫色
-            "📊": "#008080",  # 数据 - 青色
-            "⏱️": "#a9a9a9",  # 时间 - 灰色
-            "📋": "#696969",  # 列表 - 深灰色
-            "🎉": "#ff69b4"   # 完成 - 粉色
-        }
-        
-        # 提取日志前缀（如果有）
-        prefix = message[:2] if message and message[0] in ["✅", "❌", "⚠️", "🔄", "📌", "📊", "⏱️", "📋", "🎉"] else ""
-        
-        # 创建带有时间戳的日志消息
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"{timestamp} - {message}\n"
-        
-        # 插入日志消息
-        self.log_text.insert(tk.END, log_entry)
-        
-        # 根据日志级别设置颜色
-        if prefix in log_colors:
-            # 获取当前文本的末尾位置
-            end_pos = self.log_text.index(tk.END)
-            # 计算日志条目的起始和结束位置
-            start_pos = end_pos + "-1l+0c"
-            end_pos = end_pos + "-1c"
-            # 设置颜色
-            self.log_text.tag_add(prefix, start_pos, end_pos)
-            self.log_text.tag_config(prefix, foreground=log_colors[prefix])
-        
-        # 滚动到最新日志
-        self.log_text.see(tk.END)
-        # 更新UI
-        self.root.update_idletasks()
+        """添加日志消息（可在任意线程调用，消息进入队列后由界面线程统一显示）"""
+        self.log_bus.log(message)
+    
+    def poll_log_bus(self):
+        """定时取出日志和进度消息，批量更新界面"""
+        entries, progress = self.log_bus.drain()
+        
+        if entries:
+            for timestamp, message in entries:
+                # 根据日志前缀选择颜色
+                prefix = next((p for p in LOG_COLORS if message.startswith(p)), None)
+                log_entry = f"{timestamp:%H:%M:%S} - {message}\n"
+                if prefix:
+                    self.log_text.insert(tk.END, log_entry, prefix)
+                else:
+                    self.log_text.insert(tk.END, log_entry)
+            
+            # 只保留最近的日志行，完整日志在日志文件中
+            line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+            if line_count > MAX_LOG_LINES:
+                self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
+            
+            # 滚动到最新日志
+            self.log_text.see(tk.END)
+        
+        if progress is not None:
+            self.progress_var.set(progress)
+            self.update_speed(progress)
+        
+        self.root.after(LOG_POLL_INTERVAL, self.poll_log_bus)
+    
+    def update_speed(self, progress):
+        """提取过程中在进度框标题上显示最近的提取速度（每秒页面数）"""
+        controller = self.engine.rate_controller
+        if 0 < progress < 100:
+            speed = f"{controller.pages_per_second():.1f} 页/秒"
+            if controller.adaptive:
+                speed += f"，并发上限 {int(controller.limit)}"
+            self.frame_progress.config(text=f"执行进度与日志（{speed}）")
+        else:
+            self.frame_progress.config(text="执行进度与日志")
     
     def update_button_states(self):
         """更新按钮状态"""
         if self.is_connected:
             self.connect_btn.config(state="disabled")
             self.query_btn.config(state="normal")
+            self.refresh_btn.config(state="normal")
             self.connection_status.config(text="已连接", foreground="green")
         else:
             self.connect_btn.config(state="normal")
             self.query_btn.config(state="disabled")
             self.extract_btn.config(state="disabled")
             self.export_btn.config(state="disabled")
+            self.refresh_btn.config(state="disabled")
             self.connection_status.config(text="未连接", foreground="red")
     
     def on_parameter_change(self):
@@ -355,16 +466,19 @@ class MaterialPriceScraper:
         current_city = self.city_var.get()
         current_year = self.year_var.get()
         current_month = self.month_var.get()
+        current_filter = self.get_selected_filter(log=False) or QueryFilter()
         
         # 检查是否有变化
         if (current_city != self.current_city or 
             current_year != self.current_year or 
-            current_month != self.current_month):
+            current_month != self.current_month or
+            current_filter != self.current_filter):
             
             # 更新当前参数
             self.current_city = current_city
             self.current_year = current_year
             self.current_month = current_month
+            self.current_filter = current_filter
             
             # 启用查询按钮
             if self.is_connected:
@@ -388,90 +502,23 @@ class MaterialPriceScraper:
         """连接到网站，建立会话"""
         # 立即禁用连接按钮，防止重复点击
         self.connect_btn.config(state="disabled")
+        use_async = self.use_async_var.get()
         
         def connect_task():
-            max_retries = 3
-            retry_count = 0
-            timeout = 60  # 增加超时时间到60秒
-            
-            while retry_count < max_retries:
-                try:
-                    retry_count += 1
-                    self.log_message(f"🔄 正在连接到网站 (第{retry_count}/{max_retries}次尝试)...")
-                    
-                    # 创建会话对象
-                    self.session = requests.Session()
-                    
-                    # 设置完整的浏览器头
-                    self.session.headers.update({
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                        'Accept-Encoding': 'gzip, deflate',
-                        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                        'Cache-Control': 'no-cache',
-                        'Connection': 'keep-alive',
-                        'DNT': '1',
-                        'Pragma': 'no-cache',
-                        'Referer': 'http://218.60.144.156/jgxx_clcx.asp',
-                        'Upgrade-Insecure-Requests': '1',
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    })
-                    
-                    # 先访问主入口页面，建立会话
-                    main_url = "http://218.60.144.156/jgxx_clcx.asp"
-                    self.log_message("📌 访问主入口页面")
-                    self.log_message(f"⏱️  超时时间: {timeout}秒")
-                    main_response = self.session.get(main_url, timeout=timeout)
-                    # 先尝试从响应头获取编码，再使用gbk作为备选
-                    main_response.encoding = main_response.apparent_encoding if main_response.apparent_encoding else 'gbk'
-                    
-                    if main_response.status_code != 200:
-                        self.log_message(f"❌ 主入口页面访问失败，状态码: {main_response.status_code}")
-                        if retry_count < max_retries:
-                            time.sleep(2)
-                        continue
-                    
-                    # 访问真实表单页面
-                    form_url = "http://218.60.144.156/jgxx_cl1.asp?view=hidden"
-                    self.log_message("📌 访问真实表单页面")
-                    form_response = self.session.get(form_url, timeout=timeout)
-                    # 先尝试从响应头获取编码，再使用gbk作为备选
-                    form_response.encoding = form_response.apparent_encoding if form_response.apparent_encoding else 'gbk'
-                    
-                    if form_response.status_code != 200:
-                        self.log_message(f"❌ 真实表单页面访问失败，状态码: {form_response.status_code}")
-                        if retry_count < max_retries:
-                            time.sleep(2)
-                        continue
-                    
-                    self.log_message("✅ 网站连接成功")
-                    self.is_connected = True
-                    
-                    # 获取城市列表
-                    self.get_city_list(form_response.text)
-                    
-                    # 获取年份和月份列表
-                    self.get_year_month_list()
-                    
-                    # 更新按钮状态
-                    self.root.after(0, self.update_button_states)
-                    
-                    return  # 连接成功，退出循环
-                    
-                except requests.exceptions.Timeout:
-                    self.log_message(f"⏱️  连接超时 (第{retry_count}/{max_retries}次)")
-                    if retry_count < max_retries:
-                        time.sleep(2)
-                except requests.exceptions.ConnectionError:
-                    self.log_message(f"❌ 网络连接错误 (第{retry_count}/{max_retries}次)")
-                    if retry_count < max_retries:
-                        time.sleep(2)
-                except Exception as e:
-                    self.log_message(f"❌ 网站连接失败 (第{retry_count}/{max_retries}次)")
-                    if retry_count < max_retries:
-                        time.sleep(2)
+            if self.engine.connect(use_async=use_async):
+                self.is_connected = True
+                
+                # 获取城市列表和材料类别
+                self.get_city_list()
+                self.get_category_list()
+                
+                # 获取年份和月份列表
+                self.get_year_month_list()
+                
+                # 更新按钮状态
+                self.root.after(0, self.update_button_states)
+                return
             
-            # 所有重试都失败
-            self.log_message(f"❌ 网站连接失败，已重试{max_retries}次")
             self.is_connected = False
             # 连接失败后，重新启用连接按钮
             self.root.after(0, lambda: self.connect_btn.config(state="normal"))
@@ -483,94 +530,21 @@ class MaterialPriceScraper:
         thread.daemon = True
         thread.start()
     
-    def get_city_list(self, html_content):
-        """从网页内容中提取城市列表"""
-        try:
-            self.log_message("🔄 正在获取城市列表...")
-            
-            # 保存调试HTML，便于分析
-            import os
-            debug_file_path = os.path.join(self.temp_dir, "city_list_debug.html")
-            with open(debug_file_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            self.log_message("✅ 已保存城市列表调试文件")
-            
-            # 使用gbk编码解析HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # 查找城市下拉选择框，确保只选择城市选择框
-            city_select = soup.find('select', {'name': 'dq_id'})
-            
-            if not city_select:
-                # 使用默认城市列表
-                city_mapping = {
-                    "15": "沈阳市", "16": "大连市", "53": "大连金普新区", "56": "大连开发区（2017前）",
-                    "17": "鞍山市", "21": "抚顺市", "22": "本溪市", "25": "丹东市", "33": "锦州市",
-                    "29": "营口市", "34": "阜新市", "35": "辽阳市", "36": "铁岭市", "44": "朝阳市",
-                    "45": "盘锦市", "47": "葫芦岛市", "48": "绥中"
-                }
-            else:
-                # 提取城市选项
-                city_mapping = {}
-                options = city_select.find_all('option')
-                
-                for option in options:
-                    value = option.get('value', '').strip()
-                    text = option.get_text(strip=True)
-                    
-                    # 严格过滤，只接受有效的城市选项
-                    if value and text and value != '-1' and text != '请选择' and len(text) > 1:
-                        # 尝试编码处理
-                        if isinstance(text, str):
-                            try:
-                                # 先尝试gbk解码
-                                text = text.encode('iso-8859-1', errors='ignore').decode('gbk')
-                            except:
-                                try:
-                                    # 再尝试utf-8解码
-                                    text = text.encode('iso-8859-1', errors='ignore').decode('utf-8')
-                                except:
-                                    # 最后使用replace处理
-                                    text = text.encode('utf-8', errors='replace').decode('utf-8')
-                        
-                        # 确保不是数字或年份
-                        if not text.isdigit() and len(text) > 1:
-                            city_mapping[value] = text
-            
-            # 验证城市映射，如果为空则使用默认城市列表
-            if not city_mapping:
-                self.log_message("⚠️  未找到有效的城市选项，使用默认城市列表")
-                city_mapping = {
-                    "15": "沈阳市", "16": "大连市", "53": "大连金普新区", "56": "大连开发区（2017前）",
-                    "17": "鞍山市", "21": "抚顺市", "22": "本溪市", "25": "丹东市", "33": "锦州市",
-                    "29": "营口市", "34": "阜新市", "35": "辽阳市", "36": "铁岭市", "44": "朝阳市",
-                    "45": "盘锦市", "47": "葫芦岛市", "48": "绥中"
-                }
-            
-            self.city_mapping = city_mapping
-            city_values = list(city_mapping.values())
-            
-            self.log_message(f"✅ 成功获取 {len(city_values)} 个城市")
-            
-            # 更新城市选择器
-            self.root.after(0, lambda: self.city_combo.config(values=city_values, postcommand=self.on_parameter_change))
-            
-            if city_values:
-                self.root.after(0, lambda: self.city_combo.current(0))
-        except Exception as e:
-            # 使用默认城市列表
-            city_mapping = {
-                "15": "沈阳市", "16": "大连市", "53": "大连金普新区", "56": "大连开发区（2017前）",
-                "17": "鞍山市", "21": "抚顺市", "22": "本溪市", "25": "丹东市", "33": "锦州市",
-                "29": "营口市", "34": "阜新市", "35": "辽阳市", "36": "铁岭市", "44": "朝阳市",
-                "45": "盘锦市", "47": "葫芦岛市", "48": "绥中"
-            }
-            self.city_mapping = city_mapping
-            city_values = list(city_mapping.values())
-            self.log_message(f"✅ 成功获取 {len(city_values)} 个城市")
-            self.root.after(0, lambda: self.city_combo.config(values=city_values, postcommand=self.on_parameter_change))
-            if city_values:
-                self.root.after(0, lambda: self.city_combo.current(0))
+    def get_city_list(self):
+        """使用连接时获取的城市列表更新城市选择器"""
+        self.city_mapping = self.engine.city_mapping
+        city_values = list(self.city_mapping.values())
+        
+        # 更新城市选择器
+        self.root.after(0, lambda: self.city_combo.config(values=city_values, postcommand=self.on_parameter_change))
+        
+        if city_values:
+            self.root.after(0, lambda: self.city_combo.current(0))
+    
+    def get_category_list(self):
+        """使用连接时从查询表单获取的材料类别更新材料类别选择器"""
+        category_values = [ALL_CATEGORIES] + list(self.engine.category_mapping.values())
+        self.root.after(0, lambda: self.category_combo.config(values=category_values))
     
     def get_year_month_list(self):
         """生成年份和月份列表"""
@@ -599,367 +573,286 @@ class MaterialPriceScraper:
         except Exception as e:
             self.log_message(f"❌ 生成年份和月份列表失败: {str(e)}")
     
+    def get_selected_city_id(self):
+        """获取当前选择的城市ID和日期字符串，参数不完整时记录日志并返回None"""
+        selected_city = self.city_var.get()
+        selected_year = self.year_var.get()
+        selected_month = self.month_var.get()
+        
+        if not selected_city or not selected_year or not selected_month:
+            self.log_message("❌ 请选择城市、年份和月份")
+            return None
+        
+        # 获取城市ID
+        city_id = self.engine.find_city_id(selected_city)
+        if not city_id:
+            self.log_message("❌ 未找到选择的城市ID")
+            return None
+        
+        return city_id, build_date_str(selected_year, selected_month)
+    
+    def get_selected_filter(self, log=True):
+        """获取当前的查询条件（QueryFilter），材料类别无效时返回None"""
+        category_text = self.category_var.get().strip()
+        category = ""
+        if category_text and category_text != ALL_CATEGORIES:
+            category = self.engine.find_category(category_text)
+            if category is None:
+                if log:
+                    self.log_message(f"❌ 未知的材料类别: {category_text}")
+                return None
+        return QueryFilter(category, self.material_name_var.get(), self.material_id_var.get())
+    
     def query_data(self):
         """查询数据，获取总页数和总记录数"""
         def query_task():
-            max_retries = 3
-            retry_count = 0
-            timeout = 60  # 增加超时时间到60秒
+            selection = self.get_selected_city_id()
+            if not selection:
+                return
+            city_id, date_str = selection
+            filters = self.get_selected_filter()
+            if filters is None:
+                return
             
-            while retry_count < max_retries:
-                try:
-                    retry_count += 1
-                    self.log_message(f"🔄 正在查询数据 (第{retry_count}/{max_retries}次尝试)...")
-                    
-                    # 获取选择的城市、年份和月份
-                    selected_city = self.city_var.get()
-                    selected_year = self.year_var.get()
-                    selected_month = self.month_var.get()
-                    
-                    if not selected_city or not selected_year or not selected_month:
-                        self.log_message("❌ 请选择城市、年份和月份")
-                        return
-                    
-                    # 获取城市ID
-                    city_id = None
-                    for cid, name in self.city_mapping.items():
-                        if name == selected_city:
-                            city_id = cid
-                            break
-                    
-                    if not city_id:
-                        self.log_message("❌ 未找到选择的城市ID")
-                        return
-                    
-                    # 构建查询URL
-                    date_str = f"{selected_year}/{selected_month}/20"
-                    query_url = f"http://218.60.144.156/jgxx_cl1.asp?pageno=1&dq_id={city_id}&cllb=&time1={date_str}&clmc=&clid=&view=hidden&tc="
-                    
-                    self.log_message("📌 查询")
-                    
-                    # 发送查询请求
-                    response = self.session.get(query_url, timeout=timeout)
-                    # 先尝试从响应头获取编码，再使用gbk作为备选
-                    response.encoding = response.apparent_encoding if response.apparent_encoding else 'gbk'
-                    
-                    if response.status_code != 200:
-                        self.log_message(f"❌ 查询失败，状态码: {response.status_code}")
-                        if retry_count < max_retries:
-                            time.sleep(2)
-                        continue
-                    
-                    # 解析响应，获取总页数和总记录数
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 获取总记录数
-                    total_records = 0
-                    
-                    # 保存调试HTML，便于分析
-                    import os
-                    debug_file_path = os.path.join(self.temp_dir, "query_result_debug.html")
-                    with open(debug_file_path, "w", encoding="utf-8") as f:
-                        f.write(response.text)
-                    
-                    # 尝试从分页信息中提取总记录数
-                    pagination_text = soup.get_text()
-                    
-                    # 方法1：从"共找到XX条信息"中提取（带引号）
-                    records_match = re.search(r'共找到(\d+)条信息', pagination_text)
-                    if records_match:
-                        total_records = int(records_match.group(1))
-                    else:
-                        # 方法2：从"共XX条记录"中提取（备用）
-                        records_match = re.search(r'共(\d+)条记录', pagination_text)
-                        if records_match:
-                            total_records = int(records_match.group(1))
-                        else:
-                            # 方法3：尝试从其他模式中提取
-                            records_match = re.search(r'\d+条', pagination_text)
-                            if records_match:
-                                # 提取数字部分
-                                num_match = re.search(r'\d+', records_match.group(0))
-                                if num_match:
-                                    total_records = int(num_match.group(0))
-                            else:
-                                # 方法4：查找所有数字模式，找出可能的总记录数
-                                all_numbers = re.findall(r'\d+', pagination_text)
-                                if all_numbers:
-                                    # 尝试使用最大的数字作为总记录数
-                                    total_records = max(int(num) for num in all_numbers)
-                    
-                    # 获取总页数
-                    total_pages = 1
-                    # 方法1：从分页文本中提取
-                    pages_match = re.search(r'\d+/\d+', pagination_text)
-                    if pages_match:
-                        # 提取分数形式的页码，如"1/10"，取分母
-                        pages_part = pages_match.group(0)
-                        total_pages = int(pages_part.split('/')[1])
-                    else:
-                        # 方法2：计算总页数
-                        if total_records > 0:
-                            total_pages = (total_records + 49) // 50  # 每页50条数据
-                    
-                    self.total_records = total_records
-                    self.total_pages = total_pages
-                    
-                    # 更新UI显示
-                    self.root.after(0, lambda: self.total_records_label.config(text=f"总记录数: {total_records}"))
-                    self.root.after(0, lambda: self.total_pages_label.config(text=f"总页数: {total_pages}"))
-                    
-                    self.log_message(f"✅ 查询成功，共 {total_records} 条记录，{total_pages} 页")
-                    
-                    # 锁定查询按钮，只有参数变更后才能重新点击
-                    self.root.after(0, lambda: self.query_btn.config(state="disabled"))
-                    
-                    # 启用数据提取按钮
-                    self.root.after(0, lambda: self.extract_btn.config(state="normal"))
-                    
-                    return  # 查询成功，退出循环
-                    
-                except requests.exceptions.Timeout:
-                    self.log_message(f"⏱️  查询超时 (第{retry_count}/{max_retries}次)")
-                    if retry_count < max_retries:
-                        time.sleep(2)
-                except requests.exceptions.ConnectionError:
-                    self.log_message(f"❌ 网络连接错误 (第{retry_count}/{max_retries}次)")
-                    if retry_count < max_retries:
-                        time.sleep(2)
-                except Exception as e:
-                    self.log_message(f"❌ 查询失败 (第{retry_count}/{max_retries}次)")
-                    if retry_count < max_retries:
-                        time.sleep(2)
+            self.engine.parser_backend = self.parser_var.get()
+            result = self.engine.query(city_id, date_str, filters=filters)
+            if not result:
+                return
+            total_records, total_pages = result
+            
+            self.total_records = total_records
+            self.total_pages = total_pages
+            
+            # 更新UI显示
+            self.root.after(0, lambda: self.total_records_label.config(text=f"总记录数: {total_records}"))
+            self.root.after(0, lambda: self.total_pages_label.config(text=f"总页数: {total_pages}"))
             
-            # 所有重试都失败
-            self.log_message(f"❌ 查询失败，已重试{max_retries}次")
+            # 锁定查询按钮，只有参数变更后才能重新点击
+            self.root.after(0, lambda: self.query_btn.config(state="disabled"))
+            
+            # 启用数据提取按钮
+            self.root.after(0, lambda: self.extract_btn.config(state="normal"))
         
         # 使用线程执行查询操作，避免阻塞GUI
         thread = threading.Thread(target=query_task)
         thread.daemon = True
         thread.start()
     
-    def extract_data(self):
-        """提取数据"""
+    def extract_data(self, max_workers=None):
+        """提取数据
+        
+        max_workers: 并发提取的工作线程数，为None时使用界面上的设置
+        """
+        # 流式导出需要在提取前选择保存路径
+        stream_path = None
+        if self.stream_export_var.get():
+            stream_path = self.ask_export_path()
+            if not stream_path:
+                return
+        
         def extract_task():
             try:
                 self.log_message("🔄 正在提取数据...")
                 
-                # 获取选择的城市、年份和月份
-                selected_city = self.city_var.get()
-                selected_year = self.year_var.get()
-                selected_month = self.month_var.get()
-                
-                if not selected_city or not selected_year or not selected_month:
-                    self.log_message("❌ 请选择城市、年份和月份")
+                selection = self.get_selected_city_id()
+                if not selection:
                     return
-                
-                # 获取城市ID
-                city_id = None
-                for cid, name in self.city_mapping.items():
-                    if name == selected_city:
-                        city_id = cid
-                        break
-                
-                if not city_id:
-                    self.log_message("❌ 未找到选择的城市ID")
+                city_id, date_str = selection
+                filters = self.get_selected_filter()
+                if filters is None:
                     return
                 
-                # 构建日期字符串
-                date_str = f"{selected_year}/{selected_month}/20"
-                
                 # 确定要提取的页数
                 pages_to_extract = self.total_pages
                 if not self.extract_all_pages_var.get():
                     pages_to_extract = 1
                 
-                self.log_message(f"📌 开始提取 {pages_to_extract} 页数据")
+                # 确定并发数
+                workers = max_workers if max_workers is not None else self.max_workers_var.get()
+                self.engine.parser_backend = self.parser_var.get()
+                # 自适应并发从界面设置的并发数开始调整
+                self.engine.rate_controller.adaptive = self.adaptive_var.get()
+                self.engine.rate_controller.reset(workers)
+                self.engine.parse_workers = default_workers() if self.parse_processes_var.get() else 0
+                self.engine.stream_parse = self.stream_parse_var.get()
                 
-                all_data = []
-                headers = []
+                store = self.get_price_store() if self.save_db_var.get() else None
+                store_month = month_key(date_str)
+                sync_id = store.new_sync_id() if store else None
                 
-                # 提取每一页数据
-                for page_no in range(1, pages_to_extract + 1):
-                    # 更新进度
-                    progress = (page_no - 1) / pages_to_extract * 100
-                    self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                    
-                    # 提取单页数据
-                    page_data, page_headers = self.extract_page_data(city_id, date_str, page_no)
-                    
-                    if not page_data:
-                        self.log_message(f"⚠️  第 {page_no} 页数据提取失败")
-                        continue
-                    
-                    if not headers:
-                        headers = page_headers
-                    
-                    all_data.extend(page_data)
-                    self.log_message(f"✅ 第 {page_no} 页数据提取成功，共 {len(page_data)} 条记录")
+                writer = open_stream_writer(stream_path) if stream_path else None
+                
+                def row_sink(rows, headers):
+                    # 流式导出时同时逐页写入数据库
+                    writer.write_rows(rows, headers)
+                    if store:
+                        store.write_rows(city_id, store_month, rows, headers, sync_id)
+                
+                try:
+                    all_data, headers = self.engine.extract(
+                        city_id, date_str, pages_to_extract, max_workers=workers,
+                        progress=self.log_bus.progress,
+                        row_sink=row_sink if writer else None,
+                        filters=filters, total_pages=self.total_pages
+                    )
+                finally:
+                    if writer:
+                        with self.engine.metrics.stage('export'):
+                            writer.close()
+                self.max_workers = self.engine.max_workers
+                if writer:
+                    self.engine.log_metrics(['export'])
+                self.save_metrics()
+                
+                if store:
+                    city_name = self.city_var.get()
+                    if filters:
+                        # 按条件筛选只得到该月的部分数据，只更新这些记录，不标记该月已完整保存
+                        if not writer:
+                            store.write_rows(city_id, store_month, all_data, headers, sync_id)
+                        store.commit()
+                    elif writer:
+                        store.finish_month(city_id, city_name, store_month, self.total_records, self.total_pages,
+                                           writer.rows_written, sync_id)
+                    else:
+                        store.save_month(city_id, city_name, store_month, all_data, headers,
+                                         self.total_records, self.total_pages)
+                    self.log_message(f"✅ 数据已保存到数据库: {self.db_path}")
                 
                 self.all_data = all_data
                 self.headers = headers
                 
                 # 更新进度
-                self.root.after(0, lambda: self.progress_var.set(100))
+                self.log_bus.progress(100)
                 
-                self.log_message(f"🎉 数据提取完成，共提取 {len(all_data)} 条记录")
+                if writer:
+                    # 数据已经写入文件，无需再导出
+                    self.log_message(f"✅ 数据已保存到: {writer.file_path}，共 {writer.rows_written} 条记录")
+                    return
                 
                 # 启用导出按钮
                 self.root.after(0, lambda: self.export_btn.config(state="normal"))
                 
             except Exception as e:
                 self.log_message("❌ 数据提取失败")
-                self.root.after(0, lambda: self.progress_var.set(0))
+                self.log_bus.progress(0)
         
         # 使用线程执行提取操作，避免阻塞GUI
         thread = threading.Thread(target=extract_task)
         thread.daemon = True
         thread.start()
     
-    def extract_page_data(self, city_id, date_str, page_no):
-        """提取单页数据"""
-        max_retries = 3
-        retry_count = 0
-        timeout = 60  # 增加超时时间到60秒
+    def refresh_province(self):
+        """全省刷新：全部城市×所选年份各月份（当年到当前月份）交给任务调度器同时提取，
+        当前月份优先，结束的任务逐个保存到所选目录；运行中再次点击取消全部任务
+        """
+        import os
+        if self.scheduler is not None:
+            self.log_message("⚠️  正在取消全部任务...")
+            self.scheduler.cancel_all()
+            return
+        
+        year = self.year_var.get()
+        if not year:
+            self.log_message("❌ 请选择年份")
+            return
+        filters = self.get_selected_filter()
+        if filters is None:
+            return
+        output_dir = filedialog.askdirectory(title="选择保存目录")
+        if not output_dir:
+            return
         
-        while retry_count < max_retries:
+        now = datetime.now()
+        last_month = now.month if int(year) == now.year else 12
+        self.engine.parser_backend = self.parser_var.get()
+        self.engine.rate_controller.adaptive = self.adaptive_var.get()
+        self.engine.rate_controller.reset(self.max_workers_var.get())
+        self.engine.parse_workers = default_workers() if self.parse_processes_var.get() else 0
+        self.engine.stream_parse = self.stream_parse_var.get()
+        store = self.get_price_store() if self.save_db_var.get() else None
+        suffix = filters.file_suffix(self.engine.category_mapping)
+        
+        scheduler = JobScheduler(self.engine, workers=self.max_workers_var.get(),
+                                 on_update=lambda job: self.log_bus.progress(scheduler.progress))
+        self.scheduler = scheduler
+        self.refresh_btn.config(text="取消全部")
+        self.log_bus.progress(0)
+        
+        def refresh_task():
             try:
-                retry_count += 1
-                # 构建页面URL
-                page_url = f"http://218.60.144.156/jgxx_cl1.asp?pageno={page_no}&dq_id={city_id}&cllb=&time1={date_str}&clmc=&clid=&view=hidden&tc="
-                
-                # 发送请求
-                response = self.session.get(page_url, timeout=timeout)
-                # 先尝试从响应头获取编码，再使用gbk作为备选
-                response.encoding = response.apparent_encoding if response.apparent_encoding else 'gbk'
-                
-                if response.status_code != 200:
-                    if retry_count < max_retries:
-                        time.sleep(2)
-                    continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 查找数据表格
-                data_table = None
-                tables = soup.find_all('table')
-                
-                # 保存所有表格的信息，便于选择最合适的表格
-                table_info = []
-                
-                for i, table in enumerate(tables):
-                    rows = table.find_all('tr')
-                    cells = []
-                    header_cells = []
-                    data_rows = []
-                    
-                    if rows:
-                        header_cells = rows[0].find_all(['th', 'td'])
-                        data_rows = rows[1:]
-                    
-                    # 计算表格的实际列数（使用表头列数或第一数据行的列数）
-                    actual_cols = len(header_cells)
-                    if not actual_cols and data_rows:
-                        actual_cols = len(data_rows[0].find_all(['th', 'td']))
-                    
-                    # 计算数据行数量
-                    actual_rows = len(data_rows)
-                    
-                    table_info.append({
-                        'index': i,
-                        'rows': len(rows),
-                        'data_rows': actual_rows,
-                        'cols': actual_cols,
-                        'table': table
-                    })
-                
-                # 选择最合适的数据表格
-                # 优先选择：列数 >= 5 且 数据行 >= 10 的表格
-                # 如果没有，选择列数最多的表格
-                # 如果还是没有，选择行数最多的表格
-                best_table = None
-                best_score = -1
-                
-                for info in table_info:
-                    score = 0
-                    
-                    # 列数越多，得分越高
-                    if info['cols'] >= 5:
-                        score += 100
-                    score += info['cols'] * 10
-                    
-                    # 数据行越多，得分越高
-                    if info['data_rows'] >= 10:
-                        score += 50
-                    score += info['data_rows']
-                    
-                    # 总行数越多，得分越高
-                    score += info['rows']
-                    
-                    # 更新最佳表格
-                    if score > best_score:
-                        best_score = score
-                        best_table = info
-                
-                if not best_table:
-                    # 保存调试HTML，便于分析
-                    debug_path = f"page_{page_no}_debug.html"
-                    with open(debug_path, "w", encoding="utf-8") as f:
-                        f.write(response.text)
-                    if retry_count < max_retries:
-                        time.sleep(2)
-                    continue
-                
-                data_table = best_table['table']
-                
-                # 提取表头
-                header_cells = data_table.find_all('tr')[0].find_all(['th', 'td'])
-                headers = []
-                for cell in header_cells:
-                    text = cell.get_text(strip=True)
-                    # 直接使用文本，不进行额外编码处理
-                    if text and not text.isspace():
-                        headers.append(text)
-                
-                # 如果表头为空，使用默认表头
-                if not headers:
-                    headers = ['序号', '材料名称', '规格型号', '单位', '价格(元)', '备注', '发布地区', '发布时间', '材料类别']
-                
-                # 提取数据行
-                data = []
-                rows = data_table.find_all('tr')[1:]
-                
-                for row in rows:
-                    cells = row.find_all('td')
-                    row_data = []
-                    
-                    for cell in cells:
-                        text = cell.get_text(strip=True)
-                        # 直接使用文本，不进行额外编码处理
-                        # 清理空格和特殊字符
-                        text = re.sub(r'\s+', ' ', text).strip()
-                        row_data.append(text)
-                    
-                    # 确保数据长度与表头一致
-                    while len(row_data) < len(headers):
-                        row_data.append('')
-                    
-                    data.append(row_data[:len(headers)])
-                
-                return data, headers
-                
-            except requests.exceptions.Timeout:
-                if retry_count < max_retries:
-                    time.sleep(2)
-            except requests.exceptions.ConnectionError:
-                if retry_count < max_retries:
-                    time.sleep(2)
+                jobs = {}
+                for city_id, city_name in self.city_mapping.items():
+                    for month in range(1, last_month + 1):
+                        job = scheduler.submit(city_id, build_date_str(year, month), filters=filters,
+                                               label=f"{city_name} {year}年{month:02d}月")
+                        jobs[job] = (city_name, month)
+                self.log_message(f"📌 全省刷新：共 {len(jobs)} 个任务，保存到 {output_dir}")
+                
+                saved = 0
+                for job in scheduler.as_completed():
+                    if job.state != "done":
+                        continue
+                    city_name, month = jobs[job]
+                    store_month = month_key(job.date_str)
+                    if store and filters:
+                        # 按条件筛选只得到该月的部分数据，只更新这些记录，不标记该月已完整保存
+                        store.write_rows(job.city_id, store_month, job.data, job.headers, store.new_sync_id())
+                        store.commit()
+                    elif store:
+                        store.save_month(job.city_id, city_name, store_month, job.data, job.headers,
+                                         job.total_records, job.total_pages)
+                    if job.data:
+                        file_path = os.path.join(output_dir, f"{default_filename(city_name, year, month)}{suffix}.xlsx")
+                        with self.engine.metrics.stage('export'):
+                            export_to_file(job.data, job.headers, file_path, log=self.log_message)
+                        saved += 1
+                    # 已经保存的数据不再留在内存中
+                    job.data = None
+                
+                self.log_message(f"🎉 全省刷新完成，共保存 {saved} 个文件")
             except Exception as e:
-                if retry_count < max_retries:
-                    time.sleep(2)
-        
-        # 所有重试都失败
-        return [], []
+                self.log_message(f"❌ 全省刷新失败: {str(e)}")
+            finally:
+                scheduler.close()
+                self.engine.log_metrics()
+                self.save_metrics()
+                self.scheduler = None
+                self.root.after(0, lambda: self.refresh_btn.config(text="全省刷新"))
+        
+        # 调度器的工作线程负责网络请求，这里的线程只负责提交任务和保存结果
+        thread = threading.Thread(target=refresh_task)
+        thread.daemon = True
+        thread.start()
+    
+    def save_metrics(self):
+        """把当前任务的耗时统计写入LOG目录"""
+        try:
+            self.engine.job_metrics().write(self.metrics_path)
+        except OSError as e:
+            self.log_message(f"⚠️  耗时统计写入失败: {e}")
+    
+    def get_price_store(self):
+        """打开本地价格数据库（第一次使用时创建）"""
+        if self.price_store is None:
+            self.price_store = PriceStore(self.db_path)
+        return self.price_store
+    
+    def ask_export_path(self):
+        """选择保存路径，取消时返回空字符串"""
+        # 构建默认文件名格式：辽宁省XX市YYYY年MM月份网刊
+        initial_filename = default_filename(self.city_var.get(), self.year_var.get(), self.month_var.get())
+        filters = self.get_selected_filter(log=False)
+        if filters:
+            initial_filename += filters.file_suffix(self.engine.category_mapping)
+        
+        return filedialog.asksaveasfilename(
+            initialfile=initial_filename,
+            defaultextension=".xlsx",
+            filetypes=[("Excel文件", "*.xlsx"), ("CSV文件", "*.csv"), ("Parquet文件", "*.parquet"),
+                       ("Feather文件", "*.feather"), ("所有文件", "*.*")],
+            title="保存数据文件"
+        )
     
     def export_data(self):
         """保存数据到Excel/CSV（增强版：彻底解决乱码问题并添加表格样式）"""
@@ -968,211 +861,15 @@ class MaterialPriceScraper:
             return
         
         try:
-            # 1. 增强数据清洗：确保所有数据都是有效的UTF-8字符串
-            clean_data = []
-            for row in self.all_data:
-                clean_row = []
-                for cell in row:
-                    if isinstance(cell, str):
-                        # 确保字符串是有效的UTF-8
-                        cell = cell.encode('utf-8', errors='replace').decode('utf-8')
-                    clean_row.append(cell)
-                clean_data.append(clean_row)
-            
-            # 2. 增强表头处理：确保表头也是有效的UTF-8字符串
-            clean_headers = []
-            for header in self.headers:
-                if isinstance(header, str):
-                    header = header.encode('utf-8', errors='replace').decode('utf-8')
-                clean_headers.append(header)
-            
-            # 3. 创建DataFrame，确保数据结构正确
-            df = pd.DataFrame(clean_data, columns=clean_headers)
-            
-            # 获取选择的城市、年份和月份
-            selected_city = self.city_var.get()
-            selected_year = self.year_var.get()
-            selected_month = self.month_var.get()
-            
-            # 构建默认文件名格式：辽宁省XX市YYYY年MM月份网刊
-            default_filename = f"辽宁省{selected_city}{selected_year}年{selected_month}月份网刊"
-            
-            # 选择保存路径
-            file_path = filedialog.asksaveasfilename(
-                initialfile=default_filename,
-                defaultextension=".xlsx",
-                filetypes=[("Excel文件", "*.xlsx"), ("CSV文件", "*.csv"), ("所有文件", "*.*")],
-                title="保存数据文件"
-            )
+            file_path = self.ask_export_path()
             
             if not file_path:
                 return
             
-            # 4. 保存为Excel文件（增强版：添加表格样式）
-            if file_path.endswith('.xlsx'):
-                try:
-                    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                        # 写入数据
-                        df.to_excel(writer, index=False, sheet_name='材料价格')
-                        
-                        # 获取工作表
-                        worksheet = writer.sheets['材料价格']
-                        
-                        # 导入openpyxl样式模块
-                        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-                        
-                        # 定义样式
-                        # 表头样式
-                        header_font = Font(bold=True, color="FFFFFF", size=10)
-                        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                        header_alignment = Alignment(horizontal="center", vertical="center")
-                        
-                        # 数据样式
-                        data_font = Font(size=10)
-                        data_alignment = Alignment(horizontal="left", vertical="center", wrap_text=False)
-                        
-                        # 边框样式
-                        thin_border = Border(
-                            left=Side(style='thin'),
-                            right=Side(style='thin'),
-                            top=Side(style='thin'),
-                            bottom=Side(style='thin')
-                        )
-                        
-                        # 设置表头样式
-                        for col_num, header in enumerate(clean_headers, 1):
-                            cell = worksheet.cell(row=1, column=col_num)
-                            cell.font = header_font
-                            cell.fill = header_fill
-                            cell.alignment = header_alignment
-                            cell.border = thin_border
-                        
-                        # 设置数据区域样式
-                        for row_num in range(2, len(df) + 2):
-                            for col_num in range(1, len(clean_headers) + 1):
-                                cell = worksheet.cell(row=row_num, column=col_num)
-                                cell.font = data_font
-                                cell.alignment = data_alignment
-                                cell.border = thin_border
-                        
-                        # 自动调整列宽
-                        for column in worksheet.columns:
-                            max_length = 0
-                            column_letter = column[0].column_letter
-                            for cell in column:
-                                try:
-                                    if len(str(cell.value)) > max_length:
-                                        max_length = len(str(cell.value))
-                                except:
-                                    pass
-                            adjusted_width = min(max_length + 2, 100)  # 限制最大宽度为100
-                            worksheet.column_dimensions[column_letter].width = adjusted_width
-                        
-                        # 设置行高
-                        worksheet.row_dimensions[1].height = 21  # 表头行高
-                        for row_num in range(2, len(df) + 2):
-                            worksheet.row_dimensions[row_num].height = 21  # 数据行高
-                        
-                        # 添加隔行显示底色
-                        from openpyxl.styles import PatternFill
-                        even_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")  # 浅灰色
-                        for row_num in range(2, len(df) + 2, 2):  # 从第2行开始，间隔2行
-                            for col_num in range(1, len(clean_headers) + 1):
-                                cell = worksheet.cell(row=row_num, column=col_num)
-                                cell.fill = even_fill                        
-                    self.log_message(f"✅ Excel数据已保存到: {file_path}")
-                except Exception as e:
-                    # 降级方案：使用xlwt引擎（如果可用）
-                    try:
-                        with pd.ExcelWriter(file_path, engine='xlwt', encoding='utf-8') as writer:
-                            df.to_excel(writer, index=False, sheet_name='材料价格')
-                        self.log_message(f"✅ Excel数据已保存到: {file_path}")
-                    except:
-                        # 最终方案：保存为CSV
-                        csv_path = file_path.replace('.xlsx', '.csv')
-                        df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-                        self.log_message(f"🔄 无法保存为Excel，已保存为CSV: {csv_path}")
-                        file_path = csv_path
-            # 5. 保存为CSV文件（增强版，确保带BOM头）
-            elif file_path.endswith('.csv'):
-                # 使用utf-8-sig编码，确保Windows Excel能正确识别
-                df.to_csv(file_path, index=False, encoding='utf-8-sig', sep=',')
-                self.log_message(f"✅ CSV数据已保存到: {file_path}")
-            else:
-                # 默认保存为Excel
-                excel_path = file_path + '.xlsx'
-                with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                    # 写入数据
-                    df.to_excel(writer, index=False, sheet_name='材料价格')
-                    
-                    # 获取工作表
-                    worksheet = writer.sheets['材料价格']
-                    
-                    # 导入openpyxl样式模块
-                    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-                    
-                    # 定义样式
-                    # 表头样式
-                    header_font = Font(bold=True, color="FFFFFF", size=10)
-                    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                    header_alignment = Alignment(horizontal="center", vertical="center")
-                    
-                    # 数据样式
-                    data_font = Font(size=10)
-                    data_alignment = Alignment(horizontal="left", vertical="center", wrap_text=False)
-                    
-                    # 边框样式
-                    thin_border = Border(
-                        left=Side(style='thin'),
-                        right=Side(style='thin'),
-                        top=Side(style='thin'),
-                        bottom=Side(style='thin')
-                    )
-                    
-                    # 设置表头样式
-                    for col_num, header in enumerate(clean_headers, 1):
-                        cell = worksheet.cell(row=1, column=col_num)
-                        cell.font = header_font
-                        cell.fill = header_fill
-                        cell.alignment = header_alignment
-                        cell.border = thin_border
-                    
-                    # 设置数据区域样式
-                    for row_num in range(2, len(df) + 2):
-                        for col_num in range(1, len(clean_headers) + 1):
-                            cell = worksheet.cell(row=row_num, column=col_num)
-                            cell.font = data_font
-                            cell.alignment = data_alignment
-                            cell.border = thin_border
-                    
-                    # 自动调整列宽
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 100)  # 限制最大宽度为100
-                        worksheet.column_dimensions[column_letter].width = adjusted_width
-                    
-                    # 设置行高
-                    worksheet.row_dimensions[1].height = 21  # 表头行高
-                    for row_num in range(2, len(df) + 2):
-                        worksheet.row_dimensions[row_num].height = 21  # 数据行高
-                    
-                    # 添加隔行显示底色
-                    from openpyxl.styles import PatternFill
-                    even_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")  # 浅灰色
-                    for row_num in range(2, len(df) + 2, 2):  # 从第2行开始，间隔2行
-                        for col_num in range(1, len(clean_headers) + 1):
-                            cell = worksheet.cell(row=row_num, column=col_num)
-                            cell.fill = even_fill
-                
-                self.log_message(f"✅ Excel数据已保存到: {excel_path}")
-                file_path = excel_path
+            with self.engine.metrics.stage('export'):
+                file_path = export_to_file(self.all_data, self.headers, file_path, log=self.log_message)
+            self.engine.log_metrics(['export'])
+            self.save_metrics()
             
             messagebox.showinfo("成功", f"数据已成功保存！\n文件路径: {file_path}\n记录数: {len(self.all_data)}")
             
@@ -1181,6 +878,8 @@ class MaterialPriceScraper:
             messagebox.showerror("错误", f"保存失败: {str(e)}")
 
 if __name__ == "__main__":
+    # 打包为exe后多进程解析需要
+    multiprocessing.freeze_support()
     # 使用ttkbootstrap创建根窗口
     root = ttk.Window(themename="cosmo")  # 可以选择不同主题，如'cosmo', 'darkly', 'flatly', 'journal', 'litera', 'lumen', 'minty', 'pulse', 'sandstone', 'united', 'yeti'
     app = MaterialPriceScraper(root)
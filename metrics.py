@@ -0,0 +1,196 @@
+"""提取流程各阶段的耗时统计
+
+按阶段记录每次请求/每页的耗时（网络等待、解码、HTML解析、表格定位、数据行提取、导出），
+以及请求数、传输字节数、重试次数等计数；任务结束时输出百分位数和耗时分布，
+并可写成JSON或Prometheus文本格式的文件供监控系统读取。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 阶段名称和日志中显示的说明，按流程顺序排列
+STAGES = {
+    'throttle': '限速等待',
+    'fetch': '网络等待',
+    'stream': '边下载边解析',
+    'decode': '解码',
+    'tree': 'HTML解析',
+    'table': '表格定位',
+    'rows': '数据行提取',
+    'export': '导出',
+}
+
+COUNTERS = {
+    'requests': '请求数',
+    'bytes': '传输字节数',
+    'retries': '重试次数',
+    'cache_hits': '缓存命中页数',
+    'pages_ok': '成功页数',
+    'pages_failed': '失败页数',
+    'rows': '数据行数',
+}
+
+# 耗时分布的区间上限（秒），与Prometheus直方图的le标签一致
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = 'lnwk'
+
+
+def percentile(sorted_values, fraction):
+    """已排序样本的百分位数（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def format_seconds(seconds):
+    """耗时的显示格式：1秒以下显示毫秒"""
+    return f"{seconds * 1000:.1f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+class PipelineMetrics:
+    """各阶段耗时和计数（线程安全）
+
+    一个任务（查询 → 提取 → 导出）开始时调用reset，结束时用summary_lines输出统计。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = {stage: [] for stage in STAGES}
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.started = time.time()
+
+    def observe(self, stage, seconds):
+        """记录一次阶段耗时"""
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def stage(self, stage):
+        """统计with块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_count(self, name, value):
+        with self._lock:
+            self.counters[name] = value
+
+    def merge(self, other):
+        """合并另一个统计（如批处理中各任务的统计）"""
+        with other._lock:
+            samples = {stage: list(values) for stage, values in other.samples.items()}
+            counters = dict(other.counters)
+        with self._lock:
+            for stage, values in samples.items():
+                self.samples.setdefault(stage, []).extend(values)
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def stage_summary(self, stage):
+        """一个阶段的统计：次数、合计、平均、P50/P90/P99、最大值和各区间的次数"""
+        with self._lock:
+            values = sorted(self.samples.get(stage, []))
+        total = sum(values)
+        histogram = []
+        index = 0
+        for bound in BUCKETS:
+            while index < len(values) and values[index] <= bound:
+                index += 1
+            histogram.append((bound, index))
+        return {
+            'count': len(values),
+            'sum': total,
+            'mean': total / len(values) if values else 0.0,
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p99': percentile(values, 0.99),
+            'max': values[-1] if values else 0.0,
+            # 累计次数：耗时不超过bound秒的次数
+            'buckets': histogram,
+        }
+
+    def to_dict(self):
+        with self._lock:
+            counters = dict(self.counters)
+            stages = list(self.samples)
+        return {
+            'started': self.started,
+            'elapsed': time.time() - self.started,
+            'counters': counters,
+            'stages': {stage: self.stage_summary(stage) for stage in stages},
+        }
+
+    def summary_lines(self, stages=None):
+        """日志用的统计摘要，stages为None时输出所有有数据的阶段"""
+        data = self.to_dict()
+        counters = data['counters']
+        lines = [f"📊 耗时统计: {counters['requests']} 次请求，{counters['bytes'] / 1024:.0f} KB，"
+                 f"重试 {counters['retries']} 次，缓存命中 {counters['cache_hits']} 页"]
+        for stage in stages or data['stages']:
+            summary = data['stages'].get(stage)
+            if not summary or not summary['count']:
+                continue
+            lines.append(f"   {STAGES.get(stage, stage)}: {summary['count']} 次，合计 {format_seconds(summary['sum'])}，"
+                         f"P50 {format_seconds(summary['p50'])}，P90 {format_seconds(summary['p90'])}，"
+                         f"P99 {format_seconds(summary['p99'])}，最大 {format_seconds(summary['max'])}")
+            # 耗时分布只显示有数据的区间
+            previous = 0
+            parts = []
+            for bound, cumulative in summary['buckets']:
+                if cumulative > previous:
+                    parts.append(f"≤{format_seconds(bound)}:{cumulative - previous}")
+                previous = cumulative
+            if summary['count'] > previous:
+                parts.append(f">{format_seconds(BUCKETS[-1])}:{summary['count'] - previous}")
+            lines.append(f"      分布 {' '.join(parts)}")
+        return lines
+
+    def to_prometheus(self):
+        """Prometheus文本格式"""
+        data = self.to_dict()
+        lines = []
+        for name, value in data['counters'].items():
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        metric = f"{METRIC_PREFIX}_stage_seconds"
+        lines.append(f"# HELP {metric} 各阶段耗时（秒）")
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, summary in data['stages'].items():
+            for bound, cumulative in summary['buckets']:
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {summary["count"]}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {summary["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """写入统计文件：.prom扩展名写Prometheus文本格式，其他写JSON
+
+        先写临时文件再替换，监控程序不会读到写了一半的文件
+        """
+        if path.lower().endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
@@ -0,0 +1,131 @@
+"""数据页面的本地磁盘缓存
+
+按 (城市ID, 日期, 页码) 保存原始页面内容：
+- 历史月份的价格不会再变化，缓存永不过期；
+- 当前月份（及之后）的缓存超过有效期后重新下载；
+- 缓存总大小超过上限时，按最近访问时间淘汰最久未使用的页面。
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class PageCache:
+    """页面内容磁盘缓存
+
+    cache_dir: 缓存目录（不要放在退出时会被清理的TEMP目录下）
+    current_month_ttl: 当前月份页面的有效期（秒）
+    max_bytes: 缓存总大小上限（字节）
+    """
+
+    def __init__(self, cache_dir, current_month_ttl=6 * 3600, max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.current_month_ttl = current_month_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        """遍历缓存文件"""
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.page'):
+                yield entry
+
+    def _path(self, *key_parts):
+        """根据缓存键计算文件路径"""
+        key = '|'.join(str(part) for part in key_parts)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.page")
+
+    @staticmethod
+    def is_historical(date_str, now=None):
+        """判断日期字符串（如2025/01/20）是否属于已经过去的月份"""
+        try:
+            year, month = (int(part) for part in date_str.split('/')[:2])
+        except ValueError:
+            return False
+        now = now or datetime.now()
+        return (year, month) < (now.year, now.month)
+
+    def get(self, city_id, date_str, page_no, *extra_key):
+        """读取缓存的页面内容，未命中或已过期时返回None"""
+        path = self._path(city_id, date_str, page_no, *extra_key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        # 当前月份的缓存按修改时间判断是否过期
+        if not self.is_historical(date_str) and time.time() - stat.st_mtime > self.current_month_ttl:
+            self._remove(path)
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        # 更新访问时间，用于LRU淘汰（保留修改时间，用于有效期判断）
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            pass
+        return content
+
+    def put(self, city_id, date_str, page_no, content, *extra_key):
+        """保存页面内容"""
+        path = self._path(city_id, date_str, page_no, *extra_key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(content) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def discard(self, city_id, date_str, page_no, *extra_key):
+        """删除一个页面（内容无法使用的旧缓存）"""
+        self._remove(self._path(city_id, date_str, page_no, *extra_key))
+
+    def _remove(self, path):
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+    def _evict(self):
+        """按最近访问时间淘汰页面，直到总大小降到上限的90%（调用方持有锁）"""
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_atime)
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for entry in list(self._entries()):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
@@ -0,0 +1,58 @@
+"""页面编码识别与解码
+
+网站所有页面使用同一种编码。连接时识别一次并固定在会话上，之后的页面直接按该编码解码原始字节，
+不再对每个响应的全文做字符集检测；严格解码失败时才对该页单独检测。
+"""
+import re
+
+# 页面<meta>中声明的字符集，只在开头部分查找
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+_SNIFF_BYTES = 4096
+
+# 国标系列编码统一使用向下兼容的GB18030，避免GB2312声明的页面中出现GBK字符时解码失败
+_GB_FAMILY = frozenset(['gb2312', 'gbk', 'gb18030', 'cp936', 'x-gbk', 'euc-cn', 'hz-gb-2312'])
+
+# 无法识别时使用的编码
+DEFAULT_ENCODING = 'gb18030'
+
+
+def normalize_encoding(name):
+    """统一编码名称，无法识别的名称返回None"""
+    if not name:
+        return None
+    name = name.strip().lower()
+    if name in _GB_FAMILY:
+        return DEFAULT_ENCODING
+    try:
+        import codecs
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def sniff_meta_charset(content):
+    """从页面开头的<meta>标签读取声明的字符集"""
+    match = _META_CHARSET_RE.search(content[:_SNIFF_BYTES])
+    if match:
+        return normalize_encoding(match.group(1).decode('ascii', errors='ignore'))
+    return None
+
+
+def detect_encoding(response):
+    """识别响应的编码：优先使用页面声明且能正确解码的字符集，否则做字符集检测"""
+    declared = sniff_meta_charset(response.content)
+    if declared:
+        try:
+            response.content.decode(declared)
+            return declared
+        except UnicodeDecodeError:
+            pass
+    return normalize_encoding(response.apparent_encoding) or DEFAULT_ENCODING
+
+
+def decode_content(content, encoding):
+    """按固定的编码严格解码，失败时返回None"""
+    try:
+        return content.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return None
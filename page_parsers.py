@@ -0,0 +1,347 @@
+"""数据页面解析后端
+
+同一套表格选择和数据提取逻辑可以运行在不同的HTML解析器上：
+- html.parser: BeautifulSoup + Python内置解析器（默认，无额外依赖）
+- bs4-lxml:    BeautifulSoup + lxml解析器
+- lxml:        直接使用lxml.html，速度最快
+
+所有后端输出相同的(数据行, 表头)。
+"""
+import importlib.util
+import re
+from contextlib import nullcontext
+
+from bs4 import BeautifulSoup, Tag
+
+# 页面没有表头时使用的默认表头
+DEFAULT_HEADERS = ['序号', '材料名称', '规格型号', '单位', '价格(元)', '备注', '发布地区', '发布时间', '材料类别']
+
+# 默认解析后端
+DEFAULT_BACKEND = 'html.parser'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# lxml后端提取文本时跳过的元素（与BeautifulSoup的get_text保持一致）
+_SKIP_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+
+class SoupAdapter:
+    """BeautifulSoup树的访问方式"""
+
+    @staticmethod
+    def tables(doc):
+        return doc.find_all('table')
+
+    @staticmethod
+    def rows(table):
+        return table.find_all('tr')
+
+    @staticmethod
+    def cells(row):
+        return row.find_all(['th', 'td'])
+
+    @staticmethod
+    def data_cells(row):
+        return row.find_all('td')
+
+    @staticmethod
+    def text(cell):
+        return cell.get_text(strip=True)
+
+    @staticmethod
+    def parent(node):
+        return node.parent
+
+    @staticmethod
+    def children(node):
+        return [child for child in node.children if isinstance(child, Tag)]
+
+    @staticmethod
+    def is_table(node):
+        return node.name == 'table'
+
+
+class LxmlAdapter:
+    """lxml树的访问方式"""
+
+    @staticmethod
+    def tables(doc):
+        return list(doc.iter('table'))
+
+    @staticmethod
+    def rows(table):
+        return list(table.iter('tr'))
+
+    @staticmethod
+    def cells(row):
+        return list(row.iter('th', 'td'))
+
+    @staticmethod
+    def data_cells(row):
+        return list(row.iter('td'))
+
+    @staticmethod
+    def text(cell):
+        # 与get_text(strip=True)相同：逐段去除空白后拼接，跳过注释和脚本内容
+        parts = []
+
+        def walk(node):
+            if isinstance(node.tag, str) and node.tag not in _SKIP_TEXT_TAGS and node.text:
+                parts.append(node.text.strip())
+            if isinstance(node.tag, str) and node.tag in _SKIP_TEXT_TAGS:
+                return
+            for child in node:
+                walk(child)
+                if child.tail:
+                    parts.append(child.tail.strip())
+
+        walk(cell)
+        return ''.join(parts)
+
+    @staticmethod
+    def parent(node):
+        return node.getparent()
+
+    @staticmethod
+    def children(node):
+        return list(node)
+
+    @staticmethod
+    def is_table(node):
+        return node.tag == 'table'
+
+
+def available_backends():
+    """返回当前环境可用的解析后端"""
+    backends = ['html.parser']
+    if importlib.util.find_spec('lxml') is not None:
+        backends.extend(['bs4-lxml', 'lxml'])
+    return backends
+
+
+def build_tree(html, backend=DEFAULT_BACKEND):
+    """使用指定后端解析HTML，返回(树访问方式, 文档)"""
+    if backend == 'html.parser':
+        return SoupAdapter, BeautifulSoup(html, 'html.parser')
+    if backend == 'bs4-lxml':
+        return SoupAdapter, BeautifulSoup(html, 'lxml')
+    if backend == 'lxml':
+        import lxml.html
+        from lxml.etree import ParserError
+        try:
+            return LxmlAdapter, lxml.html.fromstring(html)
+        except (ParserError, ValueError):
+            return LxmlAdapter, lxml.html.fromstring('<html></html>')
+    raise ValueError(f"未知的解析后端: {backend}")
+
+
+def select_data_table(adapter, tables):
+    """给所有表格打分，返回得分最高的表格信息，没有表格时返回None"""
+    # 保存所有表格的信息，便于选择最合适的表格
+    table_info = []
+
+    for i, table in enumerate(tables):
+        rows = adapter.rows(table)
+        header_cells = []
+        data_rows = []
+
+        if rows:
+            header_cells = adapter.cells(rows[0])
+            data_rows = rows[1:]
+
+        # 计算表格的实际列数（使用表头列数或第一数据行的列数）
+        actual_cols = len(header_cells)
+        if not actual_cols and data_rows:
+            actual_cols = len(adapter.cells(data_rows[0]))
+
+        # 计算数据行数量
+        actual_rows = len(data_rows)
+
+        table_info.append({
+            'index': i,
+            'rows': len(rows),
+            'data_rows': actual_rows,
+            'cols': actual_cols,
+            'table': table,
+            'row_nodes': rows
+        })
+
+    # 选择最合适的数据表格
+    # 优先选择：列数 >= 5 且 数据行 >= 10 的表格
+    # 如果没有，选择列数最多的表格
+    # 如果还是没有，选择行数最多的表格
+    best_table = None
+    best_score = -1
+
+    for info in table_info:
+        score = 0
+
+        # 列数越多，得分越高
+        if info['cols'] >= 5:
+            score += 100
+        score += info['cols'] * 10
+
+        # 数据行越多，得分越高
+        if info['data_rows'] >= 10:
+            score += 50
+        score += info['data_rows']
+
+        # 总行数越多，得分越高
+        score += info['rows']
+
+        # 更新最佳表格
+        if score > best_score:
+            best_score = score
+            best_table = info
+
+    return best_table
+
+
+def extract_table(adapter, rows):
+    """从数据表格的行中提取(数据行, 表头)"""
+    # 提取表头
+    headers = []
+    if rows:
+        for cell in adapter.cells(rows[0]):
+            text = adapter.text(cell)
+            # 直接使用文本，不进行额外编码处理
+            if text and not text.isspace():
+                headers.append(text)
+
+    # 如果表头为空，使用默认表头
+    if not headers:
+        headers = list(DEFAULT_HEADERS)
+
+    # 提取数据行
+    data = []
+    width = len(headers)
+
+    for row in rows[1:]:
+        # 清理空格和特殊字符
+        row_data = [_WHITESPACE_RE.sub(' ', adapter.text(cell)).strip() for cell in adapter.data_cells(row)]
+
+        # 确保数据长度与表头一致
+        if len(row_data) < width:
+            row_data.extend([''] * (width - len(row_data)))
+
+        data.append(row_data[:width])
+
+    return data, headers
+
+
+class TableLocator:
+    """记住数据表格的结构特征（在文档中的位置路径和表头文本）
+
+    同一会话中各页的布局相同，第一页打分选出数据表格后，后续页面按位置路径
+    直接定位到该表格并核对表头；特征不匹配时才重新对所有表格打分。
+    """
+
+    def __init__(self):
+        self.fingerprints = {}  # {树访问方式: (位置路径, 表头文本)}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def header_texts(adapter, rows):
+        if not rows:
+            return ()
+        return tuple(adapter.text(cell) for cell in adapter.cells(rows[0]))
+
+    @staticmethod
+    def node_path(adapter, node):
+        """计算节点从文档根开始的子元素序号路径"""
+        path = []
+        parent = adapter.parent(node)
+        while parent is not None:
+            siblings = adapter.children(parent)
+            path.append(next(i for i, sibling in enumerate(siblings) if sibling is node))
+            node, parent = parent, adapter.parent(parent)
+        return tuple(reversed(path))
+
+    def locate(self, adapter, doc):
+        """按记住的特征定位数据表格，返回表格的行，不匹配时返回None"""
+        fingerprint = self.fingerprints.get(adapter)
+        if fingerprint is None:
+            return None
+        path, headers = fingerprint
+
+        node = doc
+        for index in path:
+            children = adapter.children(node)
+            if index >= len(children):
+                node = None
+                break
+            node = children[index]
+
+        if node is not None and adapter.is_table(node):
+            rows = adapter.rows(node)
+            if self.header_texts(adapter, rows) == headers:
+                self.hits += 1
+                return rows
+
+        self.misses += 1
+        return None
+
+    def learn(self, adapter, doc, table, rows):
+        """记住打分选出的数据表格的特征"""
+        path = self.node_path(adapter, table)
+        self.fingerprints[adapter] = (path, self.header_texts(adapter, rows))
+
+    def known_headers(self):
+        """已记住的数据表格表头文本，还没有识别过数据表格时返回None"""
+        for _, headers in self.fingerprints.values():
+            if headers:
+                return headers
+        return None
+
+    def data_headers(self):
+        """已记住的数据表格按extract_table的规则得到的表头，还没有识别过数据表格时返回None"""
+        headers = self.known_headers()
+        if headers is None:
+            return None
+        return [text for text in headers if text and not text.isspace()] or list(DEFAULT_HEADERS)
+
+    def reset(self):
+        self.fingerprints.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def _no_timing(stage):
+    return nullcontext()
+
+
+def parse_tree(adapter, doc, locator=None, stage=None):
+    """从已解析的文档中提取(数据行, 表头)，未找到数据表格时返回None
+
+    locator: TableLocator，提供时优先按已知特征定位数据表格，跳过打分
+    stage: 计时函数，stage('table')/stage('rows')返回上下文管理器，用于统计表格定位和数据行提取的耗时
+    """
+    stage = stage or _no_timing
+    with stage('table'):
+        rows = locator.locate(adapter, doc) if locator is not None else None
+        if rows is None:
+            best_table = select_data_table(adapter, adapter.tables(doc))
+            if not best_table:
+                return None
+            rows = best_table['row_nodes']
+            # 只记住有数据行的表格，繁忙或出错时的页面选出的表格不作为数据表格
+            if locator is not None and len(rows) > 1:
+                locator.learn(adapter, doc, best_table['table'], rows)
+    with stage('rows'):
+        return extract_table(adapter, rows)
+
+
+def parse_soup(soup, locator=None, stage=None):
+    """从BeautifulSoup文档中提取(数据行, 表头)，未找到数据表格时返回None"""
+    return parse_tree(SoupAdapter, soup, locator, stage)
+
+
+def parse_html(html, backend=DEFAULT_BACKEND, locator=None, stage=None):
+    """解析单页HTML，返回(数据行, 表头)，未找到数据表格时返回None
+
+    stage: 计时函数，另外统计HTML解析（'tree'）的耗时
+    """
+    with (stage or _no_timing)('tree'):
+        adapter, doc = build_tree(html, backend)
+    return parse_tree(adapter, doc, locator, stage)
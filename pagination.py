@@ -0,0 +1,127 @@
+"""查询结果的分页信息识别
+
+查询结果页的分页栏形如“共找到N条信息 第x/y页 首页 上一页 下一页 尾页”。
+数据表格中的发布时间（如2025/01/20）也是“数字/数字”的形式，不能在整页文本中查找第一个x/y；
+这里先找到包含翻页链接的分页栏元素，只在其中识别当前页/总页数和尾页链接的页码，
+再与总记录数按每页条数计算出的页数核对。
+"""
+import re
+
+# 网站每页显示的记录数
+PER_PAGE = 50
+
+# 分页栏中的翻页链接文字
+PAGER_LINK_TEXTS = frozenset(['首页', '上一页', '下一页', '尾页', '末页', '最后一页'])
+
+_RECORD_COUNT_RES = [
+    re.compile(r'共找到\s*(\d+)\s*条信息'),
+    re.compile(r'共\s*(\d+)\s*条记录'),
+    re.compile(r'共\s*(\d+)\s*条'),
+]
+# “第x/y页”，以及分页栏中单独的“x/y”（前后不能紧跟数字或斜杠，排除日期）
+_PAGE_FRACTION_RE = re.compile(r'第\s*(\d+)\s*/\s*(\d+)\s*页')
+_BARE_FRACTION_RE = re.compile(r'(?<![\d/])(\d{1,5})\s*/\s*(\d{1,5})(?![\d/])')
+_TOTAL_PAGES_RE = re.compile(r'共\s*(\d+)\s*页')
+# 翻页链接中的页码：?pageno=N 或 javascript:go(N)
+_LINK_PAGE_RE = re.compile(r'(?:pageno=|go\()\s*(\d+)')
+
+
+def parse_record_count(text):
+    """从文本中识别总记录数，找不到时返回None"""
+    for pattern in _RECORD_COUNT_RES:
+        match = pattern.search(text)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def _link_target(a):
+    return f"{a.get('href', '')} {a.get('onclick', '')}"
+
+
+def find_pager(soup):
+    """查找分页栏元素（包含翻页链接的最小元素），找不到时返回None"""
+    links = [a for a in soup.find_all('a') if a.get_text(strip=True) in PAGER_LINK_TEXTS]
+    if not links:
+        return None
+    # “首页”也可能是导航栏中回到网站首页的链接，优先使用带页码的翻页链接
+    links.sort(key=lambda a: not _LINK_PAGE_RE.search(_link_target(a)))
+    node = links[0].parent
+    # 翻页链接可能各自包在span等元素中，向上找到同时包含页码信息的元素
+    for _ in range(3):
+        if node is None or node.parent is None:
+            break
+        text = node.get_text(' ')
+        if _PAGE_FRACTION_RE.search(text) or _BARE_FRACTION_RE.search(text) or _TOTAL_PAGES_RE.search(text):
+            return node
+        node = node.parent
+    return links[0].parent
+
+
+def parse_pager(soup):
+    """识别分页栏中的总页数，返回(总页数, 分页栏文本)，找不到时总页数为None
+
+    依次使用：整页中的“第x/y页”、分页栏中的“共y页”和“x/y”（x不大于y）、尾页链接中的页码
+    """
+    match = _PAGE_FRACTION_RE.search(soup.get_text(' '))
+    if match and int(match.group(1)) <= int(match.group(2)):
+        return int(match.group(2)), match.group(0)
+
+    pager = find_pager(soup)
+    if pager is None:
+        return None, ''
+    text = pager.get_text(' ', strip=True)
+
+    match = _TOTAL_PAGES_RE.search(text)
+    if match:
+        return int(match.group(1)), text
+    for match in _BARE_FRACTION_RE.finditer(text):
+        current, total = int(match.group(1)), int(match.group(2))
+        if 1 <= current <= total:
+            return total, text
+
+    # 尾页链接指向的页码
+    link_pages = []
+    for a in pager.find_all('a'):
+        link_pages.extend(int(n) for n in _LINK_PAGE_RE.findall(_link_target(a)))
+    if link_pages:
+        return max(link_pages), text
+    return None, text
+
+
+def discover_pages(soup, first_page_rows=None, per_page=PER_PAGE):
+    """识别查询结果的总记录数和总页数，返回(总记录数, 总页数, 提示消息列表)
+
+    first_page_rows: 第1页的数据行，用于核对每页条数（第1页不满一页时说明只有1页）
+    总记录数是网站明确给出的数字，与分页栏不一致时以总记录数计算的页数为准；
+    两者都找不到时按第1页的数据行数处理为1页
+    """
+    notes = []
+    text = soup.get_text(' ')
+    pager_pages, pager_text = parse_pager(soup)
+    # 优先在分页栏中找记录数，避免匹配到正文中的其他“共N条”
+    total_records = parse_record_count(pager_text) if pager_text else None
+    if total_records is None:
+        total_records = parse_record_count(text)
+
+    first_count = len(first_page_rows) if first_page_rows else 0
+    if total_records is not None and first_count and total_records > first_count and first_count != per_page:
+        notes.append(f"第1页有 {first_count} 条记录，与每页 {per_page} 条不一致，按 {first_count} 条计算页数")
+        per_page = first_count
+
+    if total_records is not None:
+        total_pages = max(1, (total_records + per_page - 1) // per_page) if total_records else 1
+        if pager_pages is not None and pager_pages != total_pages:
+            notes.append(f"分页栏显示 {pager_pages} 页，按 {total_records} 条记录计算为 {total_pages} 页，"
+                         f"使用 {total_pages} 页")
+        return total_records, total_pages, notes
+
+    if pager_pages is not None:
+        total_pages = max(1, pager_pages)
+        # 没有总记录数时按整页估计（最后一页可能不满）
+        total_records = first_count if total_pages == 1 else total_pages * per_page
+        notes.append(f"未找到总记录数，按分页栏的 {total_pages} 页估计为 {total_records} 条")
+        return total_records, total_pages, notes
+
+    notes.append(f"未找到分页信息，按第1页的 {first_count} 条记录处理为1页")
+    return first_count, 1, notes
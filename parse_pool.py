@@ -0,0 +1,89 @@
+"""多进程页面解析
+
+HTML解析是纯Python的CPU计算，多个线程同时解析时受GIL限制只能用到一个CPU核。
+启用多进程解析后，网络线程只负责下载页面的原始字节，交给解析进程池解码和解析，
+解析进程返回(数据行, 表头)；每个网络线程同时只有一页在等待解析，内存占用有上限。
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from async_fetcher import FetchResult
+from page_encoding import decode_content, detect_encoding
+from page_parsers import DEFAULT_BACKEND, TableLocator, parse_html
+
+# 每个解析进程自己的状态（进程启动时由_init_worker设置）
+_backend = DEFAULT_BACKEND
+_locator = None
+
+
+def _init_worker(backend):
+    global _backend, _locator
+    _backend = backend
+    # 每个进程各自记住数据表格的位置
+    _locator = TableLocator()
+
+
+def _parse_page(content, encoding, backend):
+    """在解析进程中解码并解析一页，返回(解析结果, 各阶段耗时)
+
+    解析结果为(数据行, 表头)，未找到数据表格时为None；各阶段耗时为[(阶段, 秒数)]
+    """
+    if backend != _backend or _locator is None:
+        _init_worker(backend)
+
+    timings = []
+    start = time.perf_counter()
+    html = decode_content(content, encoding) if encoding else None
+    if html is None:
+        html = content.decode(detect_encoding(FetchResult('', 200, content)), errors='replace')
+    timings.append(('decode', time.perf_counter() - start))
+
+    def stage(name):
+        return _StageTimer(timings, name)
+
+    return parse_html(html, backend, _locator, stage), timings
+
+
+class _StageTimer:
+    """记录with块耗时的上下文管理器（结果随解析结果一起返回主进程）"""
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.append((self.name, time.perf_counter() - self.start))
+
+
+def default_workers():
+    """默认的解析进程数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+class ParsePool:
+    """解析进程池
+
+    workers: 解析进程数
+    backend: 页面解析后端
+    """
+
+    def __init__(self, workers=None, backend=DEFAULT_BACKEND):
+        self.workers = workers or default_workers()
+        self.backend = backend
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(backend,))
+
+    def submit(self, content, encoding):
+        """提交一页原始字节，返回Future，结果为(解析结果, 各阶段耗时)"""
+        return self._executor.submit(_parse_page, content, encoding, self.backend)
+
+    def parse(self, content, encoding):
+        """解析一页并等待结果"""
+        return self.submit(content, encoding).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,182 @@
+"""本地SQLite价格数据库
+
+提取的数据按 (城市ID, 月份, 材料名称, 规格型号) 写入数据库，重复提取时更新已有记录；
+同时记录每个(城市, 月份)网站报告的记录数，用于增量同步时判断该月是否需要重新提取。
+"""
+import sqlite3
+import threading
+from datetime import datetime
+
+from page_parsers import DEFAULT_HEADERS
+
+# 数据库字段与页面表头的对应关系
+FIELD_HEADERS = [
+    ('name', '材料名称'),
+    ('spec', '规格型号'),
+    ('unit', '单位'),
+    ('price', '价格(元)'),
+    ('remark', '备注'),
+    ('region', '发布地区'),
+    ('publish_date', '发布时间'),
+    ('category', '材料类别'),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    city_id      TEXT NOT NULL,
+    month        TEXT NOT NULL,
+    name         TEXT NOT NULL,
+    spec         TEXT NOT NULL,
+    unit         TEXT,
+    price        TEXT,
+    price_value  REAL,
+    remark       TEXT,
+    region       TEXT,
+    publish_date TEXT,
+    category     TEXT,
+    synced_at    TEXT NOT NULL,
+    PRIMARY KEY (city_id, month, name, spec)
+);
+CREATE INDEX IF NOT EXISTS idx_prices_name_spec ON prices (name, spec);
+CREATE INDEX IF NOT EXISTS idx_prices_month ON prices (month, city_id);
+CREATE TABLE IF NOT EXISTS months (
+    city_id        TEXT NOT NULL,
+    month          TEXT NOT NULL,
+    city_name      TEXT,
+    total_records  INTEGER NOT NULL,
+    total_pages    INTEGER NOT NULL,
+    rows_extracted INTEGER NOT NULL,
+    synced_at      TEXT NOT NULL,
+    PRIMARY KEY (city_id, month)
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO prices (city_id, month, name, spec, unit, price, price_value, remark, region,
+                    publish_date, category, synced_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (city_id, month, name, spec) DO UPDATE SET
+    unit = excluded.unit,
+    price = excluded.price,
+    price_value = excluded.price_value,
+    remark = excluded.remark,
+    region = excluded.region,
+    publish_date = excluded.publish_date,
+    category = excluded.category,
+    synced_at = excluded.synced_at
+"""
+
+
+def month_key(date_str):
+    """把日期字符串（如2025/01/20）转换为月份键（2025-01）"""
+    year, month = date_str.split('/')[:2]
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def parse_price(text):
+    """把价格文本转换为数值，无法转换时返回None"""
+    try:
+        return float(text.replace(',', ''))
+    except (AttributeError, ValueError):
+        return None
+
+
+def column_indexes(headers):
+    """按表头确定各字段所在的列，页面表头缺少某列时按默认表头的位置"""
+    indexes = []
+    for _, header in FIELD_HEADERS:
+        if header in headers:
+            indexes.append(headers.index(header))
+        else:
+            indexes.append(DEFAULT_HEADERS.index(header))
+    return indexes
+
+
+class PriceStore:
+    """价格数据库
+
+    db_path: 数据库文件路径
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 界面每次操作在不同的线程中执行，连接需要跨线程使用（由锁保证串行）
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def new_sync_id():
+        """生成一次同步的标识，用于区分本次写入和之前遗留的记录"""
+        return datetime.now().isoformat(timespec='microseconds')
+
+    def write_rows(self, city_id, month, rows, headers, sync_id):
+        """写入（更新）一批数据行，可在流式提取时逐页调用"""
+        indexes = column_indexes(headers)
+        records = []
+        for row in rows:
+            values = [row[i] if i < len(row) else '' for i in indexes]
+            name, spec, unit, price, remark, region, publish_date, category = values
+            if not name:
+                continue
+            records.append((city_id, month, name, spec, unit, price, parse_price(price), remark, region,
+                            publish_date, category, sync_id))
+        with self._lock:
+            self._conn.executemany(UPSERT_SQL, records)
+
+    def finish_month(self, city_id, city_name, month, total_records, total_pages, rows_extracted, sync_id):
+        """结束一个(城市, 月份)的写入，记录网站报告的记录数并提交
+
+        rows_extracted: 本次实际提取的行数；不少于网站报告的记录数时视为完整提取，
+                        删除本次同步没有出现的旧记录
+        """
+        with self._lock:
+            if rows_extracted >= total_records:
+                self._conn.execute("DELETE FROM prices WHERE city_id = ? AND month = ? AND synced_at <> ?",
+                                   (city_id, month, sync_id))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO months (city_id, month, city_name, total_records, total_pages, "
+                "rows_extracted, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (city_id, month, city_name, total_records, total_pages, rows_extracted, sync_id))
+            self._conn.commit()
+
+    def commit(self):
+        """提交已写入的数据行，不更新月份记录、不删除旧记录（用于按条件筛选的部分数据）"""
+        with self._lock:
+            self._conn.commit()
+
+    def save_month(self, city_id, city_name, month, rows, headers, total_records, total_pages):
+        """一次性保存一个(城市, 月份)的全部数据"""
+        sync_id = self.new_sync_id()
+        self.write_rows(city_id, month, rows, headers, sync_id)
+        self.finish_month(city_id, city_name, month, total_records, total_pages, len(rows), sync_id)
+
+    def is_up_to_date(self, city_id, month, total_records):
+        """该月已完整保存，且网站报告的记录数没有变化时返回True"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT total_records, rows_extracted FROM months WHERE city_id = ? AND month = ?",
+                (city_id, month)).fetchone()
+        return row is not None and row[0] == total_records and row[1] >= total_records
+
+    def stored_months(self, city_id=None):
+        """返回已保存的月份 {(城市ID, 月份): 网站报告的记录数}"""
+        sql = "SELECT city_id, month, total_records FROM months"
+        params = ()
+        if city_id is not None:
+            sql += " WHERE city_id = ?"
+            params = (city_id,)
+        with self._lock:
+            return {(cid, month): total for cid, month, total in self._conn.execute(sql, params)}
+
+    def count_rows(self, city_id=None, month=None):
+        """统计保存的数据行数"""
+        sql = "SELECT COUNT(*) FROM prices WHERE (? IS NULL OR city_id = ?) AND (? IS NULL OR month = ?)"
+        with self._lock:
+            return self._conn.execute(sql, (city_id, city_id, month, month)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
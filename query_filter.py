@@ -0,0 +1,74 @@
+"""查询条件（材料类别、材料名称、材料编号）
+
+网站的数据页面jgxx_cl1.asp除城市（dq_id）和日期（time1）外，还接受材料类别（cllb）、
+材料名称（clmc）和材料编号（clid）参数，由网站筛选后只返回符合条件的记录，
+只需要部分材料时下载的页数可以少一个数量级。参数值按页面编码（GBK）做百分号编码，与网站表单提交的方式一致。
+"""
+import re
+from urllib.parse import quote
+
+# 文件名中不能使用的字符
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class QueryFilter:
+    """查询条件，各项为空字符串时不筛选
+
+    category: 材料类别（cllb，查询表单中材料类别下拉框选项的值）
+    name: 材料名称（clmc）
+    material_id: 材料编号（clid）
+    """
+
+    def __init__(self, category='', name='', material_id=''):
+        self.category = (category or '').strip()
+        self.name = (name or '').strip()
+        self.material_id = (material_id or '').strip()
+
+    def __bool__(self):
+        return bool(self.category or self.name or self.material_id)
+
+    def __eq__(self, other):
+        return isinstance(other, QueryFilter) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"QueryFilter({self.category!r}, {self.name!r}, {self.material_id!r})"
+
+    def key(self):
+        """页面缓存和断点记录的附加键；不筛选时为空，与不带条件时的缓存和断点记录相同"""
+        if not self:
+            return ()
+        return (f"cllb={self.category}", f"clmc={self.name}", f"clid={self.material_id}")
+
+    def url_params(self, encoding='gbk'):
+        """URL中的查询参数：各值按页面编码做百分号编码"""
+        return {
+            'cllb': quote(self.category, safe='', encoding=encoding, errors='replace'),
+            'clmc': quote(self.name, safe='', encoding=encoding, errors='replace'),
+            'clid': quote(self.material_id, safe='', encoding=encoding, errors='replace'),
+        }
+
+    def describe(self, category_mapping=None):
+        """日志中显示的说明，如“材料类别=钢材 材料名称=螺纹钢”"""
+        parts = []
+        if self.category:
+            parts.append(f"材料类别={(category_mapping or {}).get(self.category, self.category)}")
+        if self.name:
+            parts.append(f"材料名称={self.name}")
+        if self.material_id:
+            parts.append(f"材料编号={self.material_id}")
+        return ' '.join(parts) or '全部材料'
+
+    def file_suffix(self, category_mapping=None):
+        """输出文件名的后缀，不筛选时为空字符串"""
+        if not self:
+            return ''
+        parts = [(category_mapping or {}).get(self.category, self.category), self.name, self.material_id]
+        return '_' + '_'.join(_UNSAFE_FILENAME_RE.sub('-', part) for part in parts if part)
+
+
+def filter_key(filters):
+    """查询条件的附加键，filters为None时为空"""
+    return filters.key() if filters else ()
@@ -0,0 +1,181 @@
+"""请求速率限制与自适应并发控制
+
+- 令牌桶：限制每秒发出的请求数，允许短时间突发；
+- AIMD并发控制：响应正常时逐步增加同时进行的请求数（加性增），
+  出现超时、连接错误、5xx或响应明显变慢时把并发数减半（乘性减）；
+- 统计最近一段时间实际完成的页面数，得到每秒页面数。
+同步请求（工作线程）和异步请求（事件循环）共用同一个控制器。
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """令牌桶限速
+
+    rate: 每秒补充的令牌数（每秒请求数）
+    burst: 桶容量（允许的突发请求数）
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """预订一个令牌，返回需要等待的秒数（令牌不足时预支，等待结束后即可发送）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RateController:
+    """请求速率和并发控制器（线程安全）
+
+    rate: 每秒最多发出的请求数，为None时不限速
+    burst: 令牌桶容量，默认等于rate
+    adaptive: 是否启用AIMD自适应并发，关闭时不限制同时进行的请求数（由工作线程数决定）
+    initial_limit / min_limit / max_limit: 并发上限的初始值和调整范围
+    latency_tolerance: 响应时间超过基准响应时间的该倍数时视为网站过载
+    decrease_factor: 过载时并发上限乘以该系数
+    decrease_interval: 两次减小并发上限的最短间隔（秒），同一批失败只减一次
+    window: 统计每秒页面数的时间窗口（秒）
+    """
+
+    def __init__(self, rate=None, burst=None, adaptive=False, initial_limit=4, min_limit=1, max_limit=16,
+                 latency_tolerance=3.0, decrease_factor=0.5, decrease_interval=1.0, window=10.0):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.window = window
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._baseline = None
+        self._last_decrease = 0.0
+        self._completions = deque()
+
+    @property
+    def rate(self):
+        """每秒请求数限制，不限速时为None"""
+        return self.bucket.rate if self.bucket else None
+
+    @property
+    def in_flight(self):
+        """正在进行的请求数"""
+        with self._cond:
+            return self._in_flight
+
+    def _try_enter(self):
+        """并发数未达到上限时占用一个名额（调用方持有锁）"""
+        if self.adaptive and self._in_flight >= int(self.limit):
+            return False
+        self._in_flight += 1
+        return True
+
+    def acquire(self):
+        """发送请求前调用（工作线程），按并发上限和速率等待，返回请求开始时间"""
+        with self._cond:
+            while not self._try_enter():
+                self._cond.wait()
+        if self.bucket:
+            wait = self.bucket.reserve()
+            if wait:
+                time.sleep(wait)
+        return time.monotonic()
+
+    async def acquire_async(self):
+        """acquire的异步版本（事件循环中调用），等待时不阻塞事件循环"""
+        while True:
+            with self._cond:
+                if self._try_enter():
+                    break
+            await asyncio.sleep(0.01)
+        if self.bucket:
+            wait = self.bucket.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+        return time.monotonic()
+
+    def release(self, started, outcome):
+        """请求结束后调用
+
+        started: acquire返回的开始时间
+        outcome: 'ok'（成功）、'overload'（超时、连接错误或5xx）或 'error'（其他失败）
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self._in_flight -= 1
+            if outcome == 'ok':
+                self._completions.append(now)
+            # 关闭自适应并发时不调整并发上限，开启时从reset设置的初始值开始
+            if self.adaptive:
+                self._adjust(now, latency, outcome)
+            self._cond.notify_all()
+
+    def _adjust(self, now, latency, outcome):
+        """按请求结果调整并发上限（调用方持有锁）"""
+        if outcome == 'ok':
+            # 基准响应时间：跟随最小值，并缓慢向最近的响应时间靠拢
+            if self._baseline is None or latency < self._baseline:
+                self._baseline = latency
+            else:
+                self._baseline += (latency - self._baseline) * 0.01
+            if latency > self._baseline * self.latency_tolerance:
+                self._decrease(now)
+            else:
+                # 加性增：每完成约一轮并发请求，上限加1
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif outcome == 'overload':
+            self._decrease(now)
+
+    def reset(self, initial_limit=None):
+        """开始新的提取前调用：并发上限回到初始值，重新测量基准响应时间
+
+        initial_limit: 新的初始并发上限（如界面中的并发数），为None时保持当前的上限
+        """
+        with self._cond:
+            if initial_limit is not None:
+                self.limit = float(max(self.min_limit, min(initial_limit, self.max_limit)))
+            self._baseline = None
+            self._last_decrease = 0.0
+            self._cond.notify_all()
+
+    def _decrease(self, now):
+        """乘性减（调用方持有锁）"""
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+    def pages_per_second(self):
+        """最近window秒内平均每秒成功完成的请求数"""
+        now = time.monotonic()
+        with self._cond:
+            while self._completions and now - self._completions[0] > self.window:
+                self._completions.popleft()
+            if not self._completions:
+                return 0.0
+            span = max(now - self._completions[0], 1.0)
+            return len(self._completions) / span
+
+    def describe(self):
+        """当前限制的文字说明"""
+        concurrency = f"自适应并发上限 {int(self.limit)}" if self.adaptive else "固定并发"
+        rate = f"限速 {self.rate:g} 次/秒" if self.bucket else "不限速"
+        return f"{concurrency}，{rate}"
@@ -0,0 +1,183 @@
+"""统一的网络请求策略
+
+连接、查询和提取页面共用同一套规则：
+- 连接超时和读取超时分开设置；
+- 失败后按指数退避并加随机抖动再重试，避免并发请求同时重试；
+- 重试额度：重试次数不能超过正常请求数的一定比例，网站不稳定时不会被重试请求压垮；
+- 熔断：连续多次网络错误后暂停所有请求，直接失败，一段时间后再放行一个请求试探。
+"""
+import random
+import threading
+import time
+
+import requests
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """熔断期间不发送请求，直接失败"""
+
+
+class RetryableError(Exception):
+    """本次尝试失败但可以重试（如页面中没有数据表格）"""
+
+
+class HttpStatusError(RetryableError):
+    """响应状态码不是200"""
+
+    def __init__(self, status_code):
+        super().__init__(f"状态码: {status_code}")
+        self.status_code = status_code
+
+
+class RequestPolicy:
+    """请求超时、重试和熔断策略（线程安全，同一会话的所有请求共用）
+
+    connect_timeout / read_timeout: 连接超时和读取超时（秒）
+    max_attempts: 单个请求的最大尝试次数
+    backoff_base / backoff_max: 第n次重试前最多等待 backoff_base * 2^(n-1) 秒，且不超过backoff_max
+    retry_ratio: 每个新请求增加的重试额度；retry_burst为初始额度，也是额度上限
+    failure_threshold: 连续网络错误达到该次数后熔断
+    reset_timeout: 熔断持续时间（秒），之后放行一个请求试探网站是否恢复
+    """
+
+    def __init__(self, connect_timeout=10, read_timeout=30, max_attempts=3, backoff_base=1.0, backoff_max=20.0,
+                 retry_ratio=0.2, retry_burst=10, failure_threshold=8, reset_timeout=30):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_ratio = retry_ratio
+        self.retry_burst = retry_burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._retry_budget = float(retry_burst)
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+
+        # 统计
+        self.requests = 0
+        self.retries = 0
+
+    @property
+    def timeout(self):
+        """(连接超时, 读取超时)，可直接传给requests"""
+        return self.connect_timeout, self.read_timeout
+
+    @property
+    def circuit_open(self):
+        """是否处于熔断状态"""
+        with self._lock:
+            return self._opened_at is not None
+
+    def reset(self):
+        """重新连接时清除熔断状态和重试额度"""
+        with self._lock:
+            self._retry_budget = float(self.retry_burst)
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def backoff(self, attempt):
+        """第attempt次尝试失败后的等待时间（全抖动的指数退避）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def before_request(self):
+        """发送请求前检查熔断状态，熔断期间抛出CircuitOpenError"""
+        with self._lock:
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                    raise CircuitOpenError("网站连续无响应，已暂停请求")
+                # 熔断时间已过，放行一个请求试探
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._probing or self._consecutive_failures >= self.failure_threshold:
+                # 试探失败或连续失败过多：（重新）开始熔断
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def _take_retry(self):
+        """从重试额度中取出一次重试，额度不足时返回False"""
+        with self._lock:
+            if self._retry_budget < 1:
+                return False
+            self._retry_budget -= 1
+            self.retries += 1
+            return True
+
+    def _start(self):
+        """开始一个新请求：计数并增加重试额度"""
+        with self._lock:
+            self.requests += 1
+            self._retry_budget = min(self._retry_budget + self.retry_ratio, self.retry_burst)
+
+    def _should_retry(self, attempt, error, on_error):
+        """记录一次失败，返回是否继续重试"""
+        # 网络错误和服务器错误计入熔断；页面内容问题说明网站可以访问
+        if isinstance(error, requests.exceptions.RequestException) or \
+                (isinstance(error, HttpStatusError) and error.status_code >= 500):
+            self.record_failure()
+        else:
+            self.record_success()
+        if on_error:
+            on_error(attempt, error)
+        return attempt < self.max_attempts and self._take_retry()
+
+    def run(self, attempt_func, on_error=None):
+        """按策略执行attempt_func(第几次尝试)并返回其结果
+
+        attempt_func抛出网络异常、HttpStatusError或RetryableError时按退避时间重试；
+        on_error(第几次尝试, 异常)在每次失败后调用，用于输出日志。
+        尝试次数或重试额度用完、或者处于熔断状态时，抛出最后一次的异常。
+        """
+        self._start()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_request()
+            try:
+                result = attempt_func(attempt)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not self._should_retry(attempt, e, on_error):
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+            self.record_success()
+            return result
+
+    async def run_async(self, attempt_func, on_error=None):
+        """run的异步版本，attempt_func(第几次尝试)返回协程，等待期间不阻塞事件循环
+
+        只重试网络异常和RetryableError，其他异常（程序错误）直接抛出，不计入熔断
+        """
+        import asyncio
+        self._start()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_request()
+            try:
+                result = await attempt_func(attempt)
+            except CircuitOpenError:
+                raise
+            except (requests.exceptions.RequestException, RetryableError) as e:
+                if not self._should_retry(attempt, e, on_error):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            self.record_success()
+            return result
@@ -0,0 +1,1001 @@
+"""辽宁省网刊价格数据提取核心
+
+包含网站连接、数据查询、分页提取和数据导出逻辑，不依赖tkinter/ttkbootstrap，
+可以被图形界面（main.py）和命令行批处理（batch_cli.py）共同使用。
+"""
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from async_fetcher import AsyncFetcher, FetchResult
+from columnar import ColumnarRows
+from exporters import COLUMNAR_FORMATS, StreamingColumnarWriter, StreamingXlsxWriter, clean_cell
+from metrics import PipelineMetrics
+from page_encoding import decode_content, detect_encoding
+from page_parsers import DEFAULT_BACKEND, TableLocator, parse_html, parse_soup
+from pagination import discover_pages
+from parse_pool import ParsePool
+from query_filter import filter_key
+from rate_control import RateController
+from request_policy import HttpStatusError, RequestPolicy, RetryableError
+from stream_parser import STREAM_CHUNK_SIZE, StreamingTableExtractor
+
+# 网站地址
+BASE_URL = "http://218.60.144.156"
+
+# 网站无法提供城市列表时使用的默认城市列表
+DEFAULT_CITY_MAPPING = {
+    "15": "沈阳市", "16": "大连市", "53": "大连金普新区", "56": "大连开发区（2017前）",
+    "17": "鞍山市", "21": "抚顺市", "22": "本溪市", "25": "丹东市", "33": "锦州市",
+    "29": "营口市", "34": "阜新市", "35": "辽阳市", "36": "铁岭市", "44": "朝阳市",
+    "45": "盘锦市", "47": "葫芦岛市", "48": "绥中"
+}
+
+
+
+def get_app_dir():
+    """获取可执行文件所在目录（兼容单个EXE文件和脚本运行）"""
+    if getattr(sys, 'frozen', False):
+        # 单个EXE文件运行
+        return os.path.dirname(os.path.abspath(sys.executable))
+    # 脚本运行
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def build_date_str(year, month):
+    """构建查询使用的日期字符串"""
+    return f"{year}/{int(month):02d}/20"
+
+
+def default_filename(city_name, year, month):
+    """构建默认文件名格式：辽宁省XX市YYYY年MM月份网刊"""
+    return f"辽宁省{city_name}{year}年{int(month):02d}月份网刊"
+
+
+def is_end_page(result, data_headers):
+    """判断是否为超出最后一页的页面：没有数据行，且表头与已识别的数据表格相同
+
+    data_headers: 已识别的数据表格的表头（TableLocator.data_headers）
+    表头不同的空表格（网站繁忙或出错时返回的页面）不算，需要重试
+    """
+    page_data, page_headers = result
+    return not page_data and data_headers is not None and list(page_headers) == list(data_headers)
+
+
+def detect_last_page(page_no, result, page_rows, data_headers):
+    """根据一页的提取结果判断网站的数据是否已经结束，返回实际的最后一页，没有结束时返回None
+
+    page_rows: 按页码返回其他已完成页面数据行的函数（还没有完成的页面返回None）
+    data_headers: 已识别的数据表格的表头，见is_end_page
+    """
+    page_data = result[0]
+    if is_end_page(result, data_headers):
+        # 数据表格没有数据行（超出最后一页）
+        return page_no - 1
+    if page_data:
+        # 超出最后一页时网站可能重复返回最后一页的内容
+        if page_rows(page_no - 1) == page_data:
+            return page_no - 1
+        if page_rows(page_no + 1) == page_data:
+            return page_no
+    return None
+
+
+class ScraperEngine:
+    """网站连接、查询和提取的核心逻辑
+
+    temp_dir: 调试文件保存目录
+    log: 日志回调函数，接收一条日志消息
+    base_url: 网站地址
+    page_cache: 页面缓存（PageCache），为None时不使用缓存
+    parser_backend: 页面解析后端，见page_parsers.available_backends()
+    archive: 请求存档（TrafficArchive），录制模式下保存每个响应，回放模式下不访问网络
+    parse_workers: 解析进程数，大于0时提取的页面交给进程池解析（网络线程只负责下载），为0时在网络线程中解析
+    stream_parse: 边下载边解析，识别出数据表格后各页在接收响应的同时提取数据行，不再建立整页的文档树
+    """
+
+    def __init__(self, temp_dir, log=None, base_url=BASE_URL, max_workers=4, max_workers_limit=16, page_cache=None,
+                 parser_backend=DEFAULT_BACKEND, journal=None, request_policy=None,
+                 rate_controller=None, archive=None, parse_workers=0, stream_parse=False):
+        self.temp_dir = temp_dir
+        self.log_callback = log
+        self.base_url = base_url.rstrip('/')
+
+        self.session = None
+        self.async_fetcher = None  # 异步传输后端（启用异步模式时创建）
+        self.is_connected = False
+        self.city_mapping = {}
+        self.category_mapping = {}  # 查询表单中的材料类别 {选项值: 类别名称}
+        self.page_cache = page_cache
+        self.archive = archive
+        # 各阶段耗时和请求计数，每次查询（一个新任务）时清空
+        self.metrics = PipelineMetrics()
+        self._retries_at_reset = 0
+        # 断点记录（ExtractionJournal），提供时中断后可以从缺失的页面继续提取
+        self.journal = journal
+        # 所有请求共用的超时、重试和熔断策略
+        self.request_policy = request_policy or RequestPolicy()
+        # 请求速率限制和自适应并发（默认不限速、并发数由工作线程数决定）
+        self.rate_controller = rate_controller or RateController(initial_limit=max_workers,
+                                                                 max_limit=max_workers_limit)
+        self.parser_backend = parser_backend
+        self.parse_workers = parse_workers
+        self.parse_pool = None  # 解析进程池（第一次多进程提取时创建）
+        self.stream_parse = stream_parse
+        # 记住数据表格的位置，后续页面跳过表格打分
+        self.table_locator = TableLocator()
+
+        # 连接时识别的页面编码，之后的页面直接按该编码解码
+        self.page_encoding = None
+
+        # 查询时解析好的第1页数据：((城市ID, 日期, 查询条件), (数据行, 表头))，提取时直接使用
+        self.first_page = None
+
+        # 并发提取的工作线程数
+        self.max_workers = max_workers
+        self.max_workers_limit = max_workers_limit
+
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def log_message(self, message):
+        """输出日志消息"""
+        if self.log_callback:
+            self.log_callback(message)
+
+    def http_get(self, url, timeout=None):
+        """发送GET请求，根据连接时选择的传输方式使用requests或asyncio后端
+
+        timeout: 为None时使用请求策略的(连接超时, 读取超时)
+        """
+        metrics = self.metrics
+        if self.archive is not None and self.archive.replaying:
+            with metrics.stage('fetch'):
+                response = self.archive.replay(url)
+            metrics.count('requests')
+            metrics.count('bytes', len(response.content))
+            return response
+        timeout = timeout or self.request_policy.timeout
+        if self.async_fetcher:
+            # 异步后端内部自行做速率和并发控制
+            response = self.async_fetcher.get(url, timeout=timeout)
+            self.record_response(url, response)
+            return response
+
+        controller = self.rate_controller
+        with metrics.stage('throttle'):
+            started = controller.acquire()
+        outcome = 'error'
+        try:
+            metrics.count('requests')
+            with metrics.stage('fetch'):
+                response = self.session.get(url, timeout=timeout)
+            metrics.count('bytes', len(response.content))
+            self.record_response(url, response)
+            if response.status_code == 200:
+                outcome = 'ok'
+            elif response.status_code >= 500:
+                outcome = 'overload'
+            return response
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            outcome = 'overload'
+            raise
+        finally:
+            controller.release(started, outcome)
+
+    def http_get_streaming(self, url, headers, keep_body=False):
+        """发送GET请求，边接收响应边提取数据表格，返回(响应, (数据行, 表头))
+
+        headers: 数据表格的表头文本；流式提取失败或状态码不是200时解析结果为None，需要按完整文档解析
+        keep_body: 是否保留完整的响应内容（写入页面缓存或录制存档时需要）；不保留时每次只在内存中
+                   保存一个数据块和已提取的数据行，返回的响应内容为空
+        """
+        metrics = self.metrics
+        controller = self.rate_controller
+        with metrics.stage('throttle'):
+            started = controller.acquire()
+        outcome = 'error'
+        try:
+            metrics.count('requests')
+            extractor = StreamingTableExtractor(headers, self.page_encoding)
+            chunks = []
+            received = 0
+            # 网络等待和数据行提取交替进行，合计为一个阶段
+            with metrics.stage('stream'):
+                with self.session.get(url, timeout=self.request_policy.timeout, stream=True) as response:
+                    status_code = response.status_code
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        received += len(chunk)
+                        if keep_body:
+                            chunks.append(chunk)
+                        if status_code == 200:
+                            extractor.feed(chunk)
+                extractor.close()
+            response = FetchResult(url, status_code, b''.join(chunks))
+            metrics.count('bytes', received)
+            if keep_body:
+                self.record_response(url, response)
+            if status_code == 200:
+                outcome = 'ok'
+                return response, extractor.result()
+            if status_code >= 500:
+                outcome = 'overload'
+            return response, None
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            outcome = 'overload'
+            raise
+        finally:
+            controller.release(started, outcome)
+
+    def record_response(self, url, response):
+        """录制模式下把响应保存到存档"""
+        if self.archive is not None and response is not None:
+            self.archive.record(url, response.status_code, response.content)
+
+    def cached_page(self, city_id, date_str, page_no, filters=None):
+        """返回本地缓存的页面响应，未缓存时返回None"""
+        if self.page_cache:
+            content = self.page_cache.get(city_id, date_str, page_no, *filter_key(filters))
+            if content is not None:
+                self.metrics.count('cache_hits')
+                return FetchResult(self.build_page_url(city_id, date_str, page_no, filters), 200, content)
+        return None
+
+    def cache_page(self, city_id, date_str, page_no, content, filters=None):
+        """把解析成功的页面保存到本地缓存"""
+        if self.page_cache:
+            self.page_cache.put(city_id, date_str, page_no, content, *filter_key(filters))
+
+    def discard_cached_page(self, city_id, date_str, page_no, filters=None):
+        """删除无法使用的缓存页面，重试时重新下载"""
+        if self.page_cache:
+            self.page_cache.discard(city_id, date_str, page_no, *filter_key(filters))
+
+    def fetch_page(self, city_id, date_str, page_no, timeout=None, filters=None):
+        """获取数据页面，优先使用本地缓存，返回(响应, 是否来自缓存)"""
+        response = self.cached_page(city_id, date_str, page_no, filters)
+        if response is not None:
+            return response, True
+        return self.http_get(self.build_page_url(city_id, date_str, page_no, filters), timeout=timeout), False
+
+    def stream_headers(self):
+        """可以边下载边解析时返回数据表格的表头文本，否则返回None
+
+        需要已经识别出页面编码和数据表格；异步传输、回放和多进程解析时不使用
+        """
+        if not self.stream_parse or self.async_fetcher or self.parse_pool or not self.page_encoding:
+            return None
+        if self.archive is not None and self.archive.replaying:
+            return None
+        return self.table_locator.known_headers()
+
+    def stream_page(self, city_id, date_str, page_no, headers, filters=None):
+        """边下载边提取单页数据，返回(响应, 是否来自缓存, 解析结果)
+
+        缓存命中或流式提取失败时解析结果为None，由调用方按完整文档解析
+        只有使用页面缓存或录制存档时才保留完整的响应内容；不保留时流式提取失败的页面重新完整下载一次
+        """
+        response = self.cached_page(city_id, date_str, page_no, filters)
+        if response is not None:
+            return response, True, None
+        url = self.build_page_url(city_id, date_str, page_no, filters)
+        keep_body = self.page_cache is not None or self.archive is not None
+        response, result = self.http_get_streaming(url, headers, keep_body)
+        if result is None and response.status_code == 200 and not keep_body:
+            response = self.http_get(url)
+        return response, False, result
+
+    def decode_response(self, response):
+        """解码响应内容：使用连接时固定的编码，严格解码失败时单独识别该页的编码"""
+        with self.metrics.stage('decode'):
+            if self.page_encoding:
+                text = decode_content(response.content, self.page_encoding)
+                if text is not None:
+                    return text
+            return response.content.decode(detect_encoding(response), errors='replace')
+
+    def reset_metrics(self):
+        """开始一个新任务，清空上一任务的耗时统计"""
+        self.metrics.reset()
+        self._retries_at_reset = self.request_policy.retries
+
+    def job_metrics(self):
+        """返回当前任务的统计（补上本任务的重试次数）"""
+        self.metrics.set_count('retries', self.request_policy.retries - self._retries_at_reset)
+        return self.metrics
+
+    def log_metrics(self, stages=None):
+        """在日志中输出当前任务的耗时统计"""
+        for line in self.job_metrics().summary_lines(stages):
+            self.log_message(line)
+
+    def log_request_error(self, action, attempt, error):
+        """输出请求失败的日志"""
+        max_attempts = self.request_policy.max_attempts
+        if isinstance(error, requests.exceptions.Timeout):
+            self.log_message(f"⏱️  {action}超时 (第{attempt}/{max_attempts}次)")
+        elif isinstance(error, requests.exceptions.ConnectionError):
+            self.log_message(f"❌ 网络连接错误 (第{attempt}/{max_attempts}次)")
+        elif isinstance(error, RetryableError):
+            self.log_message(f"❌ {action}失败，{error} (第{attempt}/{max_attempts}次)")
+        else:
+            self.log_message(f"❌ {action}失败 (第{attempt}/{max_attempts}次)")
+
+    def close(self):
+        """释放网络资源和解析进程"""
+        if self.parse_pool:
+            self.parse_pool.close()
+            self.parse_pool = None
+        if self.async_fetcher:
+            self.async_fetcher.close()
+            self.async_fetcher = None
+        if self.session:
+            self.session.close()
+
+    def connect(self, use_async=False):
+        """连接到网站，建立会话并获取城市列表，成功返回True"""
+        policy = self.request_policy
+        # 重新连接时清除之前的熔断状态
+        policy.reset()
+        attempts = [0]
+
+        def attempt(attempt_no):
+            attempts[0] = attempt_no
+            self.log_message(f"🔄 正在连接到网站 (第{attempt_no}/{policy.max_attempts}次尝试)...")
+
+            # 创建会话对象
+            if self.session:
+                self.session.close()
+            self.session = requests.Session()
+            # 扩大连接池，保证并发提取时每个工作线程都能复用连接
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers_limit)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+            # 设置完整的浏览器头
+            request_headers = {
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+                'Accept-Encoding': 'gzip, deflate',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive',
+                'DNT': '1',
+                'Pragma': 'no-cache',
+                'Referer': f'{self.base_url}/jgxx_clcx.asp',
+                'Upgrade-Insecure-Requests': '1',
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+            }
+            self.session.headers.update(request_headers)
+
+            # 异步模式：在后台事件循环中收发请求
+            if self.async_fetcher:
+                self.async_fetcher.close()
+                self.async_fetcher = None
+            if use_async and self.archive is not None and self.archive.replaying:
+                self.log_message("📌 回放模式不使用异步传输")
+            elif use_async:
+                self.async_fetcher = AsyncFetcher(request_headers, per_host_limit=self.max_workers_limit, policy=policy,
+                                                 rate_controller=self.rate_controller, metrics=self.metrics)
+                self.log_message(f"📌 使用异步传输: {self.async_fetcher.backend}")
+
+            # 先访问主入口页面，建立会话
+            main_url = f"{self.base_url}/jgxx_clcx.asp"
+            self.log_message("📌 访问主入口页面")
+            self.log_message(f"⏱️  超时时间: 连接{policy.connect_timeout}秒，读取{policy.read_timeout}秒")
+            main_response = self.http_get(main_url)
+
+            if main_response.status_code != 200:
+                raise HttpStatusError(main_response.status_code)
+
+            # 访问真实表单页面
+            form_url = f"{self.base_url}/jgxx_cl1.asp?view=hidden"
+            self.log_message("📌 访问真实表单页面")
+            form_response = self.http_get(form_url)
+
+            if form_response.status_code != 200:
+                raise HttpStatusError(form_response.status_code)
+            return form_response
+
+        try:
+            form_response = policy.run(attempt, on_error=lambda n, e: self.log_request_error("连接", n, e))
+        except Exception:
+            # 所有重试都失败
+            self.log_message(f"❌ 网站连接失败，已尝试{attempts[0]}次")
+            self.is_connected = False
+            return False
+
+        self.log_message("✅ 网站连接成功")
+        self.is_connected = True
+        # 新会话重新识别数据表格
+        self.table_locator.reset()
+
+        # 识别一次页面编码，本次会话的所有页面都使用该编码
+        self.page_encoding = detect_encoding(form_response)
+        self.log_message(f"📌 页面编码: {self.page_encoding}")
+
+        # 获取城市列表和材料类别
+        form_html = self.decode_response(form_response)
+        self.city_mapping = self.get_city_list(form_html)
+        self.category_mapping = self.get_category_list(form_html)
+
+        return True
+
+    def get_city_list(self, html_content):
+        """从网页内容中提取城市列表，返回{城市ID: 城市名称}"""
+        try:
+            self.log_message("🔄 正在获取城市列表...")
+
+            # 保存调试HTML，便于分析
+            debug_file_path = os.path.join(self.temp_dir, "city_list_debug.html")
+            with open(debug_file_path, "w", encoding="utf-8") as f:
+                f.write(html_content)
+            self.log_message("✅ 已保存城市列表调试文件")
+
+            # 解析已解码的HTML
+            soup = BeautifulSoup(html_content, 'html.parser')
+
+            # 查找城市下拉选择框，确保只选择城市选择框
+            city_select = soup.find('select', {'name': 'dq_id'})
+
+            if not city_select:
+                # 使用默认城市列表
+                city_mapping = dict(DEFAULT_CITY_MAPPING)
+            else:
+                # 提取城市选项
+                city_mapping = {}
+                options = city_select.find_all('option')
+
+                for option in options:
+                    value = option.get('value', '').strip()
+                    text = option.get_text(strip=True)
+
+                    # 严格过滤，只接受有效的城市选项
+                    if value and text and value != '-1' and text != '请选择' and len(text) > 1:
+                        # 确保不是数字或年份
+                        if not text.isdigit() and len(text) > 1:
+                            city_mapping[value] = text
+
+            # 验证城市映射，如果为空则使用默认城市列表
+            if not city_mapping:
+                self.log_message("⚠️  未找到有效的城市选项，使用默认城市列表")
+                city_mapping = dict(DEFAULT_CITY_MAPPING)
+        except Exception:
+            # 使用默认城市列表
+            city_mapping = dict(DEFAULT_CITY_MAPPING)
+
+        self.log_message(f"✅ 成功获取 {len(city_mapping)} 个城市")
+        return city_mapping
+
+    def get_category_list(self, html_content):
+        """从查询表单的材料类别下拉框（cllb）中提取材料类别，返回{选项值: 类别名称}，找不到时返回空字典"""
+        try:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            category_select = soup.find('select', {'name': 'cllb'})
+        except Exception:
+            category_select = None
+        category_mapping = {}
+        if category_select:
+            for option in category_select.find_all('option'):
+                value = option.get('value', '').strip()
+                text = option.get_text(strip=True)
+                # 值为空的选项是“全部”
+                if value and text and value != '-1':
+                    category_mapping[value] = text
+        if category_mapping:
+            self.log_message(f"✅ 成功获取 {len(category_mapping)} 个材料类别")
+        else:
+            self.log_message("⚠️  查询表单中没有材料类别，按类别筛选时直接使用输入的类别")
+        return category_mapping
+
+    def find_category(self, category):
+        """根据材料类别名称或选项值查找查询参数使用的选项值，未找到时返回None
+
+        网站没有提供材料类别列表时原样返回
+        """
+        category = (category or '').strip()
+        if not self.category_mapping or category in self.category_mapping:
+            return category
+        for value, name in self.category_mapping.items():
+            if name == category:
+                return value
+        return None
+
+    def find_city_id(self, city_name):
+        """根据城市名称查找城市ID，未找到时返回None"""
+        for cid, name in self.city_mapping.items():
+            if name == city_name:
+                return cid
+        return None
+
+    def query(self, city_id, date_str, filters=None):
+        """查询数据，返回(总记录数, 总页数)，所有重试都失败时返回None
+
+        filters: 查询条件（QueryFilter），由网站筛选材料类别、名称和编号，为None时查询全部材料
+        """
+        # 查询开始一个新任务（查询 → 提取 → 导出）
+        self.reset_metrics()
+        self.first_page = None
+        result = self.query_pages(city_id, date_str, filters)
+        if result is None:
+            return None
+        total_records, total_pages, first_page = result
+        if first_page is not None:
+            self.first_page = ((city_id, date_str, filter_key(filters)), first_page)
+        return total_records, total_pages
+
+    def query_pages(self, city_id, date_str, filters=None):
+        """查询数据，返回(总记录数, 总页数, 第1页的(数据行, 表头))，所有重试都失败时返回None
+
+        第1页没有数据时第三项为None。不修改引擎的状态，多个任务可以在不同线程中同时查询
+        """
+        policy = self.request_policy
+        attempts = [0]
+
+        def attempt(attempt_no):
+            attempts[0] = attempt_no
+            self.log_message(f"🔄 正在查询数据 (第{attempt_no}/{policy.max_attempts}次尝试)...")
+
+            self.log_message(f"📌 查询（{filters.describe(self.category_mapping)}）" if filters else "📌 查询")
+
+            # 发送查询请求（第1页）
+            response, from_cache = self.fetch_page(city_id, date_str, 1, filters=filters)
+
+            if response.status_code != 200:
+                raise HttpStatusError(response.status_code)
+            html = self.decode_response(response)
+
+            # 解析响应，获取总页数和总记录数
+            with self.metrics.stage('tree'):
+                soup = BeautifulSoup(html, 'html.parser')
+
+            # 保存调试HTML，便于分析
+            debug_file_path = os.path.join(self.temp_dir, "query_result_debug.html")
+            with open(debug_file_path, "w", encoding="utf-8") as f:
+                f.write(html)
+
+            # 解析第1页数据，提取时直接使用，不再重新下载和解析；第1页的条数也用于核对分页信息
+            first_page = self.parse_page_soup(soup, html, 1)
+            first_rows = first_page[0] if first_page is not None else []
+
+            # 从分页栏识别总记录数和总页数，并按每页条数核对
+            total_records, total_pages, notes = discover_pages(soup, first_rows)
+            for note in notes:
+                self.log_message(f"⚠️  {note}")
+
+            if total_records > 0 and first_rows:
+                # 缓存第1页
+                if not from_cache:
+                    self.cache_page(city_id, date_str, 1, response.content, filters)
+            else:
+                first_page = None
+
+            self.log_message(f"✅ 查询成功，共 {total_records} 条记录，{total_pages} 页")
+
+            return total_records, total_pages, first_page
+
+        try:
+            return policy.run(attempt, on_error=lambda n, e: self.log_request_error("查询", n, e))
+        except Exception:
+            # 所有重试都失败
+            self.log_message(f"❌ 查询失败，已尝试{attempts[0]}次")
+            return None
+
+    def extract(self, city_id, date_str, pages_to_extract, max_workers=None, progress=None, row_sink=None,
+                filters=None, total_pages=None):
+        """提取多页数据，返回(数据行, 表头)
+
+        total_pages: 查询得到的网站总页数，为None时等于pages_to_extract；
+                     pages_to_extract小于总页数时只提取前几页，不使用断点记录
+        max_workers: 并发提取的工作线程数，为None时使用self.max_workers
+        progress: 进度回调函数，接收0~100的进度值
+        row_sink: 流式输出回调函数，接收(一页数据行, 表头)；提供时各页数据按页码顺序
+                  直接交给row_sink，不在内存中累积，返回的数据行为空
+        filters: 查询条件（QueryFilter），与查询时使用的条件相同
+        返回的数据行按列保存（ColumnarRows），用法与数据行列表相同
+        """
+        # 确定并发数
+        workers = max_workers if max_workers is not None else self.max_workers
+        workers = max(1, min(int(workers), self.max_workers_limit, pages_to_extract or 1))
+        self.max_workers = workers
+
+        controller = self.rate_controller
+        # 自适应并发时线程池按并发上限的最大值创建，实际同时进行的请求数由控制器调整
+        pool_size = max(workers, controller.max_limit) if controller.adaptive else workers
+        self.log_message(f"📌 开始提取 {pages_to_extract} 页数据（并发数: {workers}，{controller.describe()}）")
+        if self.get_parse_pool():
+            self.log_message(f"📌 多进程解析: {self.parse_pool.workers} 个解析进程")
+        elif self.stream_parse and self.stream_headers() is not None:
+            self.log_message("📌 边下载边解析数据表格")
+        started = time.monotonic()
+
+        # 已完成但还不能按顺序合并的页面
+        page_results = {}
+        completed = [0]
+        next_page = [1]
+        all_data = ColumnarRows()
+        headers = []
+        total_rows = [0]
+        # 实际的最后一页：遇到没有数据行或与相邻页面相同的页面时提前，之后的页面不再请求
+        last_page = [pages_to_extract]
+        previous_page = [0, None]  # 最近合并的页面：[页码, 数据行]
+        futures = {}
+
+        def flush_pages():
+            # 按页码顺序合并已完成的连续页面
+            while next_page[0] in page_results and next_page[0] <= last_page[0]:
+                page_data, page_headers = page_results.pop(next_page[0])
+                previous_page[:] = [next_page[0], page_data]
+                next_page[0] += 1
+                if not page_data:
+                    continue
+
+                if not headers:
+                    headers.extend(page_headers)
+
+                total_rows[0] += len(page_data)
+                self.metrics.count('rows', len(page_data))
+                if row_sink:
+                    # 流式导出：写入文件的耗时计入导出阶段
+                    with self.metrics.stage('export'):
+                        row_sink(page_data, headers)
+                else:
+                    all_data.extend(page_data, headers)
+
+        # 打开断点记录，已完成的页面不再提取；只提取前几页时不使用断点记录，以免覆盖完整提取的断点
+        total_pages = total_pages or pages_to_extract
+        use_journal = self.journal is not None and pages_to_extract >= total_pages
+        job = self.journal.open(city_id, date_str, total_pages, *filter_key(filters)) if use_journal else None
+        resumed_pages = dict(job.completed) if job else {}
+        if resumed_pages:
+            retry_count = len(job.failed)
+            self.log_message(f"🔄 从断点继续：已完成 {len(resumed_pages)} 页，"
+                             f"还需提取 {pages_to_extract - len(resumed_pages)} 页（其中 {retry_count} 页上次失败）")
+
+        def page_rows(page_no):
+            # 已完成页面的数据行（还没有完成或已经合并过的页面返回None）
+            if page_no in page_results:
+                return page_results[page_no][0]
+            if previous_page[0] == page_no:
+                return previous_page[1]
+            return None
+
+        def stop_at(page_no):
+            if page_no >= last_page[0]:
+                return
+            self.log_message(f"⏭️  第 {page_no + 1} 页起没有新的数据，网站的数据到第 {page_no} 页为止，"
+                             f"不再提取后面的 {last_page[0] - page_no} 页")
+            last_page[0] = page_no
+            if job:
+                job.end_at(page_no)
+            for future, future_page in futures.items():
+                if future_page > page_no:
+                    future.cancel()
+
+        def on_page_done(page_no, result):
+            if page_no > last_page[0]:
+                return
+            end = detect_last_page(page_no, result, page_rows, self.table_locator.data_headers())
+            if end is not None:
+                stop_at(end)
+                if page_no > last_page[0]:
+                    return
+            page_data = result[0]
+            page_results[page_no] = result
+            flush_pages()
+
+            if job and page_no not in resumed_pages:
+                if page_data:
+                    job.record_page(page_no, page_data, result[1])
+                else:
+                    job.record_failure(page_no)
+
+            # 更新进度
+            completed[0] += 1
+            if progress:
+                progress(completed[0] / pages_to_extract * 100)
+
+            if not page_data:
+                self.metrics.count('pages_failed')
+                self.log_message(f"⚠️  第 {page_no} 页数据提取失败")
+            else:
+                self.metrics.count('pages_ok')
+                self.log_message(f"✅ 第 {page_no} 页数据提取成功，共 {len(page_data)} 条记录")
+
+        for page_no in sorted(resumed_pages):
+            if page_no <= pages_to_extract:
+                on_page_done(page_no, resumed_pages[page_no])
+
+        # 查询时已经得到第1页数据，从第2页开始提取
+        if (1 not in resumed_pages and self.first_page
+                and self.first_page[0] == (city_id, date_str, filter_key(filters))):
+            on_page_done(1, self.first_page[1])
+            resumed_pages[1] = self.first_page[1]
+        page_numbers = [page_no for page_no in range(1, pages_to_extract + 1) if page_no not in resumed_pages]
+
+        try:
+            if self.async_fetcher:
+                # 异步模式：所有页面在同一个事件循环中并发获取
+                self.extract_pages_async(city_id, date_str, page_numbers, on_page_done,
+                                         past_end=lambda page_no: page_no > last_page[0], filters=filters)
+            else:
+                def extract_if_needed(page_no):
+                    # 开始请求前再次检查，已知超出最后一页的页面不再请求
+                    if page_no > last_page[0]:
+                        return None
+                    return self.extract_page_data(city_id, date_str, page_no, filters)
+
+                with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                    futures.update({executor.submit(extract_if_needed, page_no): page_no for page_no in page_numbers})
+
+                    for future in as_completed(futures):
+                        if future.cancelled():
+                            continue
+                        page_no = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception:
+                            result = ([], [])
+                        if result is not None:
+                            on_page_done(page_no, result)
+        finally:
+            if job:
+                job.close()
+        if last_page[0] < pages_to_extract and progress:
+            progress(100)
+
+        if self.request_policy.circuit_open:
+            self.log_message("❌ 网站连续无响应，已暂停请求，剩余页面没有提取")
+        if job and job.failed:
+            self.log_message(f"⚠️  {len(job.failed)} 页提取失败（第 {', '.join(map(str, sorted(job.failed)))} 页），"
+                             f"已记录到断点文件，再次提取时只获取缺失的页面")
+        elapsed = time.monotonic() - started
+        if page_numbers and elapsed > 0:
+            self.log_message(f"📊 提取速度: {len(page_numbers) / elapsed:.1f} 页/秒（{controller.describe()}）")
+        self.log_message(f"🎉 数据提取完成，共提取 {total_rows[0]} 条记录")
+        self.log_metrics()
+        return all_data, list(headers)
+
+    def build_page_url(self, city_id, date_str, page_no, filters=None):
+        """构建数据页面URL，filters为查询条件（QueryFilter）"""
+        params = filters.url_params(self.page_encoding or 'gbk') if filters else {'cllb': '', 'clmc': '', 'clid': ''}
+        return (f"{self.base_url}/jgxx_cl1.asp?pageno={page_no}&dq_id={city_id}&cllb={params['cllb']}"
+                f"&time1={date_str}&clmc={params['clmc']}&clid={params['clid']}&view=hidden&tc=")
+
+    def extract_page_data(self, city_id, date_str, page_no, filters=None):
+        """提取单页数据，所有重试都失败时返回([], [])"""
+        stream_headers = self.stream_headers()
+
+        def attempt(attempt_no):
+            # 发送请求（缓存命中时不访问网络）
+            result = None
+            if stream_headers is not None:
+                response, from_cache, result = self.stream_page(city_id, date_str, page_no, stream_headers, filters)
+            else:
+                response, from_cache = self.fetch_page(city_id, date_str, page_no, filters=filters)
+
+            if response.status_code != 200:
+                raise HttpStatusError(response.status_code)
+
+            if result is None:
+                result = self.parse_page_content(response, page_no)
+            if not self.is_usable_page(result):
+                if from_cache:
+                    self.discard_cached_page(city_id, date_str, page_no, filters)
+                raise RetryableError("未找到数据表格" if result is None else "数据表格没有数据行")
+
+            # 只缓存有数据行或确认超出最后一页的页面
+            if not from_cache:
+                self.cache_page(city_id, date_str, page_no, response.content, filters)
+
+            return result
+
+        try:
+            return self.request_policy.run(attempt)
+        except Exception:
+            # 所有重试都失败，或网站已熔断
+            return [], []
+
+    def is_usable_page(self, result):
+        """解析结果可以使用：有数据行，或确认是超出最后一页的页面（见is_end_page）"""
+        return result is not None and (bool(result[0]) or is_end_page(result, self.table_locator.data_headers()))
+
+    def get_parse_pool(self):
+        """返回解析进程池，未启用多进程解析时返回None"""
+        if self.parse_workers <= 0:
+            if self.parse_pool:
+                self.parse_pool.close()
+                self.parse_pool = None
+            return None
+        if self.parse_pool is None or self.parse_pool.workers != self.parse_workers:
+            if self.parse_pool:
+                self.parse_pool.close()
+            self.parse_pool = ParsePool(self.parse_workers, self.parser_backend)
+        return self.parse_pool
+
+    def parse_page_content(self, response, page_no):
+        """解码并解析单页响应，返回(数据行, 表头)，未找到数据表格时返回None
+
+        启用多进程解析时交给解析进程，当前线程只等待结果
+        """
+        if not self.parse_pool:
+            return self.parse_page_html(self.decode_response(response), page_no)
+        result, timings = self.parse_pool.parse(response.content, self.page_encoding)
+        return self.finish_pool_parse(response, page_no, result, timings)
+
+    def finish_pool_parse(self, response, page_no, result, timings):
+        """记录解析进程返回的各阶段耗时，未找到数据表格时保存调试文件"""
+        for stage, seconds in timings:
+            self.metrics.observe(stage, seconds)
+        if result is None:
+            self.save_page_debug(self.decode_response(response), page_no)
+        return result
+
+    def iter_parsed_pages(self, responses, page_numbers):
+        """按页码顺序解析已下载的页面，依次返回(页码, 响应, 解析结果)
+
+        启用多进程解析时同时提交给解析进程，未返回的页面不超过解析进程数的2倍，内存占用有上限
+        """
+        if not self.parse_pool:
+            for page_no in page_numbers:
+                response = responses[page_no]
+                result = self.parse_page_content(response, page_no) if response is not None else None
+                yield page_no, response, result
+            return
+
+        window = self.parse_pool.workers * 2
+        pending = deque()
+        page_iter = iter(page_numbers)
+        while True:
+            while len(pending) < window:
+                page_no = next(page_iter, None)
+                if page_no is None:
+                    break
+                response = responses[page_no]
+                future = self.parse_pool.submit(response.content, self.page_encoding) if response is not None else None
+                pending.append((page_no, response, future))
+            if not pending:
+                return
+            page_no, response, future = pending.popleft()
+            result = None
+            if future is not None:
+                result = self.finish_pool_parse(response, page_no, *future.result())
+            yield page_no, response, result
+
+    def parse_page_html(self, html, page_no):
+        """解析单页HTML，返回(数据行, 表头)，未找到数据表格时返回None"""
+        result = parse_html(html, self.parser_backend, self.table_locator, self.metrics.stage)
+        if result is None:
+            self.save_page_debug(html, page_no)
+        return result
+
+    def parse_page_soup(self, soup, html, page_no):
+        """从已解析的页面中提取(数据行, 表头)，未找到数据表格时返回None"""
+        if self.parser_backend != 'html.parser':
+            # 其他解析后端不能复用BeautifulSoup树
+            return self.parse_page_html(html, page_no)
+        result = parse_soup(soup, self.table_locator, self.metrics.stage)
+        if result is None:
+            self.save_page_debug(html, page_no)
+        return result
+
+    def save_page_debug(self, html, page_no):
+        """保存调试HTML，便于分析"""
+        debug_path = os.path.join(self.temp_dir, f"page_{page_no}_debug.html")
+        with open(debug_path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+    def extract_pages_async(self, city_id, date_str, page_numbers, on_page_done=None, past_end=None, filters=None):
+        """使用异步传输在同一个事件循环中并发获取多个页面，返回{页码: (数据行, 表头)}
+
+        页面按并发上限分批获取，每批处理完再获取下一批，识别出网站的数据已经结束后不再请求后面的页面
+        提供on_page_done时，每页结果交给回调处理，不再保存在返回值中
+        past_end: 判断页码是否已超出网站最后一页的函数，超出后不再请求、解析和重试后面的页面
+        filters: 查询条件（QueryFilter）
+        """
+        page_numbers = sorted(page_numbers)
+        controller = self.rate_controller
+        page_results = {}
+        start = 0
+        while start < len(page_numbers):
+            # 每批的页数等于当前的并发上限，超出最后一页时浪费的请求不超过一批
+            batch_size = max(1, int(controller.limit) if controller.adaptive else self.max_workers)
+            batch = page_numbers[start:start + batch_size]
+            start += len(batch)
+            if past_end:
+                batch = [page_no for page_no in batch if not past_end(page_no)]
+                if not batch:
+                    break
+
+            # 缓存命中的页面不再访问网络
+            responses = {}
+            for page_no in batch:
+                response = self.cached_page(city_id, date_str, page_no, filters)
+                if response is not None:
+                    responses[page_no] = response
+            missing_pages = [page_no for page_no in batch if page_no not in responses]
+            urls = [self.build_page_url(city_id, date_str, page_no, filters) for page_no in missing_pages]
+            fetched = self.async_fetcher.get_many(urls) if urls else []
+            for url, response in zip(urls, fetched):
+                self.record_response(url, response)
+            responses.update(zip(missing_pages, fetched))
+            fetched_pages = set(missing_pages)
+
+            for page_no, response, result in self.iter_parsed_pages(responses, batch):
+                if past_end and past_end(page_no):
+                    break
+                usable = self.is_usable_page(result)
+                if usable and page_no in fetched_pages:
+                    self.cache_page(city_id, date_str, page_no, response.content, filters)
+                if response is None:
+                    # 异步请求已经按请求策略重试过，不再重复重试，直接记为失败
+                    result = ([], [])
+                elif not usable:
+                    # 状态码200但未找到数据表格或数据表格异常为空时，按原有的重试逻辑单独重新提取
+                    result = self.extract_page_data(city_id, date_str, page_no, filters)
+                if on_page_done:
+                    on_page_done(page_no, result)
+                else:
+                    page_results[page_no] = result
+        return page_results
+
+def export_to_file(all_data, headers, file_path, log=None):
+    """保存数据到Excel/CSV/Parquet/Feather（增强版：彻底解决乱码问题并添加表格样式），返回实际保存的文件路径"""
+    def log_message(message):
+        if log:
+            log(message)
+
+    def build_dataframe():
+        import pandas as pd
+        if isinstance(all_data, ColumnarRows):
+            # 按列保存的数据直接生成各列，不再逐个单元格复制
+            return all_data.to_dataframe()
+        # 确保所有数据和表头都是有效的UTF-8字符串
+        clean_data = [[clean_cell(cell) for cell in row] for row in all_data]
+        clean_headers = [clean_cell(header) for header in headers]
+        return pd.DataFrame(clean_data, columns=clean_headers)
+
+    # 列式存储（Parquet/Feather）：价格和发布时间使用数值、日期类型
+    if os.path.splitext(file_path)[1].lower() in COLUMNAR_FORMATS:
+        writer = StreamingColumnarWriter(file_path)
+        writer.write_rows(all_data, headers)
+        writer.close()
+        log_message(f"✅ {writer.file_format.capitalize()}数据已保存到: {file_path}")
+        return file_path
+
+    # 保存为CSV文件（增强版，确保带BOM头）
+    if file_path.endswith('.csv'):
+        # 使用utf-8-sig编码，确保Windows Excel能正确识别
+        build_dataframe().to_csv(file_path, index=False, encoding='utf-8-sig', sep=',')
+        log_message(f"✅ CSV数据已保存到: {file_path}")
+        return file_path
+
+    # 默认保存为Excel
+    if not file_path.endswith('.xlsx'):
+        file_path = file_path + '.xlsx'
+    try:
+        # 带表格样式的快速写入：蓝色表头、边框、隔行底色、自动列宽
+        writer = StreamingXlsxWriter(file_path)
+        writer.write_rows(all_data, headers)
+        writer.close()
+        log_message(f"✅ Excel数据已保存到: {file_path}")
+    except Exception:
+        import pandas as pd
+        df = build_dataframe()
+        # 降级方案：使用xlwt引擎（如果可用）
+        try:
+            with pd.ExcelWriter(file_path, engine='xlwt', encoding='utf-8') as writer:
+                df.to_excel(writer, index=False, sheet_name='材料价格')
+            log_message(f"✅ Excel数据已保存到: {file_path}")
+        except:
+            # 最终方案：保存为CSV
+            csv_path = file_path.replace('.xlsx', '.csv')
+            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+            log_message(f"🔄 无法保存为Excel，已保存为CSV: {csv_path}")
+            file_path = csv_path
+
+    return file_path
@@ -0,0 +1,175 @@
+"""边下载边解析的数据表格提取
+
+下载页面时把收到的每一块数据交给增量HTML解析器，只跟踪表格、行和单元格，
+遇到表头与已知数据表格一致的表格时逐行取出数据，其余内容直接丢弃，不建立整页的文档树。
+解析与网络传输同时进行，每页只需保存原始字节和当前这一行。
+
+已知的表头来自之前完整解析时TableLocator记住的数据表格；结果与完整解析（page_parsers）相同：
+单元格文本按get_text(strip=True)的规则拼接，数据行只取td，列数按表头补齐或截断。
+找不到数据表格、数据表格中嵌套了表格、页面中有未闭合的行或单元格（各解析后端对这种页面的处理不同）
+或解码失败时返回None，由调用方按完整文档重新解析。
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+
+from page_parsers import DEFAULT_HEADERS
+
+# 每次从网络读取的字节数
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 不计入单元格文本的元素（与get_text一致）
+_SKIP_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+
+class StreamingTableExtractor(HTMLParser):
+    """增量提取数据表格的行
+
+    known_headers: 数据表格第一行各单元格（th和td）的文本
+    encoding: 页面编码，feed接收原始字节并按该编码增量解码
+    """
+
+    def __init__(self, known_headers, encoding):
+        super().__init__(convert_charrefs=True)
+        self.known_headers = tuple(known_headers)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self.failed = False
+
+        self._tables = []        # 打开的表格：每项为[已结束的行数, 是否为数据表格]
+        self._data_table = None  # 数据表格在_tables中的层级
+        self._done = False
+        self._row = None         # 当前行：[(单元格标签, 文本)]
+        self._cell = None        # 当前单元格：[标签, 文本片段]
+        self._text = []          # 当前文本节点（可能分多次到达）
+        self._skip_depth = 0
+
+        self.headers = None
+        self.rows = []
+
+    def feed(self, data):
+        """输入一块原始字节"""
+        if self.failed or self._done:
+            return
+        try:
+            text = self._decoder.decode(data)
+        except (UnicodeDecodeError, LookupError):
+            self.failed = True
+            return
+        super().feed(text)
+
+    def close(self):
+        if not self.failed and not self._done:
+            try:
+                super().feed(self._decoder.decode(b'', final=True))
+            except (UnicodeDecodeError, LookupError):
+                self.failed = True
+                return
+            super().close()
+            self._flush_text()
+
+    def result(self):
+        """返回(数据行, 表头)，未能可靠提取时返回None"""
+        if self.failed or self.headers is None:
+            return None
+        return self.rows, self.headers
+
+    # 文本节点结束时整体去除空白（与get_text(strip=True)相同）
+    def _flush_text(self):
+        if self._text:
+            text = ''.join(self._text).strip()
+            self._text = []
+            if text and self._cell is not None:
+                self._cell[1].append(text)
+
+    def _fail(self):
+        """放弃流式提取，交给完整解析"""
+        self.failed = True
+        self._done = True
+
+    def handle_data(self, data):
+        if self._cell is not None and not self._skip_depth and not self._done:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        self._flush_text()
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+        elif tag == 'table':
+            if self._data_table is not None:
+                # 数据表格中嵌套了表格，行的归属与文档树不同
+                self._fail()
+                return
+            self._tables.append([0, False])
+        elif tag == 'tr' and self._tables:
+            if self._row is not None:
+                # 上一行没有闭合
+                self._fail()
+                return
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            if self._cell is not None:
+                # 上一个单元格没有闭合
+                self._fail()
+                return
+            self._cell = [tag, []]
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        self._flush_text()
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in ('td', 'th'):
+            self._end_cell()
+        elif tag == 'tr':
+            if self._cell is not None:
+                self._fail()
+                return
+            self._end_row()
+        elif tag == 'table' and self._tables:
+            if self._row is not None:
+                self._fail()
+                return
+            self._tables.pop()
+            if self._data_table is not None and len(self._tables) == self._data_table:
+                # 数据表格结束，后面的内容不再解析
+                self._done = True
+
+    def _end_cell(self):
+        if self._cell is not None:
+            tag, parts = self._cell
+            self._row.append((tag, ''.join(parts)))
+            self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self._row is None or not self._tables:
+            self._row = None
+            return
+        row, self._row = self._row, None
+        table = self._tables[-1]
+        table[0] += 1
+        if table[0] == 1:
+            # 表格的第一行：与已知表头一致时即为数据表格
+            if tuple(text for _, text in row) == self.known_headers:
+                table[1] = True
+                self._data_table = len(self._tables) - 1
+                headers = [text for _, text in row if text and not text.isspace()]
+                self.headers = headers or list(DEFAULT_HEADERS)
+            return
+        if table[1]:
+            width = len(self.headers)
+            values = [_WHITESPACE_RE.sub(' ', text).strip() for tag, text in row if tag == 'td']
+            if len(values) < width:
+                values.extend([''] * (width - len(values)))
+            self.rows.append(values[:width])
@@ -0,0 +1,63 @@
+"""测试公用的夹具：离线替身服务器和连接到替身服务器的提取引擎"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandInServer  # noqa: E402
+from scraper_core import ScraperEngine  # noqa: E402
+
+CITY_ID = '15'
+DATE_STR = '2025/01/20'
+
+
+class FlakyServer(StandInServer):
+    """替身服务器：failing_pages中的数据页面返回404，用于模拟提取中途失败"""
+
+    def __init__(self, failing_pages=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing_pages = set(failing_pages)
+        self.page_requests = []
+
+    def render(self, path, query):
+        if 'pageno' in query:
+            page_no = int(query['pageno'][0])
+            with self._lock:
+                self.page_requests.append(page_no)
+            if page_no in self.failing_pages:
+                return None
+        return super().render(path, query)
+
+
+@pytest.fixture
+def make_server():
+    """创建并启动替身服务器，测试结束后关闭"""
+    servers = []
+
+    def factory(**kwargs):
+        server = FlakyServer(seed=1, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield factory
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """创建连接到指定地址的提取引擎，测试结束后关闭"""
+    engines = []
+
+    def factory(base_url, **kwargs):
+        engine = ScraperEngine(str(tmp_path / f"temp{len(engines)}"), log=lambda message: None,
+                               base_url=base_url, **kwargs)
+        engines.append(engine)
+        assert engine.connect()
+        return engine
+
+    yield factory
+    for engine in engines:
+        engine.close()
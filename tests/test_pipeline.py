@@ -0,0 +1,108 @@
+"""基于离线替身服务器的提取流程回归测试：断点续提、提前结束、录制回放、按列保存"""
+from benchmarks.sample_pages import HEADERS, sample_rows
+from checkpoint import ExtractionJournal
+from columnar import ColumnarRows
+from request_policy import RequestPolicy
+from traffic_archive import TrafficArchive
+
+from conftest import CITY_ID, DATE_STR
+
+
+def extract_all(engine, **kwargs):
+    """查询并提取全部页面，返回(数据行列表, 表头)"""
+    total_records, total_pages = engine.query(CITY_ID, DATE_STR)
+    rows, headers = engine.extract(CITY_ID, DATE_STR, total_pages, total_pages=total_pages, **kwargs)
+    return list(rows), headers
+
+
+def test_journal_resumes_only_missing_pages(tmp_path, make_server, make_engine):
+    server = make_server(records=300)
+    expected, expected_headers = extract_all(make_engine(server.base_url))
+
+    # 第一次提取时第3、5页失败（只尝试一次），断点文件记录已完成的页面和失败的页码
+    journal = ExtractionJournal(str(tmp_path / 'checkpoint'))
+    server.failing_pages = {3, 5}
+    engine = make_engine(server.base_url, journal=journal, request_policy=RequestPolicy(max_attempts=1))
+    rows, _ = extract_all(engine)
+    assert len(rows) == len(expected) - 100
+    assert journal.failed_pages(CITY_ID, DATE_STR) == [3, 5]
+
+    # 再次提取时只请求失败的页面，结果与一次完整提取相同，断点文件已删除
+    server.failing_pages = set()
+    engine = make_engine(server.base_url, journal=journal)
+    engine.query(CITY_ID, DATE_STR)
+    del server.page_requests[:]
+    rows, headers = engine.extract(CITY_ID, DATE_STR, 6, total_pages=6)
+    assert sorted(server.page_requests) == [3, 5]
+    assert list(rows) == expected
+    assert headers == expected_headers
+    assert journal.failed_pages(CITY_ID, DATE_STR) == []
+
+
+def test_extract_stops_at_real_last_page(make_server, make_engine):
+    # 网站只有3页数据，但按10页提取
+    server = make_server(records=120)
+    engine = make_engine(server.base_url)
+    engine.query(CITY_ID, DATE_STR)
+    del server.page_requests[:]
+    workers = 1
+    rows, _ = engine.extract(CITY_ID, DATE_STR, 10, max_workers=workers, total_pages=10)
+    assert len(rows) == 120
+    # 第1页由查询得到，第4页为空表格（超出最后一页）；处理第4页的结果时，
+    # 每个工作线程最多已经开始请求下一页，之后的页面不再请求
+    assert {2, 3, 4} <= set(server.page_requests)
+    assert max(server.page_requests) <= 4 + workers
+
+
+def test_replay_produces_identical_output(tmp_path, make_server, make_engine):
+    server = make_server(records=260)
+    archive_path = str(tmp_path / 'traffic.db')
+    archive = TrafficArchive(archive_path, mode='record')
+    try:
+        recorded = extract_all(make_engine(server.base_url, archive=archive))
+    finally:
+        archive.close()
+
+    # 回放时不访问网站
+    requests_before = server.requests
+    archive = TrafficArchive(archive_path, mode='replay')
+    try:
+        replayed = extract_all(make_engine(server.base_url, archive=archive))
+    finally:
+        archive.close()
+    assert server.requests == requests_before
+    assert replayed == recorded
+    assert len(replayed[0]) == 260
+
+
+def test_columnar_rows_rebuild_text_rows_exactly():
+    rows = sample_rows(500)
+    # 不能按数值保存的价格和序号按原文本保存
+    odd_values = ['', '面议', '007', '1,234.50', '-0', '-12.30', '1e5', ' 88', '12345678901234567', '0.1234567890123']
+    for index, value in enumerate(odd_values):
+        rows[index][0] = value
+        rows[index + len(odd_values)][4] = value
+    rows[20][7] = '2025年01月20日'
+    rows[21][3] = ''
+
+    columnar = ColumnarRows()
+    columnar.extend(rows[:250], HEADERS)
+    columnar.extend(rows[250:])
+    assert len(columnar) == len(rows)
+    assert list(columnar) == rows
+    assert columnar[-1] == rows[-1]
+    assert columnar[5:8] == rows[5:8]
+    assert columnar.to_dataframe().values.tolist() == rows
+
+
+def test_extracted_columnar_rows_match_streamed_rows(make_server, make_engine):
+    # 流式导出收到的原始数据行与按列保存后还原的数据行相同
+    server = make_server(records=180)
+    streamed = []
+    engine = make_engine(server.base_url)
+    total_records, total_pages = engine.query(CITY_ID, DATE_STR)
+    engine.extract(CITY_ID, DATE_STR, total_pages, total_pages=total_pages,
+                   row_sink=lambda page_data, headers: streamed.extend(page_data))
+    rows, _ = extract_all(make_engine(server.base_url))
+    assert len(streamed) == 180
+    assert rows == streamed
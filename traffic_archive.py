@@ -0,0 +1,101 @@
+"""网站请求录制与回放
+
+录制模式：把会话中每个请求的URL和原始响应内容（zlib压缩）保存到一个SQLite存档文件，按请求路径建立索引；
+回放模式：不访问网络，直接从存档返回响应，经过与真实请求相同的解码、解析和导出流程，
+便于离线调试和性能分析，结果稳定可重复。
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+
+from async_fetcher import FetchResult
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    request     TEXT PRIMARY KEY,
+    url         TEXT NOT NULL,
+    status      INTEGER NOT NULL,
+    content     BLOB NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+
+class TrafficArchive:
+    """请求存档
+
+    path: 存档文件路径
+    mode: 'record'（录制，追加到存档）或 'replay'（回放，只读）
+    """
+
+    def __init__(self, path, mode='record'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"未知的存档模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"存档文件不存在: {path}")
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    @staticmethod
+    def request_key(url):
+        """存档的索引键：请求路径和查询参数（不含主机，回放时与网站地址无关）"""
+        parts = urlsplit(url)
+        return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+    def record(self, url, status_code, content):
+        """保存一个响应（同一请求只保留最新的响应）"""
+        if self.replaying:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (request, url, status, content, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (self.request_key(url), url, status_code, zlib.compress(content), time.time()))
+            self._conn.commit()
+
+    def get(self, url):
+        """读取存档的响应，未录制时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT status, content FROM responses WHERE request = ?",
+                                     (self.request_key(url),)).fetchone()
+        if row is None:
+            return None
+        return FetchResult(url, row[0], zlib.decompress(row[1]))
+
+    def replay(self, url):
+        """回放一个请求，存档中没有时按网络连接错误处理"""
+        result = self.get(url)
+        if result is None:
+            raise requests.exceptions.ConnectionError(f"存档中没有该请求: {self.request_key(url)}")
+        return result
+
+    def iter_responses(self, path_suffix=''):
+        """按录制顺序遍历存档中的(URL, 状态码, 原始内容)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT url, status, content FROM responses ORDER BY recorded_at").fetchall()
+        for url, status, content in rows:
+            if urlsplit(url).path.endswith(path_suffix):
+                yield url, status, zlib.decompress(content)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()